@@ -0,0 +1,65 @@
+"""
+Assignment step of one frame on a large crowd: min_cost_matching with the dense solver (one
+linear_sum_assignment on the whole tracks x detections matrix) vs the sparse solver (connected
+components of the feasible pairs), for 100 to 2000 tracks. The cost matrices come from people spread
+over a wide scene: only the detections near a track's position are feasible, like after Mahalanobis
+gating. Reports the number of matches and their total cost for both (they must be equal).
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_assignment.py --tracks 100 500 1000 2000 --radius 60 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from deep_sort.sort.linear_assignment import min_cost_matching, INFTY_COST  # noqa: E402
+
+
+def crowd_cost(rng, n, width, height, radius, max_distance):
+    # n tracks, ~n detections (some missed, some new), cost = distance / radius where feasible
+    tracks = rng.uniform(0, [width, height], (n, 2))
+    seen = tracks[rng.rand(n) > 0.1]
+    dets = np.vstack([seen + rng.randn(len(seen), 2) * radius / 4, rng.uniform(0, [width, height], (n // 10, 2))])
+    dist = np.sqrt(((tracks[:, None, :] - dets[None, :, :]) ** 2).sum(axis=2))
+    cost = max_distance * dist / radius
+    cost[dist > radius] = INFTY_COST
+    return cost
+
+
+def timed(cost, max_distance, sparse, repeat):
+    metric = lambda tracks, dets, track_indices, detection_indices: cost.copy()  # noqa: E731
+    t0 = time.time()
+    for _ in range(repeat):
+        out = min_cost_matching(metric, max_distance, None, None, list(range(cost.shape[0])),
+                                list(range(cost.shape[1])), sparse=sparse)
+    return 1000 * (time.time() - t0) / repeat, out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', nargs='+', type=int, default=[100, 250, 500, 1000, 2000])
+    parser.add_argument('--radius', type=float, default=60., help='gating radius, pixels')
+    parser.add_argument('--density', type=float, default=2e-4, help='people per square pixel')
+    parser.add_argument('--max-distance', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    print('%8s%10s%14s%14s%10s%10s%12s' % ('tracks', 'feasible', 'dense (ms)', 'sparse (ms)', 'speedup',
+                                           'matches', 'same cost'))
+    for n in args.tracks:
+        side = np.sqrt(n / args.density)
+        cost = crowd_cost(rng, n, side, side, args.radius, args.max_distance)
+        t_dense, dense = timed(cost, args.max_distance, False, args.repeat)
+        t_sparse, sparse = timed(cost, args.max_distance, True, args.repeat)
+        totals = [sum(cost[t, d] for t, d in out[0]) for out in (dense, sparse)]
+        same = len(dense[0]) == len(sparse[0]) and np.isclose(totals[0], totals[1])
+        print('%8d%9.2f%%%14.2f%14.2f%9.1fx%10d%12s' % (
+            n, 100. * (cost <= args.max_distance).mean(), t_dense, t_sparse, t_dense / t_sparse,
+            len(sparse[0]), same))
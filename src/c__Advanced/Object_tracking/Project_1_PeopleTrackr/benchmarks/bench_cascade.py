@@ -0,0 +1,99 @@
+"""
+Matching cascade per frame: the previous level-by-level cascade (one appearance + gating cost matrix
+per level) vs linear_assignment.matching_cascade (one cost matrix per frame, levels solved on its rows),
+on a synthetic crowd tracked by deep_sort's Tracker. People are missed at random, so the confirmed tracks
+spread over several cascade levels. Both cascades run on the same tracker state every frame and their
+matches must be identical.
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_cascade.py --people 50 100 200 500 --miss 0.2 --frames 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from deep_sort.sort import linear_assignment  # noqa: E402
+from deep_sort.sort.detection import Detection  # noqa: E402
+from deep_sort.sort.nn_matching import NearestNeighborDistanceMetric  # noqa: E402
+from deep_sort.sort.tracker import Tracker  # noqa: E402
+
+
+def legacy_cascade(distance_metric, max_distance, cascade_depth, tracks, detections, track_indices):
+    # matching_cascade before the single cost matrix
+    unmatched_detections = list(range(len(detections)))
+    matches = []
+    for level in range(cascade_depth):
+        if len(unmatched_detections) == 0:
+            break
+        track_indices_l = [k for k in track_indices if tracks[k].time_since_update == 1 + level]
+        if len(track_indices_l) == 0:
+            continue
+        matches_l, _, unmatched_detections = linear_assignment.min_cost_matching(
+            distance_metric, max_distance, tracks, detections, track_indices_l, unmatched_detections)
+        matches += matches_l
+    unmatched_tracks = list(set(track_indices) - set(k for k, _ in matches))
+    return matches, unmatched_tracks, unmatched_detections
+
+
+class Crowd(object):
+    """people walking in a width x height scene, each with its own appearance, detected with probability 1 - miss"""
+
+    def __init__(self, rng, people, width, height, miss, dim=512):
+        self.rng, self.width, self.height, self.miss = rng, width, height, miss
+        self.pos = rng.uniform(0, [width - 60, height - 150], (people, 2))
+        self.vel = rng.uniform(-2, 2, (people, 2))
+        self.looks = rng.randn(people, dim).astype(np.float32)
+
+    def step(self):
+        self.pos = np.clip(self.pos + self.vel, 0, [self.width - 60, self.height - 150])
+        seen = np.flatnonzero(self.rng.rand(len(self.pos)) >= self.miss)
+        features = self.looks[seen] + 0.3 * self.rng.randn(len(seen), self.looks.shape[1]).astype(np.float32)
+        return [Detection(np.r_[self.pos[i], 60, 150], 0.9, f, 0) for i, f in zip(seen, features)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--people', nargs='+', type=int, default=[50, 100, 200, 500])
+    parser.add_argument('--miss', type=float, default=0.2, help='probability a person is not detected')
+    parser.add_argument('--warmup', type=int, default=30, help='frames tracked before timing')
+    parser.add_argument('--frames', type=int, default=30, help='timed frames')
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    args = parser.parse_args()
+
+    print('%8s%10s%16s%16s%10s%12s' % ('people', 'levels', 'per-level (ms)', 'one pass (ms)', 'speedup', 'identical'))
+    for people in args.people:
+        rng = np.random.RandomState(people)
+        crowd = Crowd(rng, people, args.width, args.height, args.miss)
+        tracker = Tracker(NearestNeighborDistanceMetric('cosine', 0.2, 100), max_age=70, n_init=3)
+        for _ in range(args.warmup):
+            tracker.predict()
+            tracker.update(crowd.step())
+
+        t_ref, t_new, levels, identical = 0., 0., 0, True
+        for _ in range(args.frames):
+            tracker.predict()
+            detections = crowd.step()
+            tracker._index_detections(detections)
+            confirmed = [i for i, t in enumerate(tracker.tracks) if t.is_confirmed()]
+            levels += len(set(tracker.tracks[i].time_since_update for i in confirmed))
+            t0 = time.time()
+            ref = legacy_cascade(tracker._gated_metric, tracker.metric.matching_threshold, tracker.max_age,
+                                 tracker.tracks, detections, confirmed)
+            t1 = time.time()
+            new = linear_assignment.matching_cascade(tracker._gated_metric, tracker.metric.matching_threshold,
+                                                     tracker.max_age, tracker.tracks, detections, confirmed)
+            t2 = time.time()
+            t_ref += t1 - t0
+            t_new += t2 - t1
+            identical &= (sorted(ref[0]) == sorted(new[0]) and sorted(ref[1]) == sorted(new[1])
+                          and sorted(ref[2]) == sorted(new[2]))
+            tracker.update(detections)
+        print('%8d%10.1f%16.2f%16.2f%9.1fx%12s' % (people, levels / args.frames, 1000 * t_ref / args.frames,
+                                                   1000 * t_new / args.frames, t_ref / t_new, identical))
@@ -0,0 +1,185 @@
+"""
+End-to-end throughput of VideoTracker (main.py or peopletrackr.py), headless, with no display and no
+model download. Sweeps img-size x frame_interval x crowd size x backend on synthetic videos (people
+sprites walking on a textured background, generated once and cached) or on a local clip.
+
+Every configuration runs in its own process, so that its peak RSS is its own and one configuration
+cannot warm up the next. The results (FPS, per-stage p50/p95/p99 from utils_ds.profiler, peak RSS)
+are written as JSON. With --baseline, the run fails (exit code 1) when the FPS of a configuration
+drops more than --threshold below the baseline.
+
+Usage (from the Project_1_PeopleTrackr folder, model files already present):
+    $ python benchmarks/bench_e2e.py --img-size 320 640 --frame-interval 1 2 --people 10 40 \\
+          --width 1280 --height 720 --frames 300 --out output/bench_e2e.json
+    $ python benchmarks/bench_e2e.py ... --save-baseline benchmarks/baseline.json   # store a reference
+    $ python benchmarks/bench_e2e.py ... --baseline benchmarks/baseline.json --threshold 0.1
+    $ python benchmarks/bench_e2e.py --video input/room.mp4 --script peopletrackr
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+SWEEP = ('img_size', 'frame_interval', 'people', 'backend')  # the keys of a configuration
+
+
+def draw_person(img, x, y, h, color):
+    # head, torso, arms and legs, proportions of a standing person (h: height in pixels)
+    w = h // 3
+    cv2.circle(img, (x + w // 2, y + h // 10), max(h // 10, 1), color, -1)
+    cv2.rectangle(img, (x + w // 5, y + h // 5), (x + 4 * w // 5, y + 3 * h // 5), color, -1)
+    cv2.line(img, (x + w // 5, y + h // 4), (x, y + h // 2), color, max(h // 30, 1))
+    cv2.line(img, (x + 4 * w // 5, y + h // 4), (x + w, y + h // 2), color, max(h // 30, 1))
+    cv2.line(img, (x + 2 * w // 5, y + 3 * h // 5), (x + w // 4, y + h), color, max(h // 20, 1))
+    cv2.line(img, (x + 3 * w // 5, y + 3 * h // 5), (x + 3 * w // 4, y + h), color, max(h // 20, 1))
+
+
+def make_video(path, width, height, frames, people, fps=25., seed=0):
+    """synthetic clip of `people` walkers, deterministic for a given seed"""
+    rng = np.random.RandomState(seed)
+    background = cv2.GaussianBlur(rng.randint(60, 200, (height, width, 3), dtype=np.uint8), (0, 0), 8)
+    heights = rng.randint(height // 8, height // 3, people)
+    pos = rng.uniform(0, 1, (people, 2)) * [width, height]
+    vel = rng.uniform(-3, 3, (people, 2))
+    colors = [tuple(int(c) for c in rng.randint(0, 255, 3)) for _ in range(people)]
+    limit = np.stack([width - heights // 3, height - heights], 1)
+
+    writer = cv2.VideoWriter(path + '.tmp.mp4', cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for _ in range(frames):
+        pos = pos + vel
+        vel[(pos < 0) | (pos > limit)] *= -1  # bounce on the borders
+        pos = np.clip(pos, 0, limit)
+        img = background.copy()
+        for (x, y), h, color in zip(pos.astype(int), heights, colors):
+            draw_person(img, x, y, h, color)
+        writer.write(img)
+    writer.release()
+    os.replace(path + '.tmp.mp4', path)
+
+
+def synthetic_video(folder, width, height, frames, people):
+    path = os.path.join(folder, 'synthetic_%dx%d_%dp_%df.mp4' % (width, height, people, frames))
+    if not os.path.isfile(path):
+        os.makedirs(folder, exist_ok=True)
+        make_video(path, width, height, frames, people)
+    return path
+
+
+def run_one(config):
+    """runs one configuration in this process, returns its result row"""
+    import importlib
+    module = importlib.import_module(config['script'])  # also puts yolov5/ on sys.path
+    from yolov5.utils.general import check_img_size
+
+    args = module.make_parser().parse_args([
+        '--input_path', config['video'], '--headless', '--save_txt', '', '--offline',
+        '--img-size', str(config['img_size']), '--frame_interval', str(config['frame_interval']),
+        '--backend', config['backend'], '--device', config['device'],
+        '--profile', '--profile-out', '--profile-interval', '0'])
+    args.img_size = check_img_size(args.img_size)
+    args.display, args.save_path = False, ''
+
+    with module.VideoTracker(args) as tracker:
+        t0 = time.time()
+        n_frames = tracker.run()
+        elapsed = time.time() - t0
+        stages = tracker.profiler.snapshot()['streams']
+    stages = next(iter(stages.values())) if stages else {}
+    return dict(config, frames=n_frames, seconds=elapsed, fps=n_frames / elapsed,
+                peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.,  # KiB on Linux
+                stages={name: {k: s[k] for k in ('count', 'mean', 'p50', 'p95', 'p99')} for name, s in stages.items()})
+
+
+def key(row):
+    return tuple(row[k] for k in SWEEP) + (row['script'], row['source'])
+
+
+def compare(rows, baseline, threshold):
+    """rows slower than baseline * (1 - threshold), as (row, baseline fps)"""
+    reference = {key(row): row for row in baseline['results']}
+    regressions = []
+    for row in rows:
+        ref = reference.get(key(row))
+        if ref is not None and row['fps'] < ref['fps'] * (1 - threshold):
+            regressions.append((row, ref['fps']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--script', choices=['main', 'peopletrackr'], default='main')
+    parser.add_argument('--video', type=str, default='', help='local clip instead of the synthetic videos')
+    parser.add_argument('--img-size', nargs='+', type=int, default=[640])
+    parser.add_argument('--frame-interval', nargs='+', type=int, default=[1, 2])
+    parser.add_argument('--people', nargs='+', type=int, default=[10, 40], help='synthetic: walkers per video')
+    parser.add_argument('--backend', nargs='+', default=['torch'])
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or cpu')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--frames', type=int, default=300, help='synthetic: frames per video')
+    parser.add_argument('--videos', type=str, default='benchmarks/videos', help='cache of the synthetic videos')
+    parser.add_argument('--out', type=str, default='output/bench_e2e.json')
+    parser.add_argument('--baseline', type=str, default='', help='fail when slower than this result file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed FPS drop vs the baseline')
+    parser.add_argument('--save-baseline', type=str, default='', help='also write the results here')
+    parser.add_argument('--run-one', type=str, default='', help=argparse.SUPPRESS)  # child process
+    args = parser.parse_args()
+    os.chdir(project_dir)
+
+    if args.run_one:
+        print('RESULT ' + json.dumps(run_one(json.loads(args.run_one))))
+        sys.exit(0)
+
+    configs = []
+    for img_size, interval, people, backend in itertools.product(
+            args.img_size, args.frame_interval, [0] if args.video else args.people, args.backend):
+        video = os.path.abspath(args.video) if args.video else \
+            synthetic_video(args.videos, args.width, args.height, args.frames, people)
+        configs.append({'script': args.script, 'source': os.path.basename(video), 'video': video,
+                        'img_size': img_size, 'frame_interval': interval, 'people': people,
+                        'backend': backend, 'device': args.device})
+
+    rows = []
+    print('%-8s%-10s%-8s%-10s%10s%12s%12s%12s' % ('img', 'interval', 'people', 'backend', 'fps',
+                                                  'forward p95', 'reid p95', 'rss (MB)'))
+    for config in configs:
+        proc = subprocess.run([sys.executable, os.path.join(project_dir, 'benchmarks', 'bench_e2e.py'),
+                               '--run-one', json.dumps(config)],
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        results = [line[7:] for line in proc.stdout.splitlines() if line.startswith('RESULT ')]
+        if proc.returncode or not results:
+            print(proc.stdout[-2000:])
+            raise RuntimeError('configuration failed: %s' % config)
+        row = json.loads(results[-1])
+        rows.append(row)
+        p95 = lambda name: 1000 * row['stages'].get(name, {}).get('p95', 0.)  # noqa: E731
+        print('%-8d%-10d%-8d%-10s%10.2f%12.2f%12.2f%12.1f' % (row['img_size'], row['frame_interval'], row['people'],
+                                                              row['backend'], row['fps'], p95('forward'),
+                                                              p95('reid_forward'), row['peak_rss_mb']))
+
+    report = {'time': time.time(), 'python': sys.version.split()[0], 'results': rows}
+    for path in filter(None, (args.out, args.save_baseline)):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(rows, json.load(f), args.threshold)
+        for row, fps in regressions:
+            print('REGRESSION %s: %.2f fps vs %.2f baseline (-%.1f%%)' % (
+                dict((k, row[k]) for k in SWEEP), row['fps'], fps, 100 * (1 - row['fps'] / fps)))
+        if regressions:
+            sys.exit(1)
+        print('no regression beyond %.0f%%' % (100 * args.threshold))
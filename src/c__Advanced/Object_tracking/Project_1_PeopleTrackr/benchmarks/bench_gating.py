@@ -0,0 +1,84 @@
+"""
+Cost matrices of one frame on a dense crowd: every confirmed track against every detection (appearance
+distance + Mahalanobis gating of all the pairs, IoU with all the detections) vs the candidates of the
+per-frame grid index (Tracker._gated_metric and iou_cost with index=), for 100 to 2000 people.
+The tracker only uses the grid from GRID_MIN_PAIRS track x detection pairs on (tracker.py), the
+crossover measured with this script.
+The feasible pairs (cost below the gating value) must be the same, and the IoU cost matrices equal.
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_gating.py --people 100 500 1000 2000 --frames 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from bench_cascade import Crowd  # noqa: E402
+from deep_sort.sort import iou_matching, linear_assignment  # noqa: E402
+from deep_sort.sort.nn_matching import NearestNeighborDistanceMetric  # noqa: E402
+from deep_sort.sort.tracker import Tracker  # noqa: E402
+
+
+def dense_gated_metric(tracker, tracks, dets, track_indices, detection_indices):
+    # Tracker._gated_metric before the grid index
+    features = np.array([dets[i].feature for i in detection_indices])
+    targets = np.array([tracks[i].track_id for i in track_indices])
+    cost_matrix = tracker.metric.distance(features, targets)
+    return linear_assignment.gate_cost_matrix(tracker.kf, cost_matrix, tracks, dets, track_indices,
+                                              detection_indices)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--people', nargs='+', type=int, default=[100, 250, 500, 1000, 2000])
+    parser.add_argument('--density', type=float, default=1e-5, help='people per square pixel')
+    parser.add_argument('--miss', type=float, default=0.1)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--frames', type=int, default=10)
+    args = parser.parse_args()
+
+    print('%8s%16s%14s%16s%14s%12s%10s' % ('people', 'gated all (ms)', 'grid (ms)', 'iou all (ms)', 'grid (ms)',
+                                           'candidates', 'same'))
+    for people in args.people:
+        side = int(np.sqrt(people / args.density))
+        crowd = Crowd(np.random.RandomState(people), people, side, side, args.miss)
+        tracker = Tracker(NearestNeighborDistanceMetric('cosine', 0.2, 100), max_age=70, n_init=3)
+        for _ in range(args.warmup):
+            tracker.predict()
+            tracker.update(crowd.step())
+
+        times, candidates, same = np.zeros(4), 0., True
+        for _ in range(args.frames):
+            tracker.predict()
+            detections = crowd.step()
+            tracks = tracker.tracks
+            confirmed = [i for i, t in enumerate(tracks) if t.is_confirmed()]
+            all_dets = list(range(len(detections)))
+
+            t0 = time.time()
+            ref = dense_gated_metric(tracker, tracks, detections, confirmed, all_dets)
+            t1 = time.time()
+            tracker._index_detections(detections, force=True)
+            new = tracker._gated_metric(tracks, detections, confirmed, all_dets)
+            t2 = time.time()
+            ref_iou = iou_matching.iou_cost(tracks, detections, list(range(len(tracks))), all_dets)
+            t3 = time.time()
+            new_iou = iou_matching.iou_cost(tracks, detections, list(range(len(tracks))), all_dets,
+                                            index=tracker._boxes)
+            t4 = time.time()
+
+            times += [t1 - t0, t2 - t1, t3 - t2, t4 - t3]
+            candidates += len(tracker._gating_candidates(tracks, detections, confirmed, all_dets)[0])
+            feasible = ref < linear_assignment.INFTY_COST
+            same &= bool(np.array_equal(feasible, new < linear_assignment.INFTY_COST)
+                         and np.allclose(ref[feasible], new[feasible], atol=1e-6) and np.array_equal(ref_iou, new_iou))
+            tracker.update(detections)
+        times = 1000 * times / args.frames
+        print('%8d%16.2f%14.2f%16.2f%14.2f%12.0f%10s' % (people, times[0], times[1], times[2], times[3],
+                                                         candidates / args.frames, same))
@@ -0,0 +1,87 @@
+"""
+Kalman filter steps of one frame: one KalmanFilter call per track (what Tracker did before the bank) vs
+KalmanFilterBank (all the tracks in one batched call), for 10 to 1000 tracks. Predict, update and the
+Mahalanobis gating against all the detections are timed separately; the largest relative difference
+between the two results is reported for each step (predict must be 0).
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_kalman.py --tracks 10 100 1000 --dets 100 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from deep_sort.sort.kalman_filter import KalmanFilter, KalmanFilterBank  # noqa: E402
+
+
+def random_states(kf, rng, n):
+    # initiated on random boxes, then a few predict / update cycles for realistic covariances
+    means, covs = [], []
+    for _ in range(n):
+        xyah = np.array([rng.uniform(0, 1920), rng.uniform(0, 1080), rng.uniform(0.3, 0.6), rng.uniform(40, 300)])
+        mean, cov = kf.initiate(xyah)
+        for _ in range(5):
+            mean, cov = kf.predict(mean, cov)
+            mean, cov = kf.update(mean, cov, mean[:4] + rng.randn(4) * [2., 2., 1e-2, 2.])
+        means.append(mean)
+        covs.append(cov)
+    return np.array(means), np.array(covs)
+
+
+def measurements(means, rng, n):
+    z = means[rng.randint(0, len(means), n), :4].copy()
+    return z + rng.randn(n, 4) * [5., 5., 1e-2, 5.]
+
+
+def timed(fn, repeat):
+    out = fn()
+    t0 = time.time()
+    for _ in range(repeat):
+        out = fn()
+    return 1000 * (time.time() - t0) / repeat, out
+
+
+def rel_diff(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return float((np.abs(a - b) / np.maximum(np.abs(a), 1e-12)).max()) if a.size else 0.
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', nargs='+', type=int, default=[10, 50, 100, 500, 1000])
+    parser.add_argument('--dets', type=int, default=100, help='detections gated against every track')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    kf, bank = KalmanFilter(), KalmanFilterBank()
+    rng = np.random.RandomState(0)
+    print('%8s  %-10s%14s%14s%10s%14s' % ('tracks', 'step', 'per-track', 'bank (ms)', 'speedup', 'max rel diff'))
+    for n in args.tracks:
+        means, covs = random_states(kf, rng, n)
+        z_update, z_gate = measurements(means, rng, n), measurements(means, rng, args.dets)
+        steps = (
+            ('predict',
+             lambda: [kf.predict(m, c) for m, c in zip(means, covs)],
+             lambda: bank.predict_batch(means, covs)),
+            ('update',
+             lambda: [kf.update(m, c, z) for m, c, z in zip(means, covs, z_update)],
+             lambda: bank.update_batch(means, covs, z_update)),
+            ('gating',
+             lambda: [kf.gating_distance(m, c, z_gate) for m, c in zip(means, covs)],
+             lambda: bank.gating_distance_batch(means, covs, z_gate)),
+        )
+        for name, per_track, batched in steps:
+            t_ref, ref = timed(per_track, args.repeat)
+            t_new, new = timed(batched, args.repeat)
+            if name == 'gating':
+                diff = rel_diff(np.array(ref), new)
+            else:
+                diff = max(rel_diff(np.array([r[0] for r in ref]), new[0]),
+                           rel_diff(np.array([r[1] for r in ref]), new[1]))
+            print('%8d  %-10s%14.3f%14.3f%9.1fx%14.2e' % (n, name, t_ref, t_new, t_ref / t_new, diff))
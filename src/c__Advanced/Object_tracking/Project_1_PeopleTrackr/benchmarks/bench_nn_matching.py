@@ -0,0 +1,84 @@
+"""
+Appearance metric per frame: the previous NearestNeighborDistanceMetric (dict of sample lists, one
+distance call per target) vs the ring-buffer gallery (one matrix product + masked min), for 10 to
+1000 active tracks. partial_fit and distance are timed separately, and the cost matrices are
+compared (equal up to float32 rounding, the largest difference is printed).
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_nn_matching.py --tracks 10 100 1000 --budget 100 --dets 40 --frames 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from deep_sort.sort.nn_matching import NearestNeighborDistanceMetric, _nn_cosine_distance  # noqa: E402
+
+
+class LegacyMetric(object):
+    # NearestNeighborDistanceMetric before the gallery array (cosine)
+    def __init__(self, budget):
+        self.budget = budget
+        self.samples = {}
+
+    def partial_fit(self, features, targets, active_targets):
+        for feature, target in zip(features, targets):
+            self.samples.setdefault(target, []).append(feature)
+            if self.budget is not None:
+                self.samples[target] = self.samples[target][-self.budget:]
+        self.samples = {k: self.samples[k] for k in active_targets}
+
+    def distance(self, features, targets):
+        cost_matrix = np.zeros((len(targets), len(features)))
+        for i, target in enumerate(targets):
+            cost_matrix[i, :] = _nn_cosine_distance(self.samples[target], features)
+        return cost_matrix
+
+
+def features(rng, n, dim):
+    return rng.randn(n, dim).astype(np.float32)
+
+
+def measure(metric, rng, tracks, dets, dim, frames, warmup):
+    t_fit, t_dist, costs = 0., 0., []
+    targets = np.arange(tracks)
+    for frame in range(warmup + frames):
+        fit_features = features(rng, tracks, dim)
+        query = features(rng, dets, dim)
+        t0 = time.time()
+        metric.partial_fit(fit_features, targets, targets)
+        t1 = time.time()
+        cost = metric.distance(query, targets)
+        t2 = time.time()
+        if frame >= warmup:
+            t_fit += t1 - t0
+            t_dist += t2 - t1
+            costs.append(cost)
+    return 1000 * t_fit / frames, 1000 * t_dist / frames, costs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', nargs='+', type=int, default=[10, 50, 100, 500, 1000])
+    parser.add_argument('--budget', type=int, default=100)
+    parser.add_argument('--dets', type=int, default=40, help='detections per frame')
+    parser.add_argument('--dim', type=int, default=512, help='ReID feature size')
+    parser.add_argument('--frames', type=int, default=20, help='timed frames, after budget frames of warm-up')
+    args = parser.parse_args()
+
+    print('%8s%14s%14s%14s%14s%10s%10s' % ('tracks', 'fit (ms)', 'dist (ms)', 'fit new', 'dist new',
+                                          'speedup', 'max diff'))
+    for tracks in args.tracks:
+        # same random stream for both: the galleries hold the same samples
+        ref = measure(LegacyMetric(args.budget), np.random.RandomState(tracks), tracks, args.dets, args.dim,
+                      args.frames, args.budget)
+        new = measure(NearestNeighborDistanceMetric('cosine', 0.2, args.budget), np.random.RandomState(tracks),
+                      tracks, args.dets, args.dim, args.frames, args.budget)
+        diff = max(float(np.abs(a - b).max()) for a, b in zip(ref[2], new[2]))
+        print('%8d%14.2f%14.2f%14.2f%14.2f%9.1fx%10.1e' % (tracks, ref[0], ref[1], new[0], new[1],
+                                                           (ref[0] + ref[1]) / (new[0] + new[1]), diff))
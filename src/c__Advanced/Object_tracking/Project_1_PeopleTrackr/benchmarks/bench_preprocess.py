@@ -0,0 +1,95 @@
+"""
+Per-frame cost of the detector preprocessing: yolov5 letterbox + numpy/torch conversions
+vs the preallocated LetterboxPreprocessor.
+
+Reports time per frame and the memory allocated per frame on the numpy/cv2 side (tracemalloc)
+and on the torch side (torch.profiler, when available).
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_preprocess.py --width 1920 --height 1080 --img-size 640 --frames 200
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import torch
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from utils_ds.preprocess import LetterboxPreprocessor  # noqa: E402
+from yolov5.utils.datasets import letterbox  # noqa: E402
+
+
+def baseline(im0, img_size, device, half):
+    # what VideoTracker.image_track used to do for every frame
+    img = letterbox(im0, new_shape=img_size)[0]
+    img = img[:, :, ::-1].transpose(2, 0, 1)
+    img = np.ascontiguousarray(img)
+    img = torch.from_numpy(img).to(device)
+    img = img.half() if half else img.float()
+    img /= 255.0
+    return img.unsqueeze(0)
+
+
+def measure(fn, frames):
+    # time per frame
+    t0 = time.time()
+    for im0 in frames:
+        fn(im0)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    ms = 1000 * (time.time() - t0) / len(frames)
+
+    # numpy / cv2 bytes allocated per frame (transient peak above the steady state)
+    tracemalloc.start()
+    peaks = []
+    for im0 in frames:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        fn(im0)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    # torch bytes allocated per frame
+    torch_bytes = float('nan')
+    try:
+        from torch.profiler import profile, ProfilerActivity
+        with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+            for im0 in frames[:20]:
+                fn(im0)
+        events = prof.key_averages()
+        torch_bytes = sum(max(e.cpu_memory_usage, 0) for e in events if e.key.startswith('aten::empty')) / 20
+    except Exception:
+        pass
+    return ms, np.mean(peaks) / 2 ** 20, torch_bytes / 2 ** 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--img-size', type=int, default=640)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    half = device.type != 'cpu'
+    rng = np.random.RandomState(0)
+    frames = [rng.randint(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+
+    pre = LetterboxPreprocessor(frames[0].shape, args.img_size, 1, device, half)
+    ref = baseline(frames[0], args.img_size, device, half)
+    out = pre([frames[0]])[0]
+    assert ref.shape == out.shape and torch.equal(ref, out), "preprocessor output differs from letterbox path"
+
+    print('%-24s%12s%18s%18s' % ('path', 'ms/frame', 'numpy MB/frame', 'torch MB/frame'))
+    for name, fn in (('letterbox + convert', lambda im0: baseline(im0, args.img_size, device, half)),
+                     ('LetterboxPreprocessor', lambda im0: pre([im0]))):
+        ms, np_mb, torch_mb = measure(fn, frames)
+        print('%-24s%12.2f%18.2f%18.2f' % (name, ms, np_mb, torch_mb))
@@ -0,0 +1,88 @@
+"""
+Accuracy and ReID cost of DeepSort with and without the appearance feature cache (deep_sort/feature_cache.py)
+on a MOT16/17 style sequence. The detector runs once per frame, both runs track the same detections.
+Metrics come from utils_ds.evaluation.Evaluator (py-motmetrics).
+
+Usage (from the Project_1_PeopleTrackr folder, on <data_root>/<seq>/img1/*.jpg + <data_root>/<seq>/gt/gt.txt):
+    $ python benchmarks/bench_reid_cache.py --data-root data/MOT17/train --seq MOT17-09 --iou 0.9 --pixels 6 --refresh 10
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from main import VideoTracker, make_parser, deepsort_dir  # noqa: E402
+from deep_sort import build_tracker, FeatureCache  # noqa: E402
+from utils_ds.evaluation import Evaluator  # noqa: E402
+from utils_ds.io import write_results  # noqa: E402
+from utils_ds.parser import get_config  # noqa: E402
+from yolov5.utils.general import check_img_size  # noqa: E402
+
+
+def run(tracker, deepsort, images, dets, out_path):
+    tracker.deepsort = deepsort
+    results, reid_time = [], 0.
+    for (fid, path), det in zip(images, dets):
+        im0 = cv2.imread(path)
+        t0 = time.time()
+        outputs, _ = tracker.track(det, im0)
+        reid_time += time.time() - t0
+        outputs = np.asarray(outputs).reshape(-1, 6)
+        tlwhs = outputs[:, :4].astype(float)
+        tlwhs[:, 2:] -= tlwhs[:, :2]
+        results.append((fid, tlwhs, outputs[:, 4].tolist()))
+    write_results(out_path, results, 'mot')
+    return reid_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-root', type=str, required=True)
+    parser.add_argument('--seq', type=str, required=True)
+    parser.add_argument('--frames', type=int, default=0, help='first N frames only (0: all)')
+    parser.add_argument('--iou', type=float, default=0.9)
+    parser.add_argument('--pixels', type=float, default=6.)
+    parser.add_argument('--refresh', type=int, default=10)
+    parser.add_argument('--device', default='')
+    parser.add_argument('--out', type=str, default='output/bench_reid_cache')
+    bench_args = parser.parse_args()
+    os.chdir(project_dir)
+
+    args = make_parser().parse_args(['--headless', '--save_txt', '', '--offline', '--frame_interval', '1',
+                                     '--device', bench_args.device])
+    args.img_size = check_img_size(args.img_size)
+    args.display, args.save_path = False, ''
+    tracker = VideoTracker(args)
+    cfg = get_config()
+    cfg.merge_from_file(os.path.join(deepsort_dir, args.config_deepsort))
+
+    images = sorted(glob.glob(os.path.join(bench_args.data_root, bench_args.seq, 'img1', '*.jpg')))
+    images = images[:bench_args.frames] if bench_args.frames else images
+    images = [(int(os.path.splitext(os.path.basename(p))[0]), p) for p in images]
+    dets = [tracker.detect_batch([cv2.imread(p)])[0][0] for _, p in images]  # same detections for both runs
+
+    os.makedirs(bench_args.out, exist_ok=True)
+    evaluator = Evaluator(bench_args.data_root, bench_args.seq, 'mot')
+    accs, names, caches = [], [], []
+    for name, cache in (('no cache', None),
+                        ('cache', FeatureCache(bench_args.iou, bench_args.pixels, bench_args.refresh))):
+        deepsort = build_tracker(cfg, use_cuda=tracker.device.type != 'cpu',
+                                 extractor=tracker.deepsort.extractor, feature_cache=cache)
+        path = os.path.join(bench_args.out, name.replace(' ', '_') + '.txt')
+        seconds = run(tracker, deepsort, images, dets, path)
+        accs.append(evaluator.eval_file(path))
+        names.append(name)
+        print('%-10s DeepSort time: %.2fs (%.1f ms/frame)' % (name, seconds, 1000 * seconds / len(images)))
+        if cache is not None:
+            stats = cache.stats()
+            print('%-10s hit rate: %.1f%%, ~%.2fs of ReID saved, recomputed: %s' % (
+                name, 100 * stats['hit_rate'], stats['saved_seconds'], stats['misses']))
+
+    print(Evaluator.get_summary(accs, names, metrics=('mota', 'idf1', 'num_switches', 'precision', 'recall')))
@@ -0,0 +1,77 @@
+"""
+ReID input preprocessing per frame: the per-crop path (crop, astype, cv2.resize, ToTensor, Normalize,
+torch.cat) vs BoxPreprocessor (one roi_align over all the boxes), for 1 to 200 crops.
+Also reports the largest difference between the two batches (normalized units).
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_reid_preprocess.py --width 1920 --height 1080 --crops 1 10 50 100 200 --device cpu
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from deep_sort.deep.feature_extractor import BoxPreprocessor  # noqa: E402
+
+SIZE = (64, 128)
+NORM = transforms.Compose([
+    transforms.ToTensor(),
+    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+])
+
+
+def per_crop(img, boxes, device):
+    # what DeepSort._get_features + Extractor._preprocess did before BoxPreprocessor
+    crops = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes]
+    batch = torch.cat([NORM(cv2.resize(im.astype(np.float32) / 255., SIZE)).unsqueeze(0) for im in crops], dim=0)
+    return batch.float().to(device)
+
+
+def random_boxes(rng, n, width, height):
+    w = rng.randint(30, 200, n)
+    h = (w * rng.uniform(1.8, 3.2, n)).astype(int)
+    x1 = rng.randint(0, width - w)
+    y1 = rng.randint(0, np.maximum(height - h, 1))
+    return np.stack([x1, y1, x1 + w, np.minimum(y1 + h, height - 1)], 1)
+
+
+def measure(fn, img, boxes, device, repeat):
+    out = fn(img, boxes, device)  # warm-up
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    t0 = time.time()
+    for _ in range(repeat):
+        out = fn(img, boxes, device)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    return 1000 * (time.time() - t0) / repeat, out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--crops', nargs='+', type=int, default=[1, 5, 10, 25, 50, 100, 200])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    rng = np.random.RandomState(0)
+    img = cv2.GaussianBlur(rng.randint(0, 255, (args.height, args.width, 3), dtype=np.uint8), (0, 0), 2)
+    batched = BoxPreprocessor(SIZE, device)
+
+    print('%8s%16s%16s%10s%14s' % ('crops', 'per-crop (ms)', 'batched (ms)', 'speedup', 'max |diff|'))
+    for n in args.crops:
+        boxes = random_boxes(rng, n, args.width, args.height)
+        t_ref, ref = measure(per_crop, img, boxes, device, args.repeat)
+        t_new, new = measure(lambda im, b, d: batched(im, b), img, boxes, device, args.repeat)
+        print('%8d%16.2f%16.2f%10.1fx%14.4f' % (n, t_ref, t_new, t_ref / t_new, (ref - new).abs().max().item()))
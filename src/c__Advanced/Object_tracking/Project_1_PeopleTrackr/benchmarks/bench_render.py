@@ -0,0 +1,95 @@
+"""
+Rendering cost per frame: the previous draw_boxes (trajectory layer blended once per box, text size
+measured for every label) vs Renderer (one blend per frame, cached label sprites), at full and
+preview resolution. Also checks that the full resolution output is pixel-identical.
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_render.py --people 60 --width 1920 --height 1080 --frames 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from utils_ds.draw import Renderer, compute_color_for_labels, inc_int  # noqa: E402
+
+
+def legacy_overlay(image, clr_trails):
+    gray = cv2.cvtColor(clr_trails, cv2.COLOR_BGR2GRAY)
+    mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY)[1]
+    image = cv2.bitwise_and(image, image, mask=cv2.bitwise_not(mask))
+    overlay = cv2.bitwise_and(clr_trails, clr_trails, mask=mask)
+    return cv2.bitwise_or(overlay, image)
+
+
+def legacy_draw(img, bbox, identities, mask, trajectories):
+    # what draw_boxes did before Renderer (no focused individual)
+    for i, box in enumerate(bbox):
+        x1, y1, x2, y2 = [int(v) for v in box]
+        id = int(identities[i])
+        color = compute_color_for_labels(id)
+        label = '{}{:d}'.format("", id)
+        t_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_PLAIN, 2, 2)[0]
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 3)
+        cv2.rectangle(img, (x1, y1), (x1 + t_size[0] + 3, y1 + t_size[1] + 4), color, -1)
+        cv2.putText(img, label, (x1, y1 + t_size[1] + 4), cv2.FONT_HERSHEY_PLAIN, 2, [255, 255, 255], 2)
+        if trajectories and len(trajectories[id]) == 2:
+            cv2.line(mask, trajectories[id][0], trajectories[id][1], inc_int(color), 3)
+        if trajectories:
+            img = legacy_overlay(img, mask)
+    return img
+
+
+def scene(rng, people, frames, width, height):
+    pos = rng.randint(0, [width - 120, height - 250], (people, 2)).astype(float)
+    vel = rng.uniform(-4, 4, (people, 2))
+    out = []
+    for _ in range(frames):
+        pos = np.clip(pos + vel, 0, [width - 120, height - 250])
+        out.append(np.hstack([pos, pos + [100, 230]]).astype(int))
+    return out
+
+
+def measure(draw, frames, boxes, height, width):
+    mask = np.zeros((height, width, 3), np.uint8)
+    ids = np.arange(len(boxes[0]))
+    trajectories = {i: [] for i in ids}
+    t0 = time.time()
+    for img, bbox in zip(frames, boxes):
+        for i, b in zip(ids, bbox):
+            trajectories[i] = (trajectories[i] + [(int((b[0] + b[2]) / 2), int((b[1] + b[3]) / 2))])[-2:]
+        out = draw(img.copy(), bbox, ids, mask, trajectories)
+    return 1000 * (time.time() - t0) / len(frames), out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--people', type=int, default=60)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--preview-scale', type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    boxes = scene(rng, args.people, args.frames, args.width, args.height)
+    frames = [rng.randint(0, 255, (args.height, args.width, 3), dtype=np.uint8)] * args.frames
+
+    full, preview = Renderer(), Renderer(preview_scale=args.preview_scale)
+    cases = (('draw_boxes (before)', legacy_draw),
+             ('Renderer', lambda img, b, ids, m, t: full.draw(img, b, ids, mask=m, trajectories=t)),
+             ('Renderer preview x%.2f' % args.preview_scale,
+              lambda img, b, ids, m, t: preview.draw(img, b, ids, mask=m, trajectories=t)))
+    outs = []
+    print('%-28s%12s' % ('renderer', 'ms/frame'))
+    for name, draw in cases:
+        ms, out = measure(draw, frames, boxes, args.height, args.width)
+        outs.append(out)
+        print('%-28s%12.2f' % (name, ms))
+    print('full resolution output identical: %s' % np.array_equal(outs[0], outs[1]))
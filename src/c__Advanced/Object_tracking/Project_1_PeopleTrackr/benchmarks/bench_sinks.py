@@ -0,0 +1,84 @@
+"""
+Throughput of the output sinks seen from the tracking loop: the legacy one-txt-per-frame layout and
+blocking cv2.VideoWriter vs the buffered MOT / columnar sinks and the threaded video writer.
+
+Time is measured until close() returns, so pending background writes are included.
+Point --out to the storage used in production (e.g. an NFS mount) to see the effect of file creation.
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/bench_sinks.py --frames 2000 --boxes 30 --out /mnt/nfs/bench
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from utils_ds.sinks import ThreadedVideoWriter, build_sink, SINKS  # noqa: E402
+
+
+def fake_outputs(rng, n_boxes, width, height):
+    xy = rng.randint(0, min(width, height) - 100, (n_boxes, 2))
+    wh = rng.randint(20, 100, (n_boxes, 2))
+    return np.hstack([xy, xy + wh, np.arange(n_boxes)[:, None], np.zeros((n_boxes, 1), dtype=int)])
+
+
+def run(fmt, video, outputs, frame, folder, threaded):
+    os.makedirs(folder)
+    sink = build_sink(fmt, folder + os.sep)
+    writer = None
+    if video:
+        size = (frame.shape[1], frame.shape[0])
+        path = os.path.join(folder, 'results.mp4')
+        writer = ThreadedVideoWriter(path, 'mp4v', 25, size) if threaded else \
+            cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 25, size)
+
+    t0 = time.time()
+    for idx_frame, out in enumerate(outputs):
+        if writer is not None:
+            writer.write(frame)
+        sink.write(idx_frame, out)
+    sink.close()
+    if writer is not None:
+        writer.release()
+    elapsed = time.time() - t0
+
+    n_files = sum(len(files) for _, _, files in os.walk(folder))
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(folder) for f in files)
+    return len(outputs) / elapsed, n_files, size / 2 ** 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--boxes', type=int, default=30, help='tracked objects per frame')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--out', type=str, default='', help='output folder (default: a temporary folder)')
+    parser.add_argument('--no-video', action='store_true', help='only the txt/binary outputs')
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    outputs = [fake_outputs(rng, args.boxes, args.width, args.height) for _ in range(args.frames)]
+    frame = rng.randint(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+    root = args.out or tempfile.mkdtemp()
+
+    print('%-34s%12s%10s%10s' % ('sink', 'frames/s', 'files', 'MB'))
+    cases = [('frames + cv2.VideoWriter (legacy)', 'frames', False)] + \
+            [('%s + ThreadedVideoWriter' % fmt, fmt, True) for fmt in SINKS]
+    for name, fmt, threaded in cases:
+        if args.no_video:
+            name = name.split(' + ')[0]
+        folder = os.path.join(root, '%s_%s' % (fmt, 'threaded' if threaded else 'blocking'))
+        shutil.rmtree(folder, ignore_errors=True)
+        fps, n_files, mb = run(fmt, not args.no_video, outputs, frame, folder, threaded)
+        print('%-34s%12.1f%10d%10.2f' % (name, fps, n_files, mb))
+    if not args.out:
+        shutil.rmtree(root)
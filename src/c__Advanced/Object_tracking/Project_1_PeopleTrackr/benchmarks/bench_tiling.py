@@ -0,0 +1,77 @@
+"""
+Recall vs latency of the detector with and without tiled inference.
+
+Usage (from the Project_1_PeopleTrackr folder, on a MOT16/17 style sequence: <seq>/img1/*.jpg + <seq>/gt/gt.txt):
+    $ python benchmarks/bench_tiling.py --seq data/MOT17-04 --tile-size 640 --tile-overlap 128 --frames 100
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from main import VideoTracker, make_parser  # noqa: E402
+from utils_ds.io import read_mot_results  # noqa: E402
+from yolov5.utils.general import check_img_size  # noqa: E402
+
+
+def box_iou_np(a, b):
+    # a (n,4), b (m,4) xyxy -> (n,m)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def recall_and_latency(tracker, images, gt, iou_thres=0.5):
+    n_gt, n_hit, times = 0, 0, []
+    for fid, path in images:
+        im0 = cv2.imread(path)
+        t0 = time.time()
+        det = tracker.detect_batch([im0])[0][0]
+        times.append(time.time() - t0)
+
+        gt_boxes = np.array([tlwh for tlwh, _, _ in gt.get(fid, [])], dtype=float).reshape(-1, 4)
+        gt_boxes[:, 2:] += gt_boxes[:, :2]
+        n_gt += len(gt_boxes)
+        if det is None or not len(det) or not len(gt_boxes):
+            continue
+        iou = box_iou_np(gt_boxes, det[:, :4].cpu().numpy())
+        n_hit += int((iou.max(axis=1) >= iou_thres).sum())
+    return n_hit / max(n_gt, 1), 1000 * np.median(times), 1000 * np.mean(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(epilog='any other option is passed to the tracker (see main.py --help)')
+    parser.add_argument('--seq', type=str, required=True, help='MOT sequence folder (img1/ and gt/gt.txt)')
+    parser.add_argument('--frames', type=int, default=100, help='number of frames to evaluate')
+    parser.add_argument('--tile-size', type=int, default=640, help='tile size (pixels)')
+    bench_args, tracker_argv = parser.parse_known_args()
+
+    args = make_parser().parse_args(['--headless', '--save_txt', '', '--frame_interval', '1', '--classes', '0',
+                                     '--parity-frames', '0'] + tracker_argv)
+    args.img_size = check_img_size(args.img_size)
+    args.display, args.save_path = False, ''
+
+    images = sorted(glob.glob(os.path.join(bench_args.seq, 'img1', '*.jpg')))[:bench_args.frames]
+    images = [(int(os.path.splitext(os.path.basename(p))[0]), p) for p in images]
+    gt = read_mot_results(os.path.join(bench_args.seq, 'gt', 'gt.txt'), is_gt=True, is_ignore=False)
+
+    tile_size = bench_args.tile_size
+    tracker = VideoTracker(args)
+    tracker.detect_batch([cv2.imread(images[0][1])])  # warm-up
+
+    print('%-28s%10s%14s%12s' % ('mode', 'recall', 'median(ms)', 'mean(ms)'))
+    for name, tile in (('letterbox %d' % args.img_size, 0),
+                       ('tiled %d/%d' % (tile_size, args.tile_overlap), tile_size)):
+        args.tile_size = tile
+        recall, med, mean = recall_and_latency(tracker, images, gt)
+        print('%-28s%10.3f%14.1f%12.1f' % (name, recall, med, mean))
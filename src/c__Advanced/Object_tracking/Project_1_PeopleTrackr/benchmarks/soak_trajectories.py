@@ -0,0 +1,98 @@
+"""
+Soak test of the trajectory store: simulates a long run with constant track churn (people entering
+and leaving, ever increasing track IDs) and samples the memory held by Python (tracemalloc) every
+`--sample` frames. The store must reach a plateau: it fails if the last samples grow more than
+`--tolerance` over the samples of the first quarter after warm-up.
+
+Every `--render-every` frames the trails are also drawn, as they are when a frame is displayed or written.
+
+Usage (from the Project_1_PeopleTrackr folder):
+    $ python benchmarks/soak_trajectories.py --frames 2000000 --people 40 --fps 25
+    (2M frames at 25 fps is ~22 hours of video)
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_dir)
+
+from utils_ds.draw import Renderer  # noqa: E402
+from utils_ds.trajectories import TrajectoryStore  # noqa: E402
+
+
+class Crowd(object):
+    """people walking across a width x height scene, each one leaves after `stay` frames on average"""
+
+    def __init__(self, rng, people, width, height, stay):
+        self.rng, self.width, self.height, self.stay = rng, width, height, stay
+        self.next_id = 1
+        self.ids = np.arange(people) + 1
+        self.next_id += people
+        self.pos = rng.uniform(0, [width - 100, height - 230], (people, 2))
+        self.vel = rng.uniform(-3, 3, (people, 2))
+
+    def step(self):
+        leave = self.rng.rand(len(self.ids)) < 1. / self.stay
+        n = int(leave.sum())
+        if n:  # replaced by newcomers: new IDs, like DeepSort after a track is deleted
+            self.ids[leave] = np.arange(self.next_id, self.next_id + n)
+            self.next_id += n
+            self.pos[leave] = self.rng.uniform(0, [self.width - 100, self.height - 230], (n, 2))
+            self.vel[leave] = self.rng.uniform(-3, 3, (n, 2))
+        self.pos = np.clip(self.pos + self.vel, 0, [self.width - 100, self.height - 230])
+        boxes = np.hstack([self.pos, self.pos + [100, 230]])
+        return np.hstack([boxes, self.ids[:, None], np.zeros((len(self.ids), 1))]).astype(int)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--people', type=int, default=40)
+    parser.add_argument('--fps', type=float, default=25.)
+    parser.add_argument('--stay', type=int, default=500, help='mean frames a person stays in the scene')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--render-every', type=int, default=10)
+    parser.add_argument('--sample', type=int, default=10000, help='frames between memory samples')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='allowed growth after warm-up')
+    parser.add_argument('--trail-points', type=int, default=64)
+    parser.add_argument('--trail-seconds', type=float, default=10.)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    crowd = Crowd(rng, args.people, args.width, args.height, args.stay)
+    store = TrajectoryStore(args.trail_points, args.trail_seconds, args.trail_seconds)
+    renderer = Renderer()
+    img = np.zeros((args.height, args.width, 3), np.uint8)
+
+    tracemalloc.start()
+    samples = []
+    t0 = time.time()
+    print('%12s%12s%12s%14s' % ('frame', 'tracks', 'KiB', 'ms/frame'))
+    for idx_frame in range(args.frames):
+        outputs = crowd.step()
+        store.update(idx_frame / args.fps, outputs)
+        if idx_frame % args.render_every == 0:
+            renderer.draw(img, outputs[:, :4], outputs[:, -2], trajectories=store)
+        if (idx_frame + 1) % args.sample == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            samples.append(current)
+            print('%12d%12d%12.1f%14.3f' % (idx_frame + 1, len(store), current / 1024.,
+                                            1000 * (time.time() - t0) / args.sample))
+            t0 = time.time()
+    tracemalloc.stop()
+
+    # warm-up: the first trail_seconds fill the trails, then the memory must stay flat
+    warm = int(np.ceil(args.trail_seconds * 2 * args.fps / args.sample))
+    steady = samples[warm:]
+    assert len(steady) >= 4, 'run more frames (or sample more often) to judge the plateau'
+    first, last = np.mean(steady[:max(1, len(steady) // 4)]), np.mean(steady[-max(1, len(steady) // 4):])
+    growth = (last - first) / first
+    print('tracks created: %d, memory growth after warm-up: %+.1f%%' % (crowd.next_id - 1, 100 * growth))
+    assert growth <= args.tolerance, 'memory keeps growing'
+    print('plateau OK')
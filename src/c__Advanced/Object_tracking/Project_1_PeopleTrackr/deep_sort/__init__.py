@@ -1,14 +1,16 @@
 from .deep_sort import DeepSort
+from .feature_cache import FeatureCache
 
 
-__all__ = ['DeepSort', 'build_tracker']
+__all__ = ['DeepSort', 'FeatureCache', 'build_tracker']
 
 
-def build_tracker(cfg, use_cuda):
+def build_tracker(cfg, use_cuda, extractor=None, feature_cache=None, roi_align=False):
     return DeepSort(cfg.DEEPSORT.REID_CKPT, 
                 max_dist=cfg.DEEPSORT.MAX_DIST, min_confidence=cfg.DEEPSORT.MIN_CONFIDENCE, 
                 nms_max_overlap=cfg.DEEPSORT.NMS_MAX_OVERLAP, max_iou_distance=cfg.DEEPSORT.MAX_IOU_DISTANCE, 
-                max_age=cfg.DEEPSORT.MAX_AGE, n_init=cfg.DEEPSORT.N_INIT, nn_budget=cfg.DEEPSORT.NN_BUDGET, use_cuda=use_cuda)
+                max_age=cfg.DEEPSORT.MAX_AGE, n_init=cfg.DEEPSORT.N_INIT, nn_budget=cfg.DEEPSORT.NN_BUDGET, use_cuda=use_cuda,
+                extractor=extractor, feature_cache=feature_cache, roi_align=roi_align)
     
 
 
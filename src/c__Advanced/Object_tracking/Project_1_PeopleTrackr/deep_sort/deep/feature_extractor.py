@@ -1,17 +1,71 @@
 import torch
 import torchvision.transforms as transforms
+from torchvision.ops import roi_align
 import numpy as np
 import cv2
 import logging
 
 from .model import Net
 
+
+class BoxPreprocessor(object):
+    """
+    ReID input of all the boxes of one frame with one resampling op (opt-in, see Extractor).
+
+    The part of the frame covering all the boxes (+1 pixel for the bilinear neighbours) is moved to the
+    device once as a 1x3xHxW tensor (uint8, converted to float there), then one roi_align (bilinear,
+    one sample per output pixel, half-pixel aligned) with batch index 0 resamples every box straight to
+    size. Normalization is applied to the whole batch at the end. Same channel order as the per-crop
+    path (the frame is not converted to RGB).
+
+    On CPU it is slower than the per-crop path (benchmarks/bench_reid_preprocess.py), and its output
+    differs from cv2.resize by up to ~0.06 (normalized units): roi_align does not sample exactly like
+    INTER_LINEAR when downscaling. Only worth measuring on a GPU with many crops per frame.
+
+    Args:
+        size (tuple): (width, height) of the ReID input
+        device (str): device of the ReID net
+        mean (list): per channel mean, on the 0-1 scale
+        std (list): per channel std
+    """
+
+    def __init__(self, size=(64, 128), device='cpu', mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
+        self.size = size
+        self.device = torch.device(device)
+        self.scale = (1. / 255 / torch.tensor(std)).view(1, 3, 1, 1).to(self.device)
+        self.shift = (-torch.tensor(mean) / torch.tensor(std)).view(1, 3, 1, 1).to(self.device)
+
+    def __call__(self, img, boxes):
+        """
+        :param img: frame, HxWx3 uint8
+        :param boxes: (n, 4) int x1 y1 x2 y2, the crops are img[y1:y2, x1:x2]
+        :return: (n, 3, height, width) float tensor on the device
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        height, width = img.shape[:2]
+        x0, y0 = max(boxes[:, 0].min() - 1, 0), max(boxes[:, 1].min() - 1, 0)
+        x1, y1 = min(boxes[:, 2].max() + 1, width), min(boxes[:, 3].max() + 1, height)
+        frame = torch.from_numpy(np.ascontiguousarray(img[y0:y1, x0:x1])).to(self.device)
+        frame = frame.permute(2, 0, 1).unsqueeze(0).float()  # 1x3xhxw, 0-255
+
+        rois = np.zeros((len(boxes), 5), dtype=np.float32)  # batch index 0, box in the frame part
+        rois[:, 1:] = boxes - [x0, y0, x0, y0]
+        rois = torch.from_numpy(rois).to(self.device)
+        batch = roi_align(frame, rois, (self.size[1], self.size[0]), spatial_scale=1., sampling_ratio=1, aligned=True)
+        return batch * self.scale + self.shift  # (x / 255 - mean) / std
+
+
 class Extractor(object):
-    def __init__(self, model_path, use_cuda=True):
-        self.net = Net(reid=True)
+    def __init__(self, model_path, use_cuda=True, roi_align=False):
         self.device = "cuda" if torch.cuda.is_available() and use_cuda else "cpu"
-        state_dict = torch.load(model_path, map_location=lambda storage, loc: storage)['net_dict']
-        self.net.load_state_dict(state_dict)
+        if model_path.endswith('.int8.pt'):
+            # INT8 TorchScript written by quantize.py, quantized kernels only run on CPU
+            self.net = torch.jit.load(model_path, map_location='cpu').eval()
+            self.device = "cpu"
+        else:
+            self.net = Net(reid=True)
+            state_dict = torch.load(model_path, map_location=lambda storage, loc: storage)['net_dict']
+            self.net.load_state_dict(state_dict)
         logger = logging.getLogger("root.tracker")
         logger.info("Loading weights from {}... Done!".format(model_path))
         self.net.to(self.device)
@@ -20,7 +74,8 @@ class Extractor(object):
             transforms.ToTensor(),
             transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
         ])
-        
+        # per-crop resize by default, BoxPreprocessor (one roi_align per frame) on request: slower on CPU
+        self.box_preprocessor = BoxPreprocessor(self.size, self.device) if roi_align else None
 
 
     def _preprocess(self, im_crops):
@@ -39,8 +94,17 @@ class Extractor(object):
         return im_batch
 
 
+    def _preprocess_boxes(self, img, boxes):
+        """_preprocess([img[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes]), or BoxPreprocessor if enabled"""
+        if self.box_preprocessor is None:
+            return self._preprocess([img[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes])
+        return self.box_preprocessor(img, boxes)
+
     def __call__(self, im_crops):
-        im_batch = self._preprocess(im_crops)
+        return self.forward(self._preprocess(im_crops))
+
+    def forward(self, im_batch):
+        """features of a batch made by _preprocess"""
         with torch.no_grad():
             im_batch = im_batch.to(self.device)
             features = self.net(im_batch)
@@ -1,3 +1,5 @@
+import time
+
 import numpy as np
 import torch
 
@@ -6,6 +8,7 @@ from .sort.nn_matching import NearestNeighborDistanceMetric
 from .sort.preprocessing import non_max_suppression
 from .sort.detection import Detection
 from .sort.tracker import Tracker
+from utils_ds.profiler import NULL_PROFILER
 
 
 __all__ = ['DeepSort']
@@ -13,7 +16,7 @@ __all__ = ['DeepSort']
 
 class DeepSort(object):
 
-    def __init__(self, model_path, max_dist=0.2, min_confidence=0.3, nms_max_overlap=1.0, max_iou_distance=0.7, max_age=70, n_init=3, nn_budget=100, use_cuda=True):
+    def __init__(self, model_path, max_dist=0.2, min_confidence=0.3, nms_max_overlap=1.0, max_iou_distance=0.7, max_age=70, n_init=3, nn_budget=100, use_cuda=True, extractor=None, feature_cache=None, roi_align=False):
         """
         Initialize the deepsort object with the given parameters.
 
@@ -27,11 +30,16 @@ class DeepSort(object):
         - n_init (int): the minimum number of frames required to initiate a track (default 3)
         - nn_budget (int): the maximum number of previous frames to consider when matching (default 100)
         - use_cuda (bool): whether to use CUDA for model inference (default True)
+        - extractor (Extractor): an already loaded feature extractor to share between several trackers (default None, load from model_path)
+        - feature_cache (FeatureCache): reuse the last feature of a track for a detection that barely changed (default None, always extract)
+        - roi_align (bool): build the ReID batch with one roi_align instead of per-crop resizes, when the extractor is loaded here (default False)
         """
         self.min_confidence = min_confidence
         self.nms_max_overlap = nms_max_overlap
 
-        self.extractor = Extractor(model_path, use_cuda=use_cuda)
+        self.extractor = extractor if extractor is not None else Extractor(model_path, use_cuda=use_cuda, roi_align=roi_align)
+        self.feature_cache = feature_cache
+        self._cached = None  # (boxes, sources, thumbs) of the detections of the current frame, for the cache update
 
         max_cosine_distance = max_dist
         nn_budget = 100
@@ -39,30 +47,45 @@ class DeepSort(object):
 
         # tracker maintain a list contains(self.tracks) for each Track object
         self.tracker = Tracker(metric, max_iou_distance=max_iou_distance, max_age=max_age, n_init=n_init)
+        self.profiler = NULL_PROFILER
+
+    def set_profiler(self, profiler):
+        """times the ReID and tracking stages with a utils_ds.profiler.Profiler"""
+        self.profiler = profiler
+        self.tracker.profiler = profiler
 
-    def update(self, bbox_xywh, confidences, classes, ori_img):
+    def update(self, bbox_xywh, confidences, classes, ori_img, features=None):
         # bbox_xywh (#obj,4), [xc,yc, w, h]     bounding box for each person
         # conf (#obj,1)
         # classes (#obj,1)
+        # features (#obj,512), optional: appearance features already extracted (e.g. batched across streams)
         
         #################################### (Stage 2) - PreProcessing *********************************************
         self.height, self.width = ori_img.shape[:2]
 
         # get appearance feature with neural network (Deep) *********************************************************
-        features = self._get_features(bbox_xywh, ori_img)
+        if features is None:
+            features = self._get_features(bbox_xywh, ori_img)
 
         bbox_tlwh = self._xywh_to_tlwh(bbox_xywh)   # # [cx,cy,w,h] -> [x1,y1,w,h]   top left
 
         #  generate detections class object for each person *********************************************************
         # filter object with less confidence
         # each Detection obj maintain the location(bbox_tlwh), confidence(conf), and appearance feature
-        detections = [Detection(bbox_tlwh[i], conf, features[i], classes[i]) for i,conf in enumerate(confidences) if conf>self.min_confidence]
+        keep = [i for i,conf in enumerate(confidences) if conf>self.min_confidence]  # index in bbox_xywh of each detection
+        detections = [Detection(bbox_tlwh[i], confidences[i], features[i], classes[i]) for i in keep]
 
         # run on non-maximum supression (useless) *******************************************************************
         boxes = np.array([d.tlwh for d in detections])
         scores = np.array([d.confidence for d in detections])
         indices = non_max_suppression(boxes, self.nms_max_overlap, scores)  # Here, nms_max_overlap is 1
         detections = [detections[i] for i in indices]
+        keep = [keep[i] for i in indices]
+        if self._cached is not None:
+            # features copied from the cache are only matched against, partial_fit gets the extracted ones
+            sources = self._cached[1]
+            for detection, i in zip(detections, keep):
+                detection.reused = sources[i] is not None
 
         #################################### (Stage 2) - Estimtion *********************************************
         self.tracker.predict()      # predict based on t-1 info
@@ -70,8 +93,30 @@ class DeepSort(object):
 
         #################################### (Stage 3 & 4) *********************************************
         self.tracker.update(detections)
+        if self._cached is not None:
+            assignment = {track_id: keep[d] for track_id, d in self.tracker.last_assignment.items()}
+            self.feature_cache.update(assignment, *self._cached, features=features,
+                                      live_ids=[t.track_id for t in self.tracker.tracks])
+            self._cached = None
 
         # output bbox identities ************************************************************************************
+        return self._tracks_to_outputs()
+
+    def predict_only(self):
+        """
+        Lightweight step for frames on which the detector is skipped: advances every track with the
+        Kalman filter prediction and returns the predicted boxes, without running ReID or touching
+        the appearance metric.
+
+        Returns:
+        - outputs (ndarray): (#obj, 6) (x1,y1,x2,y2,ID,Class), same format as `update`
+        """
+        if not hasattr(self, 'width'):  # nothing tracked yet
+            return []
+        self.tracker.propagate()
+        return self._tracks_to_outputs()
+
+    def _tracks_to_outputs(self):
         outputs = []
         for track in self.tracker.tracks:
             if not track.is_confirmed() or track.time_since_update > 1:
@@ -133,16 +178,37 @@ class DeepSort(object):
         h = int(y2-y1)
         return t,l,w,h
     
+    def get_boxes(self, bbox_xywh, ori_img):
+        """(#obj, 4) int x1 y1 x2 y2 of the ReID crops, clipped to the image"""
+        self.height, self.width = ori_img.shape[:2]
+        return np.array([self._xywh_to_xyxy(box) for box in bbox_xywh], dtype=int).reshape(-1, 4)
+
+    def get_crops(self, bbox_xywh, ori_img):
+        return [ori_img[y1:y2,x1:x2] for x1,y1,x2,y2 in self.get_boxes(bbox_xywh, ori_img)]
+
     def _get_features(self, bbox_xywh, ori_img):
-        im_crops = []
-        for box in bbox_xywh:
-            x1,y1,x2,y2 = self._xywh_to_xyxy(box)
-            im = ori_img[y1:y2,x1:x2]
-            im_crops.append(im)
-        if im_crops:
-            features = self.extractor(im_crops)
-        else:
-            features = np.array([])
+        boxes = self.get_boxes(bbox_xywh, ori_img)
+        if not len(boxes):
+            return np.array([])
+        if self.feature_cache is None:
+            return self._extract(ori_img, boxes)
+
+        cached, sources, thumbs = self.feature_cache.lookup(ori_img, boxes)
+        missed = [i for i, f in enumerate(cached) if f is None]
+        if missed:
+            t0 = time.perf_counter()
+            extracted = self._extract(ori_img, boxes[missed])
+            self.feature_cache.add_reid_time(time.perf_counter() - t0, len(missed))
+            for i, feature in zip(missed, extracted):
+                cached[i] = feature
+        self._cached = (boxes, sources, thumbs)  # the cache learns the assignment after tracker.update
+        return np.stack(cached)
+
+    def _extract(self, ori_img, boxes):
+        with self.profiler.stage('reid_preprocess'):
+            im_batch = self.extractor._preprocess_boxes(ori_img, boxes)
+        with self.profiler.stage('reid_forward', sync=True):
+            features = self.extractor.forward(im_batch)
         return features
 
 
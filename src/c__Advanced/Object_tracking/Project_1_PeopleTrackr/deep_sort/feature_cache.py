@@ -0,0 +1,142 @@
+import numpy as np
+import cv2
+
+
+__all__ = ['FeatureCache']
+
+
+def _iou_xyxy(a, b):
+    # a (n,4), b (m,4) -> (n,m)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class _Entry(object):
+    __slots__ = ('box', 'feature', 'thumb', 'age')
+
+    def __init__(self, box, feature, thumb):
+        self.box = box          # crop the feature was computed on, x1 y1 x2 y2
+        self.feature = feature
+        self.thumb = thumb      # small gray copy of that crop
+        self.age = 0            # frames the feature has been reused since
+
+
+class FeatureCache(object):
+    """
+    Per-track appearance feature cache: a detection reuses the last ReID feature of a track instead
+    of running the ReID net when
+        - its box has IoU >= iou_thres with the box the feature was computed on, for exactly one track
+        - it overlaps no other detection by more than overlap_thres (occlusion risk)
+        - its pixels barely changed: mean absolute difference of small gray thumbnails <= pixel_thres
+        - the feature has been reused less than `refresh` times
+
+    `lookup` is called on the detections before association, `update` after it with the
+    track <-> detection assignment, which stores the new features and ages the reused ones.
+
+    Parameters:
+    - iou_thres (float): minimum IoU with the cached box
+    - pixel_thres (float): maximum mean absolute gray level change (0-255)
+    - refresh (int): the feature is recomputed after being reused this many frames in a row
+    - overlap_thres (float): a detection overlapping another one by more than this IoU is always recomputed
+    - thumb_size (tuple): (width, height) of the thumbnails compared for the pixel change
+    """
+    REASONS = ('new', 'moved', 'overlap', 'pixels', 'refresh')
+
+    def __init__(self, iou_thres=0.9, pixel_thres=6., refresh=10, overlap_thres=0.3, thumb_size=(16, 32)):
+        self.iou_thres = iou_thres
+        self.pixel_thres = pixel_thres
+        self.refresh = refresh
+        self.overlap_thres = overlap_thres
+        self.thumb_size = thumb_size
+        self.entries = {}  # track id -> _Entry
+
+        self.lookups = 0
+        self.hits = 0
+        self.misses = {reason: 0 for reason in self.REASONS}
+        self.reid_seconds = 0.  # spent extracting the missed features
+        self.reid_crops = 0
+
+    def thumbnail(self, img, box):
+        x1, y1, x2, y2 = box
+        crop = img[y1:max(y2, y1 + 1), x1:max(x2, x1 + 1)]
+        return cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), self.thumb_size,
+                          interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def lookup(self, img, boxes):
+        """
+        Parameters:
+        - img (ndarray): frame, BGR
+        - boxes (ndarray): (n, 4) int x1 y1 x2 y2 of the ReID crops
+
+        Returns:
+        - features (list): cached feature per detection, None where it must be computed
+        - sources (list): track id the feature comes from, None for the misses
+        - thumbs (list): thumbnail per detection, to pass to `update`
+        """
+        n = len(boxes)
+        features, sources = [None] * n, [None] * n
+        thumbs = [self.thumbnail(img, box) for box in boxes]
+        self.lookups += n
+
+        track_ids = list(self.entries)
+        cached = np.array([self.entries[t].box for t in track_ids], dtype=float).reshape(-1, 4)
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        to_cached = _iou_xyxy(boxes, cached)
+        between = _iou_xyxy(boxes, boxes)
+        np.fill_diagonal(between, 0.)
+
+        for i in range(n):
+            if n > 1 and between[i].max() > self.overlap_thres:
+                reason = 'overlap'
+            elif not len(track_ids) or to_cached[i].max() <= 0.:
+                reason = 'new'
+            elif (to_cached[i] >= self.iou_thres).sum() != 1:
+                reason = 'moved' if to_cached[i].max() < self.iou_thres else 'overlap'
+            else:
+                track_id = track_ids[int(to_cached[i].argmax())]
+                entry = self.entries[track_id]
+                if entry.age >= self.refresh:
+                    reason = 'refresh'
+                elif np.abs(thumbs[i] - entry.thumb).mean() > self.pixel_thres:
+                    reason = 'pixels'
+                else:
+                    features[i], sources[i] = entry.feature, track_id
+                    self.hits += 1
+                    continue
+            self.misses[reason] += 1
+        return features, sources, thumbs
+
+    def add_reid_time(self, seconds, crops):
+        self.reid_seconds += seconds
+        self.reid_crops += crops
+
+    def update(self, assignment, boxes, sources, thumbs, features, live_ids):
+        """
+        Parameters:
+        - assignment (dict): track id -> index of the detection it was matched to (or created from)
+        - boxes, sources, thumbs: per detection, as returned with the features by `lookup`
+        - features (ndarray): (n, dim) features used for this frame, cached or computed
+        - live_ids (iterable): ids of the tracks still alive, the others are dropped
+        """
+        for track_id, i in assignment.items():
+            if sources[i] is None:
+                self.entries[track_id] = _Entry(np.asarray(boxes[i]), features[i], thumbs[i])
+            elif sources[i] == track_id:
+                self.entries[track_id].age += 1
+            else:  # matched with the feature of another track: recompute next time
+                self.entries.pop(track_id, None)
+        live_ids = set(live_ids)
+        for track_id in [t for t in self.entries if t not in live_ids]:
+            del self.entries[track_id]
+
+    def stats(self):
+        per_crop = self.reid_seconds / self.reid_crops if self.reid_crops else 0.
+        return {'lookups': self.lookups, 'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.,
+                'misses': dict(self.misses),
+                'reid_seconds': self.reid_seconds,
+                'saved_seconds': self.hits * per_crop}  # estimate: hits x mean ReID time per computed crop
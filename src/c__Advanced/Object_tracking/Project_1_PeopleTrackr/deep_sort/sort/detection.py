@@ -23,6 +23,10 @@ class Detection(object):
         Detector confidence score.
     feature : ndarray | NoneType
         A feature vector that describes the object contained in this image.
+    reused : bool
+        True if `feature` was copied from the ReID feature cache instead of
+        extracted from this image. Reused features are matched against but
+        never added to the track galleries.
 
     """
 
@@ -31,6 +35,7 @@ class Detection(object):
         self.confidence = float(confidence)
         self.feature = np.asarray(feature, dtype=np.float32)
         self.pred_class = int(pred_class)
+        self.reused = False
 
     def to_tlbr(self):
         """Convert bounding box to format `(min x, min y, max x, max y)`, i.e.,
@@ -40,7 +40,7 @@ def iou(bbox, candidates):
 
 
 def iou_cost(tracks, detections, track_indices=None,
-             detection_indices=None):
+             detection_indices=None, index=None):
     """An intersection over union distance metric.
 
     Parameters
@@ -55,6 +55,11 @@ def iou_cost(tracks, detections, track_indices=None,
     detection_indices : Optional[List[int]]
         A list of indices to detections that should be matched. Defaults
         to all `detections`.
+    index : Optional[spatial_index.GridIndex]
+        A grid over the `(min x, min y, max x, max y)` boxes of all the
+        `detections`. If not None, the IoU of a track is only computed with
+        the detections its box intersects; the others have IoU 0, and the
+        cost matrix is the same.
 
     Returns
     -------
@@ -70,12 +75,20 @@ def iou_cost(tracks, detections, track_indices=None,
         detection_indices = np.arange(len(detections))
 
     cost_matrix = np.zeros((len(track_indices), len(detection_indices)))
+    columns = {i: col for col, i in enumerate(detection_indices)}
     for row, track_idx in enumerate(track_indices):
         if tracks[track_idx].time_since_update > 1:
             cost_matrix[row, :] = linear_assignment.INFTY_COST
             continue
 
         bbox = tracks[track_idx].to_tlwh()
+        if index is not None:
+            cols = [columns[i] for i in index.query(tracks[track_idx].to_tlbr()) if i in columns]
+            cost_matrix[row, :] = 1.
+            if cols:
+                candidates = np.asarray([detections[detection_indices[col]].tlwh for col in cols])
+                cost_matrix[row, cols] = 1. - iou(bbox, candidates)
+            continue
         candidates = np.asarray([detections[i].tlwh for i in detection_indices])
         cost_matrix[row, :] = 1. - iou(bbox, candidates)
     return cost_matrix
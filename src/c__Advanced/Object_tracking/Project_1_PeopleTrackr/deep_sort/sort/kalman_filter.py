@@ -265,3 +265,215 @@ class KalmanFilter(object):
             overwrite_b=True)
         squared_maha = np.sum(z * z, axis=0)
         return squared_maha
+
+
+class KalmanFilterBank(KalmanFilter):
+    """
+    The Kalman filter of all the tracks at once, stored struct-of-arrays:
+    one (capacity, 8) array of means and one (capacity, 8, 8) array of
+    covariances. A track owns one slot (`add` / `remove`), and `Track.mean` /
+    `Track.covariance` are views into it.
+
+    `predict`, `project`, `update` and `gating_distance` of `KalmanFilter`
+    still work on a single state; the `*_batch` methods do the same steps on
+    stacked states with batched NumPy linear algebra, and the `*_slots`
+    methods run them in place on the stored states. Predict and project give
+    the same values bit for bit (F and H only copy and add entries, in the
+    same order as `np.linalg.multi_dot`); update and gating use batched
+    Cholesky / solves instead of scipy's, equal to floating point precision.
+
+    Parameters
+    ----------
+    capacity : int
+        Initial number of slots, doubled when more tracks are alive.
+
+    Attributes
+    ----------
+    mean : ndarray
+        The (capacity, 8) state means.
+    covariance : ndarray
+        The (capacity, 8, 8) state covariances.
+
+    """
+
+    def __init__(self, capacity=64):
+        super(KalmanFilterBank, self).__init__()
+        self.mean = np.zeros((capacity, 8))
+        self.covariance = np.zeros((capacity, 8, 8))
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def add(self, mean, covariance):
+        """Store a state and return its slot."""
+        if not self._free:
+            capacity = len(self.mean)
+            self.mean = np.concatenate([self.mean, np.zeros_like(self.mean)])
+            self.covariance = np.concatenate([self.covariance, np.zeros_like(self.covariance)])
+            self._free = list(range(2 * capacity - 1, capacity - 1, -1))
+        slot = self._free.pop()
+        self.mean[slot], self.covariance[slot] = mean, covariance
+        return slot
+
+    def remove(self, slot):
+        """Release the slot of a deleted track."""
+        self._free.append(slot)
+
+    def _std_position(self, h, third):
+        w = self._std_weight_position * h
+        return np.stack([w, w, np.full_like(h, third), w], axis=1)
+
+    def _std_velocity(self, h):
+        w = self._std_weight_velocity * h
+        return np.stack([w, w, np.full_like(h, 1e-5), w], axis=1)
+
+    def predict_batch(self, mean, covariance):
+        """Run Kalman filter prediction step on N states.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean vectors.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the predicted means and covariances.
+
+        """
+        h = mean[:, 3]
+        motion_var = np.square(np.concatenate([self._std_position(h, 1e-2), self._std_velocity(h)], axis=1))
+
+        mean = np.dot(mean, self._motion_mat.T)
+        # F (P F^T), the order multi_dot uses for three 8x8 matrices
+        covariance = np.matmul(self._motion_mat, np.matmul(covariance, self._motion_mat.T))
+        idx = np.arange(8)
+        covariance[:, idx, idx] += motion_var
+        return mean, covariance
+
+    def project_batch(self, mean, covariance):
+        """Project N state distributions to measurement space.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 covariances (S).
+
+        """
+        innovation_var = np.square(self._std_position(mean[:, 3], 1e-1))
+        mean = mean[:, :4].copy()
+        covariance = covariance[:, :4, :4].copy()
+        idx = np.arange(4)
+        covariance[:, idx, idx] += innovation_var
+        return mean, covariance
+
+    def update_batch(self, mean, covariance, measurements):
+        """Run Kalman filter correction step on N states.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 predicted means.
+        covariance : ndarray
+            The Nx8x8 predicted covariances.
+        measurements : ndarray
+            The Nx4 measurements (x, y, a, h), one per state.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the measurement-corrected state distributions.
+
+        """
+        projected_mean, projected_cov = self.project_batch(mean, covariance)
+
+        # K = P' H^(T) S^(-1), solved as S K^(T) = (P' H^(T))^(T)
+        kalman_gain = np.linalg.solve(projected_cov, covariance[:, :, :4].transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = measurements - projected_mean
+
+        new_mean = mean + np.matmul(kalman_gain, innovation[:, :, None])[:, :, 0]
+        new_covariance = covariance - np.matmul(
+            kalman_gain, np.matmul(projected_cov, kalman_gain.transpose(0, 2, 1)))
+        return new_mean, new_covariance
+
+    def gating_distance_batch(self, mean, covariance, measurements, only_position=False):
+        """Compute gating distance between N state distributions and M
+        measurements.
+
+        Returns
+        -------
+        ndarray
+            Returns an NxM array of squared Mahalanobis distances (see
+            `KalmanFilter.gating_distance`).
+
+        """
+        mean, covariance = self.project_batch(mean, covariance)
+        measurements = np.asarray(measurements, dtype=float).reshape(-1, 4)
+        if only_position:
+            mean, covariance = mean[:, :2], covariance[:, :2, :2]
+            measurements = measurements[:, :2]
+
+        cholesky_factor = np.linalg.cholesky(covariance)
+        d = measurements[None, :, :] - mean[:, None, :]
+        z = np.linalg.solve(cholesky_factor, d.transpose(0, 2, 1))
+        return np.sum(z * z, axis=1)
+
+    def predict_slots(self, slots):
+        """Predict the stored states of `slots` in place."""
+        if len(slots):
+            self.mean[slots], self.covariance[slots] = self.predict_batch(
+                self.mean[slots], self.covariance[slots])
+
+    def update_slots(self, slots, measurements):
+        """Correct the stored states of `slots` with one measurement each, in place."""
+        if len(slots):
+            self.mean[slots], self.covariance[slots] = self.update_batch(
+                self.mean[slots], self.covariance[slots], np.asarray(measurements, dtype=float))
+
+    def gating_distance_slots(self, slots, measurements, only_position=False):
+        """Squared Mahalanobis distances between the states of `slots` and the
+        measurements, as a len(slots) x len(measurements) array."""
+        if not len(slots) or not len(measurements):
+            return np.zeros((len(slots), len(measurements)))
+        return self.gating_distance_batch(
+            self.mean[slots], self.covariance[slots], measurements, only_position)
+
+    def gating_distance_pairs(self, slots, measurements, only_position=False):
+        """Squared Mahalanobis distance of N (state, measurement) pairs: the
+        state of `slots[i]` against `measurements[i]`. Each state is
+        projected and factorized once, however many pairs it is in."""
+        measurements = np.asarray(measurements, dtype=float).reshape(-1, 4)
+        if not len(measurements):
+            return np.zeros(0)
+        slots, inverse = np.unique(slots, return_inverse=True)
+        mean, covariance = self.project_batch(self.mean[slots], self.covariance[slots])
+        if only_position:
+            mean, covariance = mean[:, :2], covariance[:, :2, :2]
+            measurements = measurements[:, :2]
+
+        cholesky_factor = np.linalg.cholesky(covariance)[inverse]
+        d = measurements - mean[inverse]
+        z = np.linalg.solve(cholesky_factor, d[:, :, None])[:, :, 0]
+        return np.sum(z * z, axis=1)
+
+    def gating_box(self, slots, threshold):
+        """Bounding box `(min x, min y, max x, max y)` of the gating region of
+        the states of `slots` in the image: a measurement within squared
+        Mahalanobis distance `threshold` has its center (x, y) inside.
+
+        For a positive definite S, d^T S^(-1) d >= d_i^2 / S_ii, so the
+        distance can only be below the threshold when
+        |d_i| <= sqrt(threshold * S_ii) for the x and y components.
+
+        Returns
+        -------
+        ndarray
+            An Nx4 array of boxes.
+
+        """
+        if not len(slots):
+            return np.zeros((0, 4))
+        mean, covariance = self.project_batch(self.mean[slots], self.covariance[slots])
+        half = np.sqrt(threshold * np.stack([covariance[:, 0, 0], covariance[:, 1, 1]], axis=1))
+        half = half * (1. + 1e-6) + 1e-6  # margin for rounding, the box must not lose a feasible pair
+        return np.hstack([mean[:, :2] - half, mean[:, :2] + half])
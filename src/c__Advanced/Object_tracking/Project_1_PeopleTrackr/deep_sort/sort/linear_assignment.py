@@ -3,17 +3,88 @@ from __future__ import absolute_import
 import numpy as np
 # from sklearn.utils.linear_assignment_ import linear_assignment
 from scipy.optimize import linear_sum_assignment as linear_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from . import kalman_filter
 
 
 INFTY_COST = 1e+5
 
+# min_cost_matching solves the feasible pairs per connected component when the
+# cost matrix has at least SPARSE_MIN_SIZE entries and at most this fraction
+# of them is feasible (cost <= max_distance). Measured crossover
+# (benchmarks/bench_assignment.py): the sparse solver is 3-8x slower up to
+# 100x100, breaks even around 500x500 and wins from about 1000x1000.
+SPARSE_MIN_SIZE = 250000
+SPARSE_MAX_DENSITY = 0.2
+
+
+def _groups(labels, n):
+    # indices of each label 0..n-1, in increasing order
+    order = np.argsort(labels, kind='stable')
+    bounds = np.searchsorted(labels[order], np.arange(n + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n)]
+
+
+def sparse_assignment(cost_matrix, max_distance):
+    """Solve the assignment problem on the feasible pairs only.
+
+    Tracks and detections linked by a pair with cost <= `max_distance` form
+    a bipartite graph; every connected component is an independent problem,
+    solved with the dense solver on its own (small) cost matrix. Isolated
+    tracks and detections are never passed to a solver. The total cost of the
+    feasible matches is the same as with the dense solver on the whole matrix
+    (both maximize sum(max_distance + 1e-5 - cost) over the feasible matches).
+
+    Parameters
+    ----------
+    cost_matrix : ndarray
+        The NxM cost matrix, infeasible entries > max_distance.
+    max_distance : float
+        Gating threshold.
+
+    Returns
+    -------
+    (ndarray, ndarray)
+        Row and column indices of the feasible matches, sorted by row.
+
+    """
+    n_rows, n_cols = cost_matrix.shape
+    rows, cols = np.nonzero(cost_matrix <= max_distance)
+    if len(rows) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    graph = coo_matrix((np.ones(len(rows)), (rows, n_rows + cols)), shape=(n_rows + n_cols, n_rows + n_cols))
+    n, labels = connected_components(graph, directed=False)
+    row_groups, col_groups = _groups(labels[:n_rows], n), _groups(labels[n_rows:], n)
+
+    row_indices, col_indices = [], []
+    for label in np.unique(labels[rows]):
+        r, c = row_groups[label], col_groups[label]
+        if len(r) == 1 and len(c) == 1:  # one feasible pair
+            row_indices.append(r)
+            col_indices.append(c)
+            continue
+        sub = cost_matrix[np.ix_(r, c)]
+        ri, ci = linear_assignment(sub)
+        keep = sub[ri, ci] <= max_distance
+        row_indices.append(r[ri[keep]])
+        col_indices.append(c[ci[keep]])
+    row_indices, col_indices = np.concatenate(row_indices), np.concatenate(col_indices)
+    order = np.argsort(row_indices)
+    return row_indices[order], col_indices[order]
+
 
 def min_cost_matching(
         distance_metric, max_distance, tracks, detections, track_indices=None,
-        detection_indices=None):
+        detection_indices=None, sparse=None):
     """Solve linear assignment problem.
 
+    Large and mostly gated cost matrices are solved with `sparse_assignment`
+    (see SPARSE_MIN_SIZE, SPARSE_MAX_DENSITY), the others with the dense
+    solver. With both, unmatched tracks and detections are returned in the
+    order of `track_indices` / `detection_indices`, so the order new tracks
+    are created in (and their IDs) does not depend on the solver.
+
     Parameters
     ----------
     distance_metric : Callable[List[Track], List[Detection], List[int], List[int]) -> ndarray
@@ -35,6 +106,9 @@ def min_cost_matching(
     detection_indices : List[int]
         List of detection indices that maps columns in `cost_matrix` to
         detections in `detections` (see description above).
+    sparse : Optional[bool]
+        Force (True) or disable (False) the sparse solver. Defaults to the
+        automatic choice.
 
     Returns
     -------
@@ -56,24 +130,24 @@ def min_cost_matching(
     cost_matrix = distance_metric(
         tracks, detections, track_indices, detection_indices)
     cost_matrix[cost_matrix > max_distance] = max_distance + 1e-5
+    if sparse is None:
+        sparse = cost_matrix.size >= SPARSE_MIN_SIZE and \
+            np.count_nonzero(cost_matrix <= max_distance) <= SPARSE_MAX_DENSITY * cost_matrix.size
 
-    row_indices, col_indices = linear_assignment(cost_matrix)
+    if sparse:
+        row_indices, col_indices = sparse_assignment(cost_matrix, max_distance)
+    else:
+        row_indices, col_indices = linear_assignment(cost_matrix)
+        feasible = cost_matrix[row_indices, col_indices] <= max_distance
+        row_indices, col_indices = row_indices[feasible], col_indices[feasible]
 
-    matches, unmatched_tracks, unmatched_detections = [], [], []
-    for col, detection_idx in enumerate(detection_indices):
-        if col not in col_indices:
-            unmatched_detections.append(detection_idx)
-    for row, track_idx in enumerate(track_indices):
-        if row not in row_indices:
-            unmatched_tracks.append(track_idx)
-    for row, col in zip(row_indices, col_indices):
-        track_idx = track_indices[row]
-        detection_idx = detection_indices[col]
-        if cost_matrix[row, col] > max_distance:
-            unmatched_tracks.append(track_idx)
-            unmatched_detections.append(detection_idx)
-        else:
-            matches.append((track_idx, detection_idx))
+    matched_rows = np.zeros(len(track_indices), dtype=bool)
+    matched_cols = np.zeros(len(detection_indices), dtype=bool)
+    matched_rows[row_indices], matched_cols[col_indices] = True, True
+    matches = [(track_indices[row], detection_indices[col]) for row, col in zip(row_indices, col_indices)]
+    unmatched_tracks = [track_idx for row, track_idx in enumerate(track_indices) if not matched_rows[row]]
+    unmatched_detections = [detection_idx for col, detection_idx in enumerate(detection_indices)
+                            if not matched_cols[col]]
     return matches, unmatched_tracks, unmatched_detections
 
 
@@ -82,6 +156,11 @@ def matching_cascade(
         track_indices=None, detection_indices=None):
     """Run matching cascade.
 
+    The cost matrix of all the tracks against all the detections is computed
+    with one `distance_metric` call; each level (tracks that were last
+    updated `1 + level` frames ago) is then solved on its rows of that matrix
+    and the detections still unmatched. Levels without tracks are skipped.
+
     Parameters
     ----------
     distance_metric : Callable[List[Track], List[Detection], List[int], List[int]) -> ndarray
@@ -123,21 +202,32 @@ def matching_cascade(
 
     unmatched_detections = detection_indices
     matches = []
-    for level in range(cascade_depth):
+
+    # tracks of each level, levels in cascade order
+    levels = {}
+    for k in track_indices:
+        if 1 <= tracks[k].time_since_update <= cascade_depth:
+            levels.setdefault(tracks[k].time_since_update, []).append(k)
+    if len(unmatched_detections) == 0 or not levels:  # Nothing to match
+        return matches, list(set(track_indices)), unmatched_detections
+
+    cascade_tracks = [k for level in sorted(levels) for k in levels[level]]
+    cost_matrix = distance_metric(tracks, detections, cascade_tracks, detection_indices)
+    rows = {k: row for row, k in enumerate(cascade_tracks)}
+    cols = {d: col for col, d in enumerate(detection_indices)}
+
+    def level_metric(tracks_, detections_, track_indices_l, detection_indices_l):
+        return cost_matrix[np.ix_([rows[k] for k in track_indices_l],
+                                  [cols[d] for d in detection_indices_l])]
+
+    for level in sorted(levels):
         if len(unmatched_detections) == 0:  # No detections left
             break
 
-        track_indices_l = [
-            k for k in track_indices
-            if tracks[k].time_since_update == 1 + level
-        ]
-        if len(track_indices_l) == 0:  # Nothing to match at this level
-            continue
-
         matches_l, _, unmatched_detections = \
             min_cost_matching(
-                distance_metric, max_distance, tracks, detections,
-                track_indices_l, unmatched_detections)
+                level_metric, max_distance, tracks, detections,
+                levels[level], unmatched_detections)
         matches += matches_l
     unmatched_tracks = list(set(track_indices) - set(k for k, _ in matches))
     return matches, unmatched_tracks, unmatched_detections
@@ -151,7 +241,8 @@ def gate_cost_matrix(
 
     Parameters
     ----------
-    kf : The Kalman filter.
+    kf : The Kalman filter. With a `KalmanFilterBank` and tracks stored in
+        it, all the rows are gated with one batched computation.
     cost_matrix : ndarray
         The NxM dimensional cost matrix, where N is the number of track indices
         and M is the number of detection indices, such that entry (i, j) is the
@@ -184,6 +275,12 @@ def gate_cost_matrix(
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
     measurements = np.asarray(
         [detections[i].to_xyah() for i in detection_indices])
+    if isinstance(kf, kalman_filter.KalmanFilterBank) and all(
+            tracks[i].slot is not None for i in track_indices):
+        gating_distance = kf.gating_distance_slots(
+            [tracks[i].slot for i in track_indices], measurements, only_position)
+        cost_matrix[gating_distance > gating_threshold] = gated_cost
+        return cost_matrix
     for row, track_idx in enumerate(track_indices):
         track = tracks[track_idx]
         gating_distance = kf.gating_distance(
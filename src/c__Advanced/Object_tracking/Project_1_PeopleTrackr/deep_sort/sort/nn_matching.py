@@ -101,6 +101,16 @@ class NearestNeighborDistanceMetric(object):
     A nearest neighbor distance metric that, for each target, returns
     the closest distance to any sample that has been observed so far.
 
+    The samples live in one preallocated gallery array of shape
+    (max_tracks, budget, dim): one row per target, used as a ring buffer
+    (the newest sample overwrites the oldest once the budget is reached),
+    with a validity mask for the rows that are not full yet. `distance`
+    compares every requested target with one matrix product and a masked
+    min. The cost matrix is the one of comparing the targets one by one
+    (`_nn_cosine_distance` / `_nn_euclidean_distance` on each target's
+    samples) up to float32 rounding: the single matrix product does not sum
+    in the same order as the per-target ones.
+
     Parameters
     ----------
     metric : str
@@ -111,28 +121,81 @@ class NearestNeighborDistanceMetric(object):
     budget : Optional[int]
         If not None, fix samples per class to at most this number. Removes
         the oldest samples when the budget is reached.
+    max_tracks : int
+        Initial number of gallery rows, doubled when more targets are active.
 
     Attributes
     ----------
-    samples : Dict[int -> List[ndarray]]
-        A dictionary that maps from target identities to the list of samples
-        that have been observed so far.
+    gallery : ndarray
+        The (max_tracks, budget, dim) float32 samples, normalized for the
+        cosine metric. Allocated by the first `partial_fit`.
+    valid : ndarray
+        (max_tracks, budget) mask of the slots holding a sample.
+    counts : ndarray
+        Number of samples held by each row.
+    rows : Dict[int -> int]
+        Gallery row of each target.
 
     """
 
-    def __init__(self, metric, matching_threshold, budget=None):
+    def __init__(self, metric, matching_threshold, budget=None, max_tracks=64):
 
 
         if metric == "euclidean":
-            self._metric = _nn_euclidean_distance
+            self._cosine = False
         elif metric == "cosine":
-            self._metric = _nn_cosine_distance
+            self._cosine = True
         else:
             raise ValueError(
                 "Invalid metric; must be either 'euclidean' or 'cosine'")
         self.matching_threshold = matching_threshold
         self.budget = budget
-        self.samples = {}
+        self.max_tracks = max_tracks
+
+        self.gallery = None
+        self.norms2 = None      # squared norm of each sample (euclidean)
+        self.valid = None
+        self.counts = None      # samples held in each row
+        self.heads = None       # next slot written in each row
+        self.rows = {}
+        self._free = []
+
+    @property
+    def samples(self):
+        """Dict[int -> ndarray]: the samples of each target (as stored, see `gallery`)."""
+        return {target: self.gallery[row][self.valid[row]] for target, row in self.rows.items()}
+
+    def _allocate(self, dim):
+        capacity = self.budget if self.budget is not None else 16
+        self.gallery = np.zeros((self.max_tracks, capacity, dim), dtype=np.float32)
+        self.norms2 = np.zeros((self.max_tracks, capacity), dtype=np.float32)
+        self.valid = np.zeros((self.max_tracks, capacity), dtype=bool)
+        self.counts = np.zeros(self.max_tracks, dtype=np.int64)
+        self.heads = np.zeros(self.max_tracks, dtype=np.int64)
+        self._free = list(range(self.max_tracks - 1, -1, -1))
+
+    def _grow(self, tracks=0, capacity=0):
+        # more rows (targets) and / or slots per row (budget None)
+        t, c, d = self.gallery.shape
+        gallery = np.zeros((t + tracks, c + capacity, d), dtype=np.float32)
+        norms2 = np.zeros((t + tracks, c + capacity), dtype=np.float32)
+        valid = np.zeros((t + tracks, c + capacity), dtype=bool)
+        gallery[:t, :c], norms2[:t, :c], valid[:t, :c] = self.gallery, self.norms2, self.valid
+        self.gallery, self.norms2, self.valid = gallery, norms2, valid
+        self.counts = np.concatenate([self.counts, np.zeros(tracks, dtype=np.int64)])
+        self.heads = np.concatenate([self.heads, np.zeros(tracks, dtype=np.int64)])
+        if capacity:  # the rows that were full (head wrapped to 0) continue after their old samples
+            self.heads[self.counts == c] = c
+        self._free = list(range(t + tracks - 1, t - 1, -1)) + self._free
+        self.max_tracks = t + tracks
+
+    def _row(self, target):
+        row = self.rows.get(target)
+        if row is None:
+            if not self._free:
+                self._grow(tracks=self.max_tracks)
+            row = self.rows[target] = self._free.pop()
+        return row
 
     def partial_fit(self, features, targets, active_targets):
         """Update the distance metric with new data.
@@ -147,11 +210,31 @@ class NearestNeighborDistanceMetric(object):
             A list of targets that are currently present in the scene.
 
         """
-        for feature, target in zip(features, targets):
-            self.samples.setdefault(target, []).append(feature)
-            if self.budget is not None:
-                self.samples[target] = self.samples[target][-self.budget:]
-        self.samples = {k: self.samples[k] for k in active_targets}
+        features = np.asarray(features, dtype=np.float32)
+        if len(features):
+            if self.gallery is None:
+                self._allocate(features.shape[1])
+            if self._cosine:
+                features = features / np.linalg.norm(features, axis=1, keepdims=True)
+            norms2 = np.square(features).sum(axis=1)
+            for feature, norm2, target in zip(features, norms2, targets):
+                row = self._row(target)
+                if self.budget is None and self.counts[row] == self.gallery.shape[1]:
+                    self._grow(capacity=self.gallery.shape[1])  # unbounded: full row, twice the slots
+                head = self.heads[row]
+                self.gallery[row, head] = feature
+                self.norms2[row, head] = norm2
+                self.valid[row, head] = True
+                self.heads[row] = (head + 1) % self.gallery.shape[1]
+                self.counts[row] = min(self.counts[row] + 1, self.gallery.shape[1])
+
+        active_targets = set(active_targets)
+        for target in [t for t in self.rows if t not in active_targets]:
+            row = self.rows.pop(target)
+            self.valid[row] = False
+            self.counts[row] = 0
+            self.heads[row] = 0
+            self._free.append(row)
 
     def distance(self, features, targets):
         """Compute distance between features and targets.
@@ -168,10 +251,82 @@ class NearestNeighborDistanceMetric(object):
         ndarray
             Returns a cost matrix of shape len(targets), len(features), where
             element (i, j) contains the closest squared distance between
-            `targets[i]` and `features[j]`.
+            `targets[i]` and `features[j]`. Targets without samples yet (all
+            their features came from the ReID feature cache) are at infinite
+            distance.
 
         """
         cost_matrix = np.zeros((len(targets), len(features)))
-        for i, target in enumerate(targets):
-            cost_matrix[i, :] = self._metric(self.samples[target], features)
+        if not len(targets) or not len(features):
+            return cost_matrix
+        known = np.array([target in self.rows for target in targets])
+        if not known.all():
+            cost_matrix[~known] = np.inf
+            if known.any():
+                cost_matrix[known] = self.distance(features, [t for t, k in zip(targets, known) if k])
+            return cost_matrix
+        rows = np.array([self.rows[target] for target in targets])
+        used = int(self.counts[rows].max())  # slots past the fullest row are empty in every row
+        samples, valid = self.gallery[rows, :used], self.valid[rows, :used]
+        t, c, d = samples.shape
+
+        features = np.asarray(features)
+        if self._cosine:
+            features = features / np.linalg.norm(features, axis=1, keepdims=True)
+            distances = 1. - np.dot(samples.reshape(t * c, d), features.T)
+        else:
+            b2 = np.square(features).sum(axis=1)
+            distances = -2. * np.dot(samples.reshape(t * c, d), features.T) + \
+                self.norms2[rows, :used].reshape(t * c)[:, None] + b2[None, :]
+            distances = np.clip(distances, 0., float(np.inf))
+        distances = distances.reshape(t, c, -1)
+        distances[~valid] = np.inf
+        cost_matrix[:, :] = distances.min(axis=1)
+        if not self._cosine:
+            cost_matrix = np.maximum(0.0, cost_matrix)
         return cost_matrix
+
+    def distance_pairs(self, features, targets, chunk_size=1 << 24):
+        """Compute the distance of N (feature, target) pairs: `features[i]`
+        against the samples of `targets[i]` only, instead of every feature
+        against every target as in `distance`.
+
+        Parameters
+        ----------
+        features : ndarray
+            An NxM matrix of N features of dimensionality M.
+        targets : List[int]
+            The target of each feature.
+        chunk_size : int
+            Maximum number of gathered sample values per batch of pairs.
+
+        Returns
+        -------
+        ndarray
+            Returns a vector of length N, where element i contains the closest
+            distance between `targets[i]` and `features[i]` (`distance` of
+            the pair, up to float32 rounding).
+
+        """
+        costs = np.full(len(targets), np.inf)
+        known = np.array([target in self.rows for target in targets], dtype=bool)
+        if not known.any():
+            return costs
+        pairs = np.flatnonzero(known)
+        rows = np.array([self.rows[targets[i]] for i in pairs])
+        features = np.asarray(features)[pairs]
+        if self._cosine:
+            features = features / np.linalg.norm(features, axis=1, keepdims=True)
+        used = int(self.counts[rows].max())
+        step = max(1, chunk_size // (used * features.shape[1]))
+        for start in range(0, len(pairs), step):
+            r, f = rows[start:start + step], features[start:start + step]
+            dots = np.einsum('pcd,pd->pc', self.gallery[r, :used], f)  # row-wise, gathered samples only
+            if self._cosine:
+                distances = 1. - dots
+            else:
+                distances = np.clip(-2. * dots + self.norms2[r, :used] + np.square(f).sum(axis=1)[:, None],
+                                    0., float(np.inf))
+            distances[~self.valid[r, :used]] = np.inf
+            costs[pairs[start:start + step]] = distances.min(axis=1)
+        return costs
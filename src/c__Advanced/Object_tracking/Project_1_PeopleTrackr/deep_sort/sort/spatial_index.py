@@ -0,0 +1,81 @@
+# vim: expandtab:ts=4:sw=4
+import numpy as np
+
+
+class GridIndex(object):
+    """
+    A uniform grid over a set of axis-aligned boxes, rebuilt every frame on
+    the detections. Each box is registered in every cell it covers, so a
+    query only looks at the boxes of the cells its own box covers instead of
+    at every box.
+
+    Parameters
+    ----------
+    boxes : array_like
+        An Nx4 matrix of boxes in format `(min x, min y, max x, max y)`.
+        Points are boxes of size 0.
+    cell_size : float
+        Side of a grid cell, in pixels. About the size of a box is a good
+        value.
+
+    Attributes
+    ----------
+    boxes : ndarray
+        The indexed boxes.
+    cells : Dict[(int, int) -> List[int]]
+        Indices of the boxes covering each occupied cell.
+
+    """
+
+    def __init__(self, boxes, cell_size):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.cell_size = max(float(cell_size), 1.)
+        self.cells = {}
+        if not len(self.boxes):
+            return
+        lo = np.floor(self.boxes[:, :2] / self.cell_size).astype(int)
+        hi = np.floor(self.boxes[:, 2:] / self.cell_size).astype(int)
+        for i, ((x0, y0), (x1, y1)) in enumerate(zip(lo, hi)):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self.cells.setdefault((cx, cy), []).append(i)
+        self._lo, self._hi = lo.min(axis=0), hi.max(axis=0)  # occupied cell range
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def query(self, box):
+        """Find the boxes intersecting `box` (borders included).
+
+        Parameters
+        ----------
+        box : array_like
+            A box in format `(min x, min y, max x, max y)`.
+
+        Returns
+        -------
+        ndarray
+            Indices of the intersecting boxes, in increasing order.
+
+        """
+        if not self.cells:
+            return np.zeros(0, dtype=int)
+        box = np.asarray(box, dtype=np.float64)
+        x0, y0 = np.maximum(np.floor(box[:2] / self.cell_size), self._lo).astype(int)
+        x1, y1 = np.minimum(np.floor(box[2:] / self.cell_size), self._hi).astype(int)
+        if x1 < x0 or y1 < y0:
+            return np.zeros(0, dtype=int)
+
+        found = set()
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):  # large box: scan the occupied cells instead
+            for (cx, cy), indices in self.cells.items():
+                if x0 <= cx <= x1 and y0 <= cy <= y1:
+                    found.update(indices)
+        else:
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    found.update(self.cells.get((cx, cy), ()))
+        indices = np.array(sorted(found), dtype=int)
+        b = self.boxes[indices].reshape(-1, 4)
+        keep = (b[:, 0] <= box[2]) & (b[:, 2] >= box[0]) & (b[:, 1] <= box[3]) & (b[:, 3] >= box[1])
+        return indices[keep]
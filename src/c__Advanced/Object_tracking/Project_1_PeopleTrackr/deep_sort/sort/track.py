@@ -40,13 +40,19 @@ class Track:
     feature : Optional[ndarray]
         Feature vector of the detection this track originates from. If not None,
         this feature is added to the `features` cache.
+    bank : Optional[kalman_filter.KalmanFilterBank]
+        If not None, the state is stored in a slot of this bank (released by
+        the tracker when the track is deleted) and `mean` / `covariance` are
+        views into it.
 
     Attributes
     ----------
     mean : ndarray
-        Mean vector of the initial state distribution.
+        Mean vector of the current state distribution.
     covariance : ndarray
-        Covariance matrix of the initial state distribution.
+        Covariance matrix of the current state distribution.
+    slot : Optional[int]
+        Slot of the state in `bank`.
     track_id : int
         A unique track identifier.
     hits : int
@@ -64,10 +70,12 @@ class Track:
     """
 
     def __init__(self, mean, covariance, track_id, n_init, max_age,
-                 feature=None,det_class = None):
+                 feature=None,det_class = None, bank=None):
         #
-        self.mean = mean
-        self.covariance = covariance
+        self._bank = bank
+        self.slot = bank.add(mean, covariance) if bank is not None else None
+        if bank is None:
+            self._mean, self._covariance = mean, covariance
         self.track_id = track_id
         self.hits = 1
         self.age = 1
@@ -84,6 +92,28 @@ class Track:
         self.det_class = det_class
 
 
+    @property
+    def mean(self):
+        return self._bank.mean[self.slot] if self._bank is not None else self._mean
+
+    @mean.setter
+    def mean(self, value):
+        if self._bank is not None:
+            self._bank.mean[self.slot] = value
+        else:
+            self._mean = value
+
+    @property
+    def covariance(self):
+        return self._bank.covariance[self.slot] if self._bank is not None else self._covariance
+
+    @covariance.setter
+    def covariance(self, value):
+        if self._bank is not None:
+            self._bank.covariance[self.slot] = value
+        else:
+            self._covariance = value
+
     def to_tlwh(self):
         """Get current position in bounding box format `(top left x, top left y,
         width, height)`.
@@ -124,9 +154,28 @@ class Track:
 
         """
         self.mean, self.covariance = kf.predict(self.mean, self.covariance)
+        self.tick()
+
+    def tick(self):
+        """Count one time step (the bookkeeping of `predict`), for trackers
+        that predict all the states at once with a `KalmanFilterBank`.
+        """
         self.age += 1
         self.time_since_update += 1
 
+    def propagate(self, kf):
+        """Advance the state distribution by one frame without counting it as
+        a time step of the tracker, i.e. `age` and `time_since_update` are left
+        untouched. Used on frames that are skipped by the detector.
+
+        Parameters
+        ----------
+        kf : kalman_filter.KalmanFilter
+            The Kalman filter.
+
+        """
+        self.mean, self.covariance = kf.predict(self.mean, self.covariance)
+
     def update(self, kf, detection):
         """Perform Kalman filter measurement update step and update the feature
         cache.
@@ -140,7 +189,20 @@ class Track:
 
         """
         self.mean, self.covariance = kf.update(self.mean, self.covariance, detection.to_xyah())
-        self.features.append(detection.feature)
+        self.record_hit(detection)
+
+    def record_hit(self, detection):
+        """Feature cache and track state bookkeeping of `update`, for trackers
+        that correct all the states at once with a `KalmanFilterBank`.
+
+        Parameters
+        ----------
+        detection : Detection
+            The associated detection.
+
+        """
+        if not detection.reused:
+            self.features.append(detection.feature)
 
         self.hits += 1
         self.time_since_update = 0
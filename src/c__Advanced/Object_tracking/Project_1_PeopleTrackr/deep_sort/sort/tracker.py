@@ -1,10 +1,20 @@
 # vim: expandtab:ts=4:sw=4
 from __future__ import absolute_import
+from functools import partial
 import numpy as np
 from . import kalman_filter
 from . import linear_assignment
 from . import iou_matching
 from .track import Track
+from .spatial_index import GridIndex
+from utils_ds.profiler import NULL_PROFILER
+
+
+# The gating and IoU candidates are looked up in a grid of the detections from
+# this many track x detection pairs on; below it every pair is evaluated.
+# Measured (benchmarks/bench_gating.py): the grid is ~2x slower at 20-100
+# tracks and only wins from about 500 tracks.
+GRID_MIN_PAIRS = 250000
 
 
 class Tracker:
@@ -30,8 +40,9 @@ class Tracker:
         Maximum number of missed misses before a track is deleted.
     n_init : int
         Number of frames that a track remains in initialization phase.
-    kf : kalman_filter.KalmanFilter
-        A Kalman filter to filter target trajectories in image space.
+    kf : kalman_filter.KalmanFilterBank
+        A Kalman filter to filter target trajectories in image space. It also
+        stores the states of all the tracks, predicted and corrected in batch.
     tracks : List[Track]
         The list of active tracks at the current time step.
 
@@ -43,9 +54,12 @@ class Tracker:
         self.max_age = max_age
         self.n_init = n_init
 
-        self.kf = kalman_filter.KalmanFilter()
+        self.kf = kalman_filter.KalmanFilterBank()
         self.tracks = []
         self._next_id = 1
+        self.profiler = NULL_PROFILER  # set by DeepSort.set_profiler
+        self.last_assignment = {}  # track id -> index of its detection in the last update
+        self._index_detections([])  # grids of the detections being matched, see _match
 
     def predict(self):
         # STEP 1: at each time T, firstly we predict x' of each Track obj with KF
@@ -53,9 +67,19 @@ class Tracker:
 
         This function should be called once every time step, before `update`.
         """
-        for track in self.tracks:
-            # for each obj, predict state on time T with KF based on t-1
-            track.predict(self.kf)
+        with self.profiler.stage('kalman_predict'):
+            # predict state on time T with KF based on t-1, all tracks at once
+            self.kf.predict_slots([track.slot for track in self.tracks])
+            for track in self.tracks:
+                track.tick()
+
+    def propagate(self):
+        """Propagate track state distributions one frame forward on a frame
+        without detections. Unlike `predict`, track ages and the appearance
+        metric are left untouched, so the next `predict` + `update` cycle sees
+        the same track bookkeeping as if the frame had not been processed.
+        """
+        self.kf.predict_slots([track.slot for track in self.tracks])
 
     def update(self, detections):
         # STEP 2: Then we update
@@ -71,14 +95,22 @@ class Tracker:
         matches, unmatched_tracks, unmatched_detections = self._match(detections)
 
         #################################### (Stage 2) - Estimation (Update State) *********************************************
-        for track_idx, detection_idx in matches:
-            self.tracks[track_idx].update(self.kf, detections[detection_idx])
+        with self.profiler.stage('kalman_update'):
+            self.kf.update_slots([self.tracks[track_idx].slot for track_idx, _ in matches],
+                                 [detections[detection_idx].to_xyah() for _, detection_idx in matches])
+            for track_idx, detection_idx in matches:
+                self.tracks[track_idx].record_hit(detections[detection_idx])
             
         #################################### (Stage 4) - Tracks LifeCycle Update *********************************************
+        self.last_assignment = {self.tracks[track_idx].track_id: detection_idx for track_idx, detection_idx in matches}
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         for detection_idx in unmatched_detections:
+            self.last_assignment[self._next_id] = detection_idx
             self._initiate_track(detections[detection_idx])
+        for t in self.tracks:
+            if t.is_deleted():
+                self.kf.remove(t.slot)
         self.tracks = [t for t in self.tracks if not t.is_deleted()]
 
         #################################### Updating Cosine distance metric *********************************************
@@ -93,10 +125,10 @@ class Tracker:
         self.metric.partial_fit(
             np.asarray(features), np.asarray(targets), active_targets)
 
-    def _match(self, detections):
+    def _gated_metric(self, tracks, dets, track_indices, detection_indices):
         # Compute cost matrix between predicted tracks and current detections based on
         # appearance information and Mahalanobis distance
-        def gated_metric(tracks, dets, track_indices, detection_indices):
+        if self._centers is None:
             # Extract features of current detections
             features = np.array([dets[i].feature for i in detection_indices])
             # Extract track IDs of predicted tracks
@@ -106,22 +138,72 @@ class Tracker:
             cost_matrix = self.metric.distance(features, targets)
 
             # Filter out inappropriate entries in the cost matrix based on Mahalanobis distance
-            cost_matrix = linear_assignment.gate_cost_matrix(
+            return linear_assignment.gate_cost_matrix(
                 self.kf, cost_matrix, tracks, dets, track_indices,
                 detection_indices)
 
+        # Large crowd: on the candidate pairs only, all the other pairs would be gated (see _gating_candidates)
+        cost_matrix = np.full((len(track_indices), len(detection_indices)), linear_assignment.INFTY_COST)
+        rows, cols = self._gating_candidates(tracks, dets, track_indices, detection_indices)
+        if not len(rows):
             return cost_matrix
 
-        """
-        KF predict 
-            -- confirmed 
-                Matching_Cascade (appearance feature + distance)
-                    -- matched Tracks
-                    -- unmatched tracks
-                        -- 
-                    -- unmatched detection
-            -- unconfirmed 
-        """
+        # Extract features of the candidate detections and track IDs of the candidate tracks
+        det_cols, col_pos = np.unique(cols, return_inverse=True)
+        features = np.array([dets[detection_indices[col]].feature for col in det_cols])
+        targets = [tracks[track_indices[row]].track_id for row in rows]
+
+        # Cosine distance of appearance information, of the candidate pairs only
+        cost = self.metric.distance_pairs(features[col_pos], targets)
+
+        # Filter out inappropriate pairs based on Mahalanobis distance
+        measurements = np.asarray([dets[detection_indices[col]].to_xyah() for col in cols])
+        gating_distance = self.kf.gating_distance_pairs(
+            [tracks[track_indices[row]].slot for row in rows], measurements)
+        cost[gating_distance > kalman_filter.chi2inv95[4]] = linear_assignment.INFTY_COST
+
+        cost_matrix[rows, cols] = cost
+        return cost_matrix
+
+    def _gating_candidates(self, tracks, dets, track_indices, detection_indices):
+        """(row, column) positions of the pairs that can pass the Mahalanobis
+        gate: the detections whose center lies in the bounding box of the
+        track's gating ellipse (`KalmanFilterBank.gating_box`), looked up in
+        the grid of detection centers (`_index_detections`). A superset of the
+        feasible pairs, found in about O(tracks + detections)."""
+        boxes = self.kf.gating_box([tracks[i].slot for i in track_indices], kalman_filter.chi2inv95[4])
+        columns = {i: col for col, i in enumerate(detection_indices)}
+        rows, cols = [], []
+        for row, box in enumerate(boxes):
+            for i in self._centers.query(box):
+                col = columns.get(i)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+    def _index_detections(self, detections, force=False):
+        # Per-frame uniform grids of the detections (cell ~ a person's height): centers for
+        # the Mahalanobis gating candidates, boxes for the IoU candidates. Only for large
+        # crowds (GRID_MIN_PAIRS), None otherwise: all the pairs are evaluated
+        if not force and len(self.tracks) * len(detections) < GRID_MIN_PAIRS:
+            self._centers = self._boxes = None
+            return
+        tlbrs = np.array([d.to_tlbr() for d in detections]).reshape(-1, 4)
+        centers = np.array([d.to_xyah()[:2] for d in detections]).reshape(-1, 2)
+        cell_size = np.median(tlbrs[:, 3] - tlbrs[:, 1]) if len(tlbrs) else 1.
+        self._centers = GridIndex(np.hstack([centers, centers]), cell_size)
+        self._boxes = GridIndex(tlbrs, cell_size)
+
+    def _match(self, detections):
+        # KF predict
+        #     -- confirmed
+        #         Matching_Cascade (appearance feature + distance)
+        #             -- matched Tracks
+        #             -- unmatched tracks
+        #             -- unmatched detection
+        #     -- unconfirmed
+        self._index_detections(detections)
 
         # Split track set into confirmed and unconfirmed tracks. ********************************************
         confirmed_tracks = [
@@ -130,10 +212,11 @@ class Tracker:
             i for i, t in enumerate(self.tracks) if not t.is_confirmed()]   # unconfirmed: directly go to IOU match
 
         # Associate confirmed tracks using appearance features.(Matching_Cascade) ***************************
-        matches_a, unmatched_tracks_a, unmatched_detections = \
-            linear_assignment.matching_cascade(
-                gated_metric, self.metric.matching_threshold, self.max_age,
-                self.tracks, detections, confirmed_tracks)
+        with self.profiler.stage('cascade'):
+            matches_a, unmatched_tracks_a, unmatched_detections = \
+                linear_assignment.matching_cascade(
+                    self._gated_metric, self.metric.matching_threshold, self.max_age,
+                    self.tracks, detections, confirmed_tracks)
 
         # Associate remaining tracks together with unconfirmed tracks using IOU *****************
         # for IOU match: unconfirmed + u
@@ -146,10 +229,11 @@ class Tracker:
             self.tracks[k].time_since_update != 1]
 
         # IOU matching *************************************************************************************
-        matches_b, unmatched_tracks_b, unmatched_detections = \
-            linear_assignment.min_cost_matching(
-                iou_matching.iou_cost, self.max_iou_distance, self.tracks,
-                detections, iou_track_candidates, unmatched_detections)
+        with self.profiler.stage('iou_matching'):
+            matches_b, unmatched_tracks_b, unmatched_detections = \
+                linear_assignment.min_cost_matching(
+                    partial(iou_matching.iou_cost, index=self._boxes), self.max_iou_distance, self.tracks,
+                    detections, iou_track_candidates, unmatched_detections)
 
         matches = matches_a + matches_b
         unmatched_tracks = list(set(unmatched_tracks_a + unmatched_tracks_b))
@@ -161,5 +245,5 @@ class Tracker:
 
         self.tracks.append(Track(
             mean, covariance, self._next_id, self.n_init, self.max_age,
-            detection.feature,detection.pred_class)) # for new obj, create a new Track object for it
+            None if detection.reused else detection.feature,detection.pred_class, bank=self.kf)) # for new obj, create a new Track object for it
         self._next_id += 1
@@ -0,0 +1,338 @@
+from yolov5.utils.general import (check_img_size, non_max_suppression, scale_coords, xyxy2xywh)
+from yolov5.utils.torch_utils import select_device, time_synchronized
+from yolov5.utils.datasets import letterbox
+
+from utils_ds.parser import get_config
+from utils_ds.draw import draw_boxes
+from utils_ds.sinks import ThreadedVideoWriter, build_sink, SINKS
+from utils_ds.profiler import build_profiler, NULL_PROFILER
+from deep_sort import build_tracker
+from deep_sort.deep.feature_extractor import Extractor
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+import cv2
+import torch
+import torch.backends.cudnn as cudnn
+import sys
+
+from utilities import download_missing_model_files,download_missing_yolo_model_files
+
+deepsort_dir = os.path.dirname(__file__)
+sys.path.append(os.path.abspath(os.path.join(deepsort_dir, 'yolov5')))
+
+
+cudnn.benchmark = True
+
+
+class Stream(object):
+    """
+    Everything that belongs to one video source: capture, DeepSort state and outputs.
+    The detector and the ReID network are owned by MultiVideoTracker and shared.
+    """
+
+    def __init__(self, idx, source, deepsort):
+        self.idx = idx
+        self.source = source
+        self.name = 'cam%s' % source if isinstance(source, int) else os.path.splitext(os.path.basename(source))[0]
+        self.name = '%d_%s' % (idx, self.name)
+        self.deepsort = deepsort
+
+        self.vdo = cv2.VideoCapture(source) if isinstance(source, int) else cv2.VideoCapture()
+        self.writer = None
+        self.sink = None
+        self.profiler = NULL_PROFILER
+        self.alive = True
+
+        self.idx_frame = 0
+        self.last_out = torch.zeros((0, 6))
+        self.yolo_time, self.sort_time = [], []
+
+    def open(self):
+        if not isinstance(self.source, int):
+            assert os.path.isfile(self.source), "Path error: %s" % self.source
+            self.vdo.open(self.source)
+        assert self.vdo.isOpened(), "Error: could not open %s" % self.source
+        self.im_width = int(self.vdo.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.im_height = int(self.vdo.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.vdo.get(cv2.CAP_PROP_FPS)
+
+    def read(self):
+        t0 = time.perf_counter()
+        if self.alive and self.vdo.grab():
+            _, img0 = self.vdo.retrieve()
+            self.profiler.record('decode', time.perf_counter() - t0)
+            return img0
+        self.alive = False
+        return None
+
+    def stats(self):
+        return {'stream': self.name,
+                'source': str(self.source),
+                'frames': self.idx_frame,
+                'detections_frames': len(self.yolo_time),
+                'avg_yolo_time': sum(self.yolo_time) / len(self.yolo_time) if self.yolo_time else 0.,
+                'avg_sort_time': sum(self.sort_time) / len(self.sort_time) if self.sort_time else 0.}
+
+    def release(self):
+        self.vdo.release()
+        if self.writer is not None:
+            self.writer.release()
+        if self.sink is not None:
+            self.sink.close()
+
+
+class MultiVideoTracker(object):
+    """
+    Tracks several video files / cameras in one process.
+
+    One YOLO-V5 detector and one ReID Extractor are loaded once and shared, each stream keeps
+    its own DeepSort instance. At every step one frame is read from each live stream, the
+    detection frames of all streams go through a single detector forward pass, and the crops
+    of all streams go through a single ReID forward pass.
+    """
+
+    def __init__(self, args):
+        # Download missing models
+        if not args.offline:
+            download_missing_model_files(deepsort_dir)
+            download_missing_yolo_model_files(deepsort_dir)
+
+        print('Initialize DeepSORT & YOLO-V5 (shared by %d streams)' % len(args.input_paths))
+        # ***************** Initialize ******************************************************
+        self.args = args
+
+        self.img_size = args.img_size                   # image size in detector, default is 640
+        self.frame_interval = args.frame_interval       # frequency
+
+        self.device = select_device(args.device)
+        self.half = self.device.type != 'cpu'  # half precision only supported on CUDA
+
+        # ***************************** initialize DeepSORT **********************************
+        cfg = get_config()
+        cfg.merge_from_file(os.path.join(deepsort_dir,args.config_deepsort))
+        cfg.DEEPSORT.REID_CKPT = os.path.join(deepsort_dir,cfg.DEEPSORT.REID_CKPT)
+        use_cuda = self.device.type != 'cpu' and torch.cuda.is_available()
+        self.extractor = Extractor(cfg.DEEPSORT.REID_CKPT, use_cuda=use_cuda, roi_align=args.reid_roi_align)
+
+        sources = [int(p) if p.isdigit() else os.path.join(deepsort_dir, p) for p in args.input_paths]
+        self.streams = [Stream(i, source, build_tracker(cfg, use_cuda=use_cuda, extractor=self.extractor))
+                        for i, source in enumerate(sources)]
+
+        # ***************************** initialize YOLO-V5 **********************************
+        args.weights = os.path.join(deepsort_dir,args.weights)
+        self.detector = torch.load(args.weights, map_location=self.device)['model'].float()  # load to FP32
+
+        self.detector.to(self.device).eval()
+        self.detector.fuse()  # Conv2d + BatchNorm2d -> Conv2d, once at startup
+        if self.half:
+            self.detector.half()  # to FP16
+
+        self.names = self.detector.module.names if hasattr(self.detector, 'module') else self.detector.names
+
+        # ***************************** per-stage latency (--profile) ***********************
+        # detector and ReID batches are shared: recorded under the 'batch' stream, the rest per stream
+        self.profiler = build_profiler(args, 'batch', self.device, deepsort_dir)
+        for stream in self.streams:
+            stream.profiler = self.profiler.stream(stream.name)
+            stream.deepsort.set_profiler(stream.profiler)
+
+        if args.display:
+            for stream in self.streams:
+                cv2.namedWindow(stream.name, cv2.WINDOW_NORMAL)
+                cv2.resizeWindow(stream.name, args.display_width, args.display_height)
+        print('Done..')
+
+    def __enter__(self):
+        for stream in self.streams:
+            stream.open()
+            print('Done. Open stream %s (%dx%d)' % (stream.name, stream.im_width, stream.im_height))
+
+            # ************************* create per-stream output *************************
+            # --save_txt does not need the video: without --save_path it goes to output/<stream>/predict/
+            save_dir = os.path.join(deepsort_dir, self.args.save_path or 'output', stream.name)
+            if self.args.save_path:
+                os.makedirs(save_dir, exist_ok=True)
+                stream.writer = ThreadedVideoWriter(os.path.join(save_dir, "results.mp4"), self.args.fourcc,
+                                                    stream.fps, (stream.im_width, stream.im_height))
+            if self.args.save_txt:
+                save_txt = os.path.join(save_dir, 'predict') + os.sep
+                os.makedirs(save_txt, exist_ok=True)
+                stream.sink = build_sink(self.args.txt_format, save_txt, fps=stream.fps)
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        for stream in self.streams:
+            stream.release()
+        if exc_type:
+            print(exc_type, exc_value, exc_traceback)
+
+    def run(self):
+        t_start = time.time()
+        n_steps = 0
+        while any(stream.alive for stream in self.streams):
+            # Decode: one frame per live stream ************************************
+            frames = [(stream, stream.read()) for stream in self.streams]
+            frames = [(stream, img0) for stream, img0 in frames if img0 is not None]
+            if not frames:
+                break
+
+            # Inference: detection frames of all streams in one batch ****************
+            to_track = [(stream, img0) for stream, img0 in frames if stream.idx_frame % self.frame_interval == 0]
+            if to_track:
+                for (stream, _), (outputs, yt, st) in zip(to_track, self.image_track_batch(to_track)):
+                    stream.last_out = outputs
+                    stream.yolo_time.append(yt)
+                    stream.sort_time.append(st)
+            if self.args.skip_mode == 'predict':
+                # Kalman-propagated boxes on the frames skipped by the detector
+                for stream, _ in frames:
+                    if stream.idx_frame % self.frame_interval != 0:
+                        stream.last_out = stream.deepsort.predict_only()
+
+            # Per-stream outputs ******************************************************
+            stop = False
+            for stream, img0 in frames:
+                outputs = stream.last_out
+                with stream.profiler.stage('render'):
+                    if len(outputs) > 0:
+                        img0 = draw_boxes(img0, outputs[:, :4], outputs[:, -2])  # BGR
+                with stream.profiler.stage('write'):
+                    if stream.writer is not None:
+                        stream.writer.write(img0)
+                    if stream.sink is not None:
+                        stream.sink.write(stream.idx_frame, outputs)
+                if self.args.display:
+                    cv2.imshow(stream.name, img0)
+                stream.idx_frame += 1
+            if self.args.display and cv2.waitKey(1) == ord('q'):  # q to quit
+                cv2.destroyAllWindows()
+                stop = True
+
+            n_steps += 1
+            self.profiler.tick()
+            if n_steps % 100 == 0:
+                print('Step %d, %d live streams, %.2f frames/s in total' % (
+                    n_steps, len(frames), sum(s.idx_frame for s in self.streams) / (time.time() - t_start)))
+            if stop:
+                break
+
+        t_end = time.time()
+        for stream in self.streams:
+            stats = stream.stats()
+            print('[%s] frames: %d, Avg YOLO time (%.3fs), Sort time (%.3fs) per frame' % (
+                stream.name, stats['frames'], stats['avg_yolo_time'], stats['avg_sort_time']))
+            if self.args.save_path:
+                with open(os.path.join(deepsort_dir, self.args.save_path, stream.name, 'stats.json'), 'w') as f:
+                    json.dump(stats, f, indent=2)
+        print('Total time (%.3fs), Total Frame: %d' % (t_end - t_start, sum(s.idx_frame for s in self.streams)))
+        self.profiler.close()
+
+    def image_track_batch(self, frames):
+        """
+        :param frames: list of (stream, original image in BGR format)
+        :return: list of (outputs, yolo-time, sort-time), one per frame
+        """
+        #################################### (Stage 0) - Preprocess *********************************************
+        # Fixed (square) letterbox so that frames of different resolutions can share a batch
+        with self.profiler.stage('letterbox'):
+            imgs = np.stack([letterbox(im0, new_shape=self.img_size, auto=False)[0] for _, im0 in frames])
+            img = imgs[:, :, :, ::-1].transpose(0, 3, 1, 2)  # BGR to RGB, to bsx3x640x640
+            img = np.ascontiguousarray(img)
+            img = torch.from_numpy(img).to(self.device)
+            img = img.half() if self.half else img.float()  # uint8 to fp16/32
+            img /= 255.0  # 0 - 255 to 0.0 - 1.0
+
+        #################################### (Stage 1) - Detection *********************************************
+        t1 = time_synchronized()
+        with self.profiler.stage('forward', sync=True), torch.no_grad():
+            pred = self.detector(img, augment=self.args.augment)[0]
+        with self.profiler.stage('nms', sync=True):
+            pred = non_max_suppression(pred, self.args.conf_thres, self.args.iou_thres,
+                                       classes=self.args.classes, agnostic=self.args.agnostic_nms)
+        t2 = time_synchronized()
+        yolo_time = (t2 - t1) / len(frames)
+
+        #################################### (Stage 2) - ReID, one batch for all streams *************************
+        with self.profiler.stage('reid_preprocess'):
+            dets, batches, n_crops = [], [], []
+            for det, (stream, im0) in zip(pred, frames):
+                n = 0
+                if det is not None and len(det):
+                    det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape).round()
+                    bbox_xywh = xyxy2xywh(det[:, :4]).cpu()
+                    dets.append((bbox_xywh, det[:, 4:5].cpu(), det[:, 5:6].cpu()))
+                    boxes = stream.deepsort.get_boxes(bbox_xywh, im0)
+                    n = len(boxes)
+                    if n:
+                        batches.append(self.extractor._preprocess_boxes(im0, boxes))
+                else:
+                    dets.append(None)
+                n_crops.append(n)
+            im_batch = torch.cat(batches) if batches else None
+        with self.profiler.stage('reid_forward', sync=True):
+            features = self.extractor.forward(im_batch) if batches else np.array([])
+        reid_time = (time.time() - t2) / len(frames)
+
+        #################################### (Stage 3 & 4) - per-stream DeepSort *********************************
+        results, start = [], 0
+        for det, n, (stream, im0) in zip(dets, n_crops, frames):
+            t3 = time.time()
+            if det is not None:
+                bbox_xywh, confs, classes = det
+                outputs = stream.deepsort.update(bbox_xywh, confs, classes, im0, features=features[start:start + n])
+            else:
+                outputs = torch.zeros((0, 6)) # Expecting 6 things now (Class included)
+            start += n
+            results.append((outputs, yolo_time, reid_time + time.time() - t3))
+        return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    # input and output
+    parser.add_argument('--input_paths', type=str, nargs='+', default=[r'input/surveillance.webm'],
+                        help='video files and/or camera indices, e.g. input/a.mp4 input/b.mp4 0 1')
+    parser.add_argument('--save_path', type=str, default='output/', help='output folder, one sub-folder per stream')
+    parser.add_argument("--frame_interval", type=int, default=2)
+    parser.add_argument('--skip-mode', choices=['predict', 'hold'], default='predict',
+                        help='boxes on frames skipped by frame_interval: Kalman prediction or the last output')
+    parser.add_argument('--fourcc', type=str, default='mp4v', help='output video codec (verify ffmpeg support)')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--save_txt', action='store_true', help='save txt results for each stream')
+    parser.add_argument('--txt-format', choices=SINKS, default='mot',
+                        help='save_txt layout: mot (one results.txt), columnar (results.bin), store (indexed tracks/) '
+                             'or frames (one txt per frame)')
+
+    parser.add_argument('--profile', action='store_true', help='per-stage latency percentiles, per stream')
+    parser.add_argument('--profile-out', nargs='*', default=['output/profile.json', 'output/profile.prom'],
+                        help='snapshot files, Prometheus text for .prom, JSON otherwise')
+    parser.add_argument('--profile-interval', type=float, default=10., help='seconds between snapshots')
+    parser.add_argument('--profile-window', type=int, default=1024, help='samples per stage the percentiles are taken on')
+    parser.add_argument('--offline', action='store_true', help='never download the model files, they must be present')
+
+    parser.add_argument("--display", action="store_true")
+    parser.add_argument("--display_width", type=int, default=800)
+    parser.add_argument("--display_height", type=int, default=600)
+
+    # YOLO-V5 parameters
+    parser.add_argument('--weights', type=str, default='yolov5/weights/yolov5s.pt', help='model.pt path')
+    parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--conf-thres', type=float, default=0.3, help='object confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.5, help='IOU threshold for NMS')
+    parser.add_argument('--classes', nargs='+', type=int, default=[0], help='filter by class')
+    parser.add_argument('--agnostic-nms', action='store_true', help='class-agnostic NMS')
+    parser.add_argument('--augment', action='store_true', help='augmented inference')
+
+    # deepsort parameters
+    parser.add_argument("--config_deepsort", type=str, default = r"configs/deep_sort.yaml")
+    parser.add_argument('--reid-roi-align', action='store_true', help='build the ReID batch with one roi_align (slower on CPU, see bench_reid_preprocess.py)')
+
+    args = parser.parse_args()
+    args.img_size = check_img_size(args.img_size)
+    with MultiVideoTracker(args) as multi_trk:
+        multi_trk.run()
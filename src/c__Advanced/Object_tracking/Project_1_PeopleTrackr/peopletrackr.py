@@ -1,10 +1,20 @@
-from yolov5.utils.general import (check_img_size, non_max_suppression, scale_coords, xyxy2xywh)
+from yolov5.utils.general import (check_img_size, non_max_suppression, scale_coords, xyxy2xywh, xywh2xyxy)
 from yolov5.utils.torch_utils import select_device, time_synchronized
 from yolov5.utils.datasets import letterbox
 
 from utils_ds.parser import get_config
-from utils_ds.draw import draw_boxes
-from deep_sort import build_tracker
+from utils_ds.draw import Renderer
+from utils_ds.focus import FocusRecorder
+from utils_ds.trajectories import TrajectoryStore
+from utils_ds.pipeline import Pipeline
+from utils_ds.scheduler import DetectionScheduler
+from utils_ds.tiling import make_tiles, inner_edge_mask
+from utils_ds.preprocess import LetterboxPreprocessor
+from utils_ds.backends import load_backend, TorchBackend, ParityCheck, BACKENDS
+from utils_ds.quantize import int8_path
+from utils_ds.sinks import ThreadedVideoWriter, build_sink, SINKS
+from utils_ds.profiler import build_profiler
+from deep_sort import build_tracker, FeatureCache
 
 import argparse
 import os
@@ -17,7 +27,7 @@ import torch.backends.cudnn as cudnn
 
 import sys
 
-from utilities import putText,add_to_dict_deque,find_centroid,Gui,closest_bbox_to_pt
+from utilities import putText,Gui,closest_bbox_to_pt
 from utilities import download_missing_model_files,download_missing_yolo_model_files
 
 deepsort_dir = os.path.dirname(__file__)
@@ -30,8 +40,9 @@ cudnn.benchmark = True
 class VideoTracker(object):
     def __init__(self, args):
         # Download missing models
-        download_missing_model_files(deepsort_dir)
-        download_missing_yolo_model_files(deepsort_dir)
+        if not args.offline:
+            download_missing_model_files(deepsort_dir)
+            download_missing_yolo_model_files(deepsort_dir)
         
         print('Initialize DeepSORT & YOLO-V5')
         # ***************** Initialize ******************************************************
@@ -58,18 +69,52 @@ class VideoTracker(object):
         cfg = get_config()
         cfg.merge_from_file(os.path.join(deepsort_dir,args.config_deepsort))
         cfg.DEEPSORT.REID_CKPT = os.path.join(deepsort_dir,cfg.DEEPSORT.REID_CKPT)
+        if args.reid_int8:
+            cfg.DEEPSORT.REID_CKPT = int8_path(cfg.DEEPSORT.REID_CKPT)  # written by quantize.py, runs on CPU
         use_cuda = self.device.type != 'cpu' and torch.cuda.is_available()
-        self.deepsort = build_tracker(cfg, use_cuda=use_cuda)
+        feature_cache = None
+        if args.reid_cache:  # reuse the feature of a track whose box and pixels barely changed
+            feature_cache = FeatureCache(iou_thres=args.reid_cache_iou, pixel_thres=args.reid_cache_pixels,
+                                         refresh=args.reid_cache_refresh)
+        self.deepsort = build_tracker(cfg, use_cuda=use_cuda, feature_cache=feature_cache, roi_align=args.reid_roi_align)
 
         # ***************************** initialize YOLO-V5 **********************************
         args.weights = os.path.join(deepsort_dir,args.weights)
         self.detector = torch.load(args.weights, map_location=self.device)['model'].float()  # load to FP32
 
         self.detector.to(self.device).eval()
+        self.detector.fuse()  # Conv2d + BatchNorm2d -> Conv2d, once at startup
         if self.half:
             self.detector.half()  # to FP16
 
         self.names = self.detector.module.names if hasattr(self.detector, 'module') else self.detector.names
+        self.preprocessor = None  # built on the first frame, once the source resolution is known
+
+        # nothing is drawn when the frames are neither displayed nor written
+        self.headless = not (args.display or args.save_path)
+        self.renderer = Renderer(preview_scale=args.preview_scale)
+
+        # the .pt model also provides the class names and the anchors/strides used to decode exported models
+        self.backend = load_backend(args.backend, self.detector, args.weights, self.device, self.img_size,
+                                    augment=args.augment, batch_size=args.export_batch_size,
+                                    jit=args.jit, half=self.half, cache_dir=os.path.join(deepsort_dir, args.jit_cache))
+        if args.backend != 'torch' or args.jit:
+            if args.parity_frames > 0:
+                self.backend = ParityCheck(self.backend, TorchBackend(self.detector), frames=args.parity_frames,
+                                           conf_thres=args.conf_thres)
+            self.detector = None  # only the parity reference (if any) keeps the eager model alive
+
+        # ***************************** adaptive detection scheduling ***********************
+        self.scheduler = None
+        if args.adaptive:
+            self.scheduler = DetectionScheduler(min_interval=args.min_interval, max_interval=args.max_interval,
+                                                motion_thres=args.motion_thres,
+                                                log_path=os.path.join(deepsort_dir, args.schedule_log) if args.schedule_log else None)
+
+        # ***************************** per-stage latency (--profile) ***********************
+        stream = 'cam%d' % args.cam if args.cam != -1 else os.path.splitext(os.path.basename(args.input_path))[0]
+        self.profiler = build_profiler(args, stream, self.device, deepsort_dir)  # NULL_PROFILER without --profile
+        self.deepsort.set_profiler(self.profiler)
 
         print('Done..')
         if self.device == 'cpu':
@@ -95,172 +140,385 @@ class VideoTracker(object):
             print('Done. Load video file ', self.args.input_path)
 
         # ************************* create output *************************
+        self.writer, self.sink = None, None
         if self.args.save_path:
             self.args.save_path = os.path.join(deepsort_dir,self.args.save_path)
             os.makedirs(self.args.save_path, exist_ok=True)
             # path of saved video and results
             self.save_video_path = os.path.join(self.args.save_path, "results.mp4")
 
-            # create video writer
-            fourcc = cv2.VideoWriter_fourcc(*self.args.fourcc)
-            self.writer = cv2.VideoWriter(self.save_video_path, fourcc,
-                                          self.vdo.get(cv2.CAP_PROP_FPS), (self.im_width, self.im_height))
+            # create video writer, encoding runs in a background thread
+            self.writer = ThreadedVideoWriter(self.save_video_path, self.args.fourcc, self.vdo.get(cv2.CAP_PROP_FPS),
+                                              self.renderer.output_size(self.im_width, self.im_height),
+                                              queue_size=self.args.queue_size)
             print('Done. Create output file ', self.save_video_path)
 
         if self.args.save_txt:
             self.args.save_txt = os.path.join(deepsort_dir,self.args.save_txt)
             os.makedirs(self.args.save_txt, exist_ok=True)
+            self.sink = build_sink(self.args.txt_format, self.args.save_txt, fps=self.vdo.get(cv2.CAP_PROP_FPS))
 
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
         self.vdo.release()
-        self.writer.release()
+        if self.writer is not None:
+            self.writer.release()  # waits for the pending frames
+        if self.sink is not None:
+            self.sink.close()
+        if getattr(self, 'focus', None) is not None:
+            self.focus.close()
         if exc_type:
             print(exc_type, exc_value, exc_traceback)
 
     def run(self):
-        yolo_time, sort_time, avg_fps = [], [], []
+        self.yolo_time, self.sort_time, self.avg_fps = [], [], []
         t_start = time.time()
 
+        self.last_out = None
+        self._init_render_state()
+
+        if self.args.pipeline:
+            n_frames = self._run_pipelined()
+        else:
+            n_frames = 0
+            tracked = (item for chunk in self._read_chunks() for item in self._infer(chunk))
+            for idx_frame, img0, outputs in tracked:
+                with self.profiler.stage('render'):
+                    img0 = self._render(idx_frame, img0, outputs)
+                with self.profiler.stage('write'):
+                    self._write(idx_frame, img0, outputs)
+                self.profiler.tick()
+                n_frames += 1
+                if not self._display(img0):
+                    break
+
+        if self.yolo_time:
+            print('Avg YOLO time (%.3fs), Sort time (%.3fs) per frame' % (sum(self.yolo_time) / len(self.yolo_time),
+                                                                sum(self.sort_time)/len(self.sort_time)))
+        if self.scheduler is not None:
+            stats = self.scheduler.summary()
+            per_det = (sum(self.yolo_time) + sum(self.sort_time)) / max(len(self.yolo_time), 1)
+            print('Adaptive scheduling: %d/%d frames detected, %d skipped (%.1f%%), ~%.2fs of detection saved, %s' % (
+                stats['detections'], stats['frames'], stats['skipped'], 100 * stats['skipped_ratio'],
+                stats['skipped'] * per_det, stats['reasons']))
+            self.scheduler.close()
+        if self.deepsort.feature_cache is not None:
+            stats = self.deepsort.feature_cache.stats()
+            print('ReID cache: %d/%d features reused (%.1f%%), ~%.2fs of ReID saved, recomputed: %s' % (
+                stats['hits'], stats['lookups'], 100 * stats['hit_rate'], stats['saved_seconds'], stats['misses']))
+        t_end = time.time()
+        print('Total time (%.3fs), Total Frame: %d' % (t_end - t_start, n_frames))
+        self.profiler.close()  # final snapshot files and stage latency report
+        return n_frames
+
+    def _run_pipelined(self):
+        """
+        Runs decode, inference+tracking, rendering and writing in their own worker threads,
+        connected by bounded queues. Display stays on the main thread (required by cv2.imshow).
+        """
+        # Items travel between stages as chunks: lists of frames (see _read_chunks)
+        def render(chunk):
+            rendered = []
+            for idx_frame, img0, outputs in chunk:
+                with self.profiler.stage('render'):
+                    rendered.append((idx_frame, self._render(idx_frame, img0, outputs), outputs))
+            return rendered
+
+        def write(chunk):
+            for item in chunk:
+                with self.profiler.stage('write'):
+                    self._write(*item)
+            return chunk
+
+        stages = [('infer', self._infer), ('render', render), ('write', write)]
+        pipe = Pipeline(self._read_chunks(), stages, queue_size=self.args.queue_size)
+
+        n_frames = 0
+        t_report = time.time()
+        for chunk in pipe:
+            for _, img0, _ in chunk:
+                n_frames += 1
+                if not self._display(img0):
+                    pipe.stop()
+                    break
+            if pipe.stop_event.is_set():
+                break
+            self.profiler.tick()
+            # per-stage queue depth and throughput, every few seconds
+            if time.time() - t_report > 5.:
+                pipe.report()
+                t_report = time.time()
+        pipe.join()
+        pipe.report()
+        return n_frames
+
+    def _read_frames(self):
+        # Decode ***********************************************************************
         idx_frame = 0
-        last_out = None
-        
-        # ====================> b Display people trajectories b <<<<<<<<<<<<<<<<<<<<<<<<<<
-        trajectories = {} # Dictionary to store trajectories against each tracked object
-        mask = np.zeros((self.im_height,self.im_width,3),np.uint8) # mask to remember trajectories for each tracked object
-        
-        # ====================> c Focus on a suspicious individual c <======================
-        gui = Gui()
-        if self.args.display:
-            gui.select_pt("test")
-        id_to_track = None
-        
+        t0 = time.perf_counter()
         while self.vdo.grab():
-            # Inference *********************************************************************
-            t0 = time.time()
             _, img0 = self.vdo.retrieve()
+            self.profiler.record('decode', time.perf_counter() - t0)
+            yield idx_frame, img0
+            idx_frame += 1
+            t0 = time.perf_counter()
+
+    def _is_detection_frame(self, idx_frame, img0):
+        if self.scheduler is not None:
+            return self.scheduler.decide(idx_frame, img0, self.deepsort.tracker.tracks)
+        return idx_frame % self.args.frame_interval == 0
 
-            if idx_frame % self.args.frame_interval == 0:
-                outputs, yt, st = self.image_track(img0)        # (#ID, 5) x1,y1,x2,y2,id
-                last_out = outputs
-                yolo_time.append(yt)
-                sort_time.append(st)
+    def _read_chunks(self):
+        """
+        Groups consecutive frames into chunks holding at most `batch_size` detection frames
+        (see _is_detection_frame). Frames in between ride along so that
+        the chunk can be tracked and emitted in order.
+        A frame is only tracked once its chunk is complete: with --adaptive up to
+        max_interval x batch_size frames of extra latency (frame_interval x batch_size otherwise).
+        """
+        chunk, n_det = [], 0
+        for idx_frame, img0 in self._read_frames():
+            detect = self._is_detection_frame(idx_frame, img0)
+            chunk.append((idx_frame, img0, detect))
+            if detect:
+                n_det += 1
+            if n_det == self.args.batch_size:
+                yield chunk
+                chunk, n_det = [], 0
+        if chunk:
+            yield chunk
+
+    def _infer(self, chunk):
+        # Inference *********************************************************************
+        t0 = time.time()
+        det_frames = [img0 for _, img0, detect in chunk if detect]
+        dets, yt = self.detect_batch(det_frames) if det_frames else ([], 0.)
+        dets = iter(dets)
+
+        tracked = []
+        for idx_frame, img0, detect in chunk:
+            if detect:
+                outputs, st = self.track(next(dets), img0)        # (#ID, 6) x1,y1,x2,y2,id,cls
+                if self.scheduler is not None:
+                    self.scheduler.on_tracked(self.deepsort.tracker.tracks, idx_frame)
+                self.last_out = outputs
+                self.yolo_time.append(yt)
+                self.sort_time.append(st)
                 print('Frame %d Done. YOLO-time:(%.3fs) SORT-time:(%.3fs)' % (idx_frame, yt, st))
+            elif self.args.skip_mode == 'predict':
+                outputs = self.deepsort.predict_only()  # Kalman-propagated boxes, no YOLO / ReID
             else:
-                outputs = last_out  # directly use prediction in last frames
-            t1 = time.time()
-            avg_fps.append(t1 - t0)
+                outputs = self.last_out  # directly use prediction in last frames
+            tracked.append((idx_frame, img0, outputs))
+        t1 = time.time()
+        self.avg_fps += [(t1 - t0) / len(chunk)] * len(chunk)
+        return tracked
 
-            lrtbs = []
-            # post-processing ***************************************************************
-            # visualize bbox  ********************************
-            if len(outputs) > 0:
-                
-                for output in outputs:
-                    lrtb = output[:4]
-                    t_id = output[-2]
-                    add_to_dict_deque(trajectories,t_id,find_centroid(lrtb))
-                    lrtbs.append(lrtb)
-                    
-                
-                # (#obj, 6) (x1,y1,x2,y2,ID,Class)
-                bbox_xyxy = outputs[:, :4]
-                identities = outputs[:, -2] # Second last is TrackID
-                t_classes = outputs[:, -1] # Last is Class
-                
-                if gui.clicked_pt:
-                    selected_id = closest_bbox_to_pt(gui.clicked_pt,lrtbs)[1]
-                    id_to_track = outputs[selected_id,-2]
-                    mask = np.zeros_like(img0)
-                    gui.clicked_pt.clear()
-                    
-                categories = self.names
-                # Only display classes if multiple are available.
-                if self.args.classes and len(self.args.classes)==1:
-                    categories = None
-                
-                tracking_data = {'mask':mask,'trajectories':trajectories,'id_to_track':id_to_track,'t_classes':t_classes,'categories':categories}
-                
-                img0 = draw_boxes(img0, bbox_xyxy, identities,**tracking_data)  # BGR
-                                    
-                # add FPS information on output video
-                text_scale = max(1, img0.shape[1] // 1000)
-                cv2.putText(img0, 'frame: %d fps: %.2f ' % (idx_frame, len(avg_fps) / sum(avg_fps)),
-                        (20, 20 + text_scale), cv2.FONT_HERSHEY_PLAIN, text_scale, (0, 0, 255), thickness=2)
-
-                #=================> a Live People Counter a <==========================
-                s = ""
-                for c in np.unique(t_classes):
-                    n = (c==t_classes).sum()
-                    s += '%g %ss, ' % (n, self.names[int(c)])
-                    
-                putText(img0,s,font_scale = text_scale,thickness=2,bg_color=(0,0,0))
-                
-
-            # display on window ******************************
-            if self.args.display:
-                cv2.imshow("test", img0)
-                if cv2.waitKey(1) == ord('q'):  # q to quit
-                    cv2.destroyAllWindows()
-                    break
+    def _init_render_state(self):
+        # ====================> b Display people trajectories b <<<<<<<<<<<<<<<<<<<<<<<<<<
+        # short polyline per active track, stale tracks evicted: memory stays flat however long the run
+        self.trajectories = TrajectoryStore(max_points=self.args.trail_points, decay=self.args.trail_seconds,
+                                            evict_after=self.args.trail_seconds)
+        self.fps = self.vdo.get(cv2.CAP_PROP_FPS) or 25.  # 0 for some webcams / streams
+
+        # ====================> c Focus on a suspicious individual c <======================
+        self.gui = Gui()
+        if self.args.display:
+            self.gui.select_pt("test")
+        self.focus = FocusRecorder(os.path.join(deepsort_dir, self.args.focus_dir), names=self.names)  # closed in __exit__
+        for track_id in self.args.focus_ids:
+            self.focus.focus(track_id)
 
-            # save to video file *****************************
-            if self.args.save_path:
-                self.writer.write(img0)
+    def _render(self, idx_frame, img0, outputs):
+        if self.headless:
+            if len(outputs) > 0:
+                self.focus.record(idx_frame, outputs)
+            return img0
+        self.trajectories.update(idx_frame / self.fps, outputs)  # also evicts the tracks gone for trail_seconds
+        lrtbs = []
+        # post-processing ***************************************************************
+        # visualize bbox  ********************************
+        if len(outputs) > 0:
+
+            for output in outputs:
+                lrtbs.append(output[:4])
+
+
+            # (#obj, 6) (x1,y1,x2,y2,ID,Class)
+            bbox_xyxy = outputs[:, :4]
+            identities = outputs[:, -2] # Second last is TrackID
+            t_classes = outputs[:, -1] # Last is Class
+
+            if self.gui.clicked_pt:
+                # a click focuses on the closest individual, or releases it if already focused
+                selected_id = closest_bbox_to_pt(self.gui.clicked_pt,lrtbs)[1]
+                self.focus.toggle(outputs[selected_id,-2])
+                self.gui.clicked_pt.clear()
+            self.focus.record(idx_frame, outputs)
+
+            categories = self.names
+            # Only display classes if multiple are available.
+            if self.args.classes and len(self.args.classes)==1:
+                categories = None
+
+            tracking_data = {'trajectories':self.trajectories,'id_to_track':self.focus.ids,'t_classes':t_classes,'categories':categories}
+
+            img0 = self.renderer.draw(img0, bbox_xyxy, identities,**tracking_data)  # BGR, preview resolution
+
+            # add FPS information on output video
+            text_scale = max(1, img0.shape[1] // 1000)
+            cv2.putText(img0, 'frame: %d fps: %.2f ' % (idx_frame, len(self.avg_fps) / sum(self.avg_fps)),
+                    (20, 20 + text_scale), cv2.FONT_HERSHEY_PLAIN, text_scale, (0, 0, 255), thickness=2)
+
+            #=================> a Live People Counter a <==========================
+            s = ""
+            for c in np.unique(t_classes):
+                n = (c==t_classes).sum()
+                s += '%g %ss, ' % (n, self.names[int(c)])
+
+            putText(img0,s,font_scale = text_scale,thickness=2,bg_color=(0,0,0))
+        else:
+            img0 = self.renderer.draw(img0, [])  # preview resolution
+        return img0
 
-            if self.args.save_txt:
-                with open(self.args.save_txt + str(idx_frame).zfill(4) + '.txt', 'a') as f:
-                    for i in range(len(outputs)):
-                        x1, y1, x2, y2, idx,class_id = outputs[i]
-                        f.write('{}\t{}\t{}\t{}\t{}\t{}\n'.format(x1, y1, x2, y2, idx, class_id))
+    def _write(self, idx_frame, img0, outputs):
+        # save to video file *****************************
+        if self.args.save_path:
+            self.writer.write(img0)
 
-            idx_frame += 1
+        if self.sink is not None:
+            self.sink.write(idx_frame, outputs)
 
-        print('Avg YOLO time (%.3fs), Sort time (%.3fs) per frame' % (sum(yolo_time) / len(yolo_time),
-                                                            sum(sort_time)/len(sort_time)))
-        t_end = time.time()
-        print('Total time (%.3fs), Total Frame: %d' % (t_end - t_start, idx_frame))
+    def _display(self, img0):
+        # display on window ******************************
+        if self.args.display:
+            cv2.imshow("test", img0)
+            if cv2.waitKey(1) == ord('q'):  # q to quit
+                cv2.destroyAllWindows()
+                return False
+        return True
 
 
     def image_track(self, im0):
         """
         :param im0: original image, BGR format
-        :return:
+        :return: outputs (#ID, 6), yolo-time, sort-time
+        """
+        return self.image_track_batch([im0])[0]
+
+    def image_track_batch(self, im0s):
         """
+        Runs one detector forward pass (and one batched NMS) over several frames,
+        then feeds DeepSort with the per-frame detections strictly in order.
+        :param im0s: list of original images, BGR format, all with the same resolution
+        :return: list of (outputs, yolo-time, sort-time), one per image
+        """
+        dets, yolo_time = self.detect_batch(im0s)
+        results = []
+        for det, im0 in zip(dets, im0s):
+            outputs, sort_time = self.track(det, im0)
+            results.append((outputs, yolo_time, sort_time))
+        return results
+
+    def detect_batch(self, im0s):
+        """
+        :param im0s: list of original images, BGR format, all with the same resolution
+        :return: list of detections (#obj, 6) x1 y1 x2 y2 conf cls in im0 coordinates (or None), yolo-time per image
+        """
+        if self.args.tile_size:
+            return self.detect_tiled_batch(im0s)
+
         #################################### (Stage 0) - Preprocess *********************************************
-        # Padded resize
-        img = letterbox(im0, new_shape=self.img_size)[0]
-        # Convert
-        img = img[:, :, ::-1].transpose(2, 0, 1)  # BGR to RGB, to 3x416x416
-        img = np.ascontiguousarray(img)
-        # numpy to tensor
-        img = torch.from_numpy(img).to(self.device)
-        img = img.half() if self.half else img.float()  # uint8 to fp16/32
-        img /= 255.0  # 0 - 255 to 0.0 - 1.0
-        if img.ndimension() == 3:
-            img = img.unsqueeze(0)
-        s = '%gx%g ' % img.shape[2:]    # print string
+        # Padded resize, BGR to RGB, to bsx3x416x416, uint8 to fp16/32, 0 - 255 to 0.0 - 1.0 (preallocated buffers)
+        with self.profiler.stage('letterbox'):
+            if self.preprocessor is None or not self.preprocessor.accepts(im0s):
+                self.preprocessor = LetterboxPreprocessor(im0s[0].shape, self.img_size, max(len(im0s), self.args.batch_size),
+                                                          self.device, self.half,
+                                                          auto=self.backend.dynamic_shape)  # exported models: fixed square input
+            img, _ = self.preprocessor(im0s)
 
         #################################### (Stage 1) - Detection *********************************************
         # Inference
         t1 = time_synchronized()
-        with torch.no_grad():
-            pred = self.detector(img, augment=self.args.augment)[0]  # list: bz * [ (#obj, 6)]
+        with self.profiler.stage('forward', sync=True):
+            pred = self.backend(img)  # (bz, #anchors, 5 + #classes)
 
         #################################### (Stage 1.5) - PostProcessing *********************************************
         # Apply NMS and filter object other than person (cls:0)
-        pred = non_max_suppression(pred, self.args.conf_thres, self.args.iou_thres,
-                                   classes=self.args.classes, agnostic=self.args.agnostic_nms)
+        with self.profiler.stage('nms', sync=True):
+            pred = non_max_suppression(pred, self.args.conf_thres, self.args.iou_thres,
+                                       classes=self.args.classes, agnostic=self.args.agnostic_nms)
+            for det, im0 in zip(pred, im0s):
+                if det is not None and len(det):  # det: (#obj, 6)  x1 y1 x2 y2 conf cls
+                    # Rescale boxes from img_size to original im0 size
+                    det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape).round()
         t2 = time_synchronized()
-        det = pred[0]  # for video, bz is 1
+        return pred, (t2 - t1) / len(im0s)   # batch cost shared evenly between its frames
+
+    def detect_tiled_batch(self, im0s):
+        """
+        Tiled (sliced) detection for high resolution frames. Each frame is cut into overlapping tiles,
+        plus one global downscaled view. All views of all frames go through one forward pass. Their raw
+        predictions are mapped back to the frame with scale_coords and merged across tile seams with NMS.
+        :param im0s: list of original images, BGR format
+        :return: list of detections (#obj, 6) x1 y1 x2 y2 conf cls in im0 coordinates (or None), yolo-time per image
+        """
+        #################################### (Stage 0) - Preprocess *********************************************
+        with self.profiler.stage('letterbox'):
+            views, imgs = [], []   # views: (frame index, tile (None for the global view), view shape, ratio_pad)
+            for i, im0 in enumerate(im0s):
+                for tile in [None] + make_tiles(im0.shape, self.args.tile_size, self.args.tile_overlap):
+                    crop = im0 if tile is None else im0[tile[1]:tile[3], tile[0]:tile[2]]
+                    img, ratio, pad = letterbox(crop, new_shape=self.img_size, auto=False)  # same shape for all views
+                    imgs.append(img)
+                    views.append((i, tile, crop.shape, (ratio, pad)))
+            img = np.stack(imgs)[:, :, :, ::-1].transpose(0, 3, 1, 2)  # BGR to RGB, to #viewsx3x640x640
+            img = np.ascontiguousarray(img)
+            img = torch.from_numpy(img).to(self.device)
+            img = img.half() if self.half else img.float()  # uint8 to fp16/32
+            img /= 255.0  # 0 - 255 to 0.0 - 1.0
+
+        #################################### (Stage 1) - Detection *********************************************
+        t1 = time_synchronized()
+        with self.profiler.stage('forward', sync=True):
+            pred = self.backend(img)  # (#views, #anchors, 5 + #classes)
+
+        #################################### (Stage 1.5) - Map views back to the frame & merge *****************
+        with self.profiler.stage('nms', sync=True):
+            merged = [[] for _ in im0s]
+            for p, (i, tile, shape, ratio_pad) in zip(pred, views):
+                p = p[p[:, 4] > self.args.conf_thres]  # same objectness filter as non_max_suppression
+                if not len(p):
+                    continue
+                box = scale_coords(img.shape[2:], xywh2xyxy(p[:, :4]), shape, ratio_pad)
+                if tile is not None:
+                    box[:, [0, 2]] += tile[0]
+                    box[:, [1, 3]] += tile[1]
+                    # objects cut by an inner tile edge are seen whole by a neighbouring tile or the global view
+                    keep = torch.from_numpy(~inner_edge_mask(box.cpu().numpy(), tile, im0s[i].shape)).to(p.device)
+                    p, box = p[keep], box[keep]
+                p[:, :4] = xyxy2xywh(box)
+                merged[i].append(p)
+
+            dets = []
+            for ps in merged:
+                det = None
+                if ps:
+                    det = non_max_suppression(torch.cat(ps, 0).unsqueeze(0), self.args.conf_thres, self.args.iou_thres,
+                                              classes=self.args.classes, agnostic=self.args.agnostic_nms)[0]
+                dets.append(det)
+        t2 = time_synchronized()
+        return dets, (t2 - t1) / len(im0s)
+
+    def track(self, det, im0):
+        """
+        :param det: detections of im0 (#obj, 6) x1 y1 x2 y2 conf cls, as returned by detect_batch
+        :param im0: original image, BGR format
+        :return: outputs (#ID, 6) x1,y1,x2,y2,track_ID,Class, sort-time
+        """
+        t2 = time.time()
         if det is not None and len(det):  # det: (#obj, 6)  x1 y1 x2 y2 conf cls
-            # Rescale boxes from img_size to original im0 size
-            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape).round()
-            # Print results. statistics of number of each obj
-            for c in det[:, -1].unique():
-                n = (det[:, -1] == c).sum()  # detections per class
-                s += '%g %ss, ' % (n, self.names[int(c)])  # add to string
             bbox_xywh = xyxy2xywh(det[:, :4]).cpu()
             confs = det[:, 4:5].cpu()
             classes = det[:, 5:6].cpu()
@@ -272,28 +530,45 @@ class VideoTracker(object):
             outputs = torch.zeros((0, 6)) # Expecting 6 things now (Class included)
 
         t3 = time.time()
-        return outputs, t2-t1, t3-t2
+        return outputs, t3-t2
 
 
-if __name__ == '__main__':
-    
-    # Project (People Tracker)
-    ## Features
-    ### a > Live people counter 
-    ### b > Display tracked people trajectories
-    ### c > Focus on a suspicious individual <--- Here
-
+def make_parser():
     parser = argparse.ArgumentParser()
     # input and output
     parser.add_argument('--input_path', type=str, default=r'input/surveillance.webm', help='source')  # file/folder, 0 for webcam
     parser.add_argument('--save_path', type=str, default='output/', help='output folder')  # output folder
     parser.add_argument("--frame_interval", type=int, default=2)
+    parser.add_argument('--skip-mode', choices=['predict', 'hold'], default='predict',
+                        help='boxes on frames skipped by frame_interval: Kalman prediction or the last output')
+    parser.add_argument('--adaptive', action='store_true', help='decide per frame whether to detect (replaces frame_interval)')
+    parser.add_argument('--min-interval', type=int, default=1, help='adaptive: minimum frames between detections')
+    parser.add_argument('--max-interval', type=int, default=6, help='adaptive: maximum frames between detections')
+    parser.add_argument('--motion-thres', type=float, default=0.02, help='adaptive: frame-difference energy that triggers a detection')
+    parser.add_argument('--schedule-log', type=str, default='', help='adaptive: csv file logging every decision')
     parser.add_argument('--fourcc', type=str, default='mp4v', help='output video codec (verify ffmpeg support)')
     parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
     parser.add_argument('--save_txt', default='output/predict/', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--txt-format', choices=SINKS, default='mot',
+                        help='save_txt layout: mot (one results.txt), columnar (results.bin), store (indexed tracks/) '
+                             'or frames (one txt per frame)')
+    parser.add_argument('--focus-ids', nargs='+', type=int, default=[], help='track IDs to focus on from the start')
+    parser.add_argument('--focus-dir', type=str, default='output/focus', help='CSV trail of each focused ID')
+    parser.add_argument('--trail-points', type=int, default=64, help='positions kept per trajectory')
+    parser.add_argument('--trail-seconds', type=float, default=10., help='trajectory length, and how long a lost track is kept')
+    parser.add_argument('--pipeline', action='store_true', help='run decode/infer/render/write in parallel worker threads')
+    parser.add_argument('--queue-size', type=int, default=8, help='capacity of each queue between pipeline stages')
+    parser.add_argument('--batch-size', type=int, default=1, help='number of detection frames per detector forward pass (offline)')
+    parser.add_argument('--profile', action='store_true', help='per-stage latency percentiles (decode, forward, nms, reid, matching, ...)')
+    parser.add_argument('--profile-out', nargs='*', default=['output/profile.json', 'output/profile.prom'],
+                        help='snapshot files, Prometheus text for .prom, JSON otherwise')
+    parser.add_argument('--profile-interval', type=float, default=10., help='seconds between snapshots')
+    parser.add_argument('--profile-window', type=int, default=1024, help='samples per stage the percentiles are taken on')
 
     # camera only
     parser.add_argument("--display", action="store_true")
+    parser.add_argument('--headless', action='store_true', help='no window and no video, skips all drawing')
+    parser.add_argument('--preview-scale', type=float, default=1., help='render (display / video) at this fraction of the input resolution')
     parser.add_argument("--display_width", type=int, default=800)
     parser.add_argument("--display_height", type=int, default=600)
     parser.add_argument("--camera", action="store", dest="cam", type=int, default="-1")
@@ -306,13 +581,41 @@ if __name__ == '__main__':
     parser.add_argument('--classes', nargs='+', type=int, default=[0], help='filter by class')
     parser.add_argument('--agnostic-nms', action='store_true', help='class-agnostic NMS')
     parser.add_argument('--augment', action='store_true', help='augmented inference')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch',
+                        help='detector runtime, non-torch backends load the model written by yolov5/models/export.py')
+    parser.add_argument('--jit', action='store_true', help='torch backend: trace the fused model for a fixed img-size input')
+    parser.add_argument('--jit-cache', type=str, default='cache', help='folder of the traced models, reused across restarts')
+    parser.add_argument('--export-batch-size', type=int, default=1, help='batch size the exported model was built with')
+    parser.add_argument('--parity-frames', type=int, default=10,
+                        help='compare a non-torch backend against the torch model on the first N batches (0: off)')
+    parser.add_argument('--tile-size', type=int, default=0, help='tiled detection with tiles of this size (0: off)')
+    parser.add_argument('--tile-overlap', type=int, default=128, help='overlap between tiles (pixels)')
 
     # deepsort parameters
     parser.add_argument("--config_deepsort", type=str, default = r"configs/deep_sort.yaml")
+    parser.add_argument('--offline', action='store_true', help='never download the model files, they must be present')
+    parser.add_argument('--reid-int8', action='store_true', help='use the INT8 ReID model written by quantize.py')
+    parser.add_argument('--reid-roi-align', action='store_true', help='build the ReID batch with one roi_align (slower on CPU, see bench_reid_preprocess.py)')
+    parser.add_argument('--reid-cache', action='store_true', help='reuse the ReID feature of a track that barely changed')
+    parser.add_argument('--reid-cache-iou', type=float, default=0.9, help='reid-cache: minimum IoU with the cached box')
+    parser.add_argument('--reid-cache-pixels', type=float, default=6., help='reid-cache: maximum mean gray level change')
+    parser.add_argument('--reid-cache-refresh', type=int, default=10, help='reid-cache: recompute after this many reuses')
+    return parser
+
+
+if __name__ == '__main__':
+    
+    # Project (People Tracker)
+    ## Features
+    ### a > Live people counter 
+    ### b > Display tracked people trajectories
+    ### c > Focus on a suspicious individual <--- Here
 
-    args = parser.parse_args()
+    args = make_parser().parse_args()
     args.img_size = check_img_size(args.img_size)
-    args.display = True
+    args.display = not args.headless
+    if args.headless:
+        args.save_path = ''  # no video: only the txt / track outputs
     with VideoTracker(args) as vdo_trk:
         vdo_trk.run()
 
@@ -0,0 +1,228 @@
+"""
+Writes INT8 versions of the yolov5 detector and of the ReID Net for CPU-only hosts, and reports
+what they cost in accuracy and gain in latency against FP32.
+
+    yolov5/weights/yolov5s.pt               -> yolov5/weights/yolov5s.int8.pt      (main.py --backend int8)
+    deep_sort/deep/checkpoint/ckpt.t7       -> deep_sort/deep/checkpoint/ckpt.int8.pt  (main.py --reid-int8)
+
+Calibration uses a folder of frames from the target cameras (--calib). The ReID Net is calibrated on
+person crops from --reid-calib, or, when not given, on the crops the FP32 detector finds in the frames.
+
+Accuracy, both optional:
+    --data       yolov5 dataset yaml, detection mAP with yolov5/test.py
+    --reid-data  Market1501 style folder (query/ gallery/), top-1 accuracy with the protocol of
+                 deep_sort/deep/test.py + evaluate.py
+
+Usage:
+    $ python quantize.py --calib data/frames --data yolov5/data/coco128.yaml --reid-data data/market1501
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from argparse import Namespace
+
+import numpy as np
+import cv2
+import torch
+import torch.nn as nn
+
+deepsort_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(deepsort_dir, 'yolov5'))
+
+from yolov5.utils.general import check_img_size, non_max_suppression, scale_coords  # noqa: E402
+from yolov5.utils.datasets import letterbox  # noqa: E402
+from deep_sort.deep.feature_extractor import Extractor  # noqa: E402
+from utils_ds.quantize import quantize_detector, quantize_reid, int8_path, load_int8  # noqa: E402
+
+IMG_EXT = ('.jpg', '.jpeg', '.png', '.bmp')
+LOSS_HYP = dict(giou=0.05, obj=1.0, cls=0.5, cls_pw=1.0, obj_pw=1.0, fl_gamma=0.0, anchor_t=4.0)  # test.py computes a loss
+
+
+def list_images(folder, limit=None):
+    files = sorted(f for f in glob.glob(os.path.join(folder, '**', '*'), recursive=True) if f.lower().endswith(IMG_EXT))
+    assert files, "no images in %s" % folder
+    return files[:limit]
+
+
+def to_input(im0, img_size):
+    img = letterbox(im0, new_shape=img_size, auto=False)[0]  # INT8 graph is traced for a square input
+    img = np.ascontiguousarray(img[:, :, ::-1].transpose(2, 0, 1))
+    return torch.from_numpy(img).float().div(255.0).unsqueeze(0)
+
+
+def person_crops(model, frames, img_size, conf_thres=0.3, limit=2000):
+    crops = []
+    with torch.no_grad():
+        for im0 in frames:
+            img = to_input(im0, img_size)
+            det = non_max_suppression(model(img)[0], conf_thres, 0.5, classes=[0])[0]
+            if det is None:
+                continue
+            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape).round()
+            for x1, y1, x2, y2 in det[:, :4].int().tolist():
+                if x2 - x1 > 4 and y2 - y1 > 4:
+                    crops.append(im0[y1:y2, x1:x2])
+            if len(crops) >= limit:
+                break
+    return crops[:limit]
+
+
+def batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def latency(fn, inputs, repeat=3):
+    """median ms per call"""
+    with torch.no_grad():
+        fn(inputs[0])  # warm-up
+        times = []
+        for _ in range(repeat):
+            for x in inputs:
+                t0 = time.time()
+                fn(x)
+                times.append(time.time() - t0)
+    return 1000 * float(np.median(times))
+
+
+class TestModel(nn.Module):
+    """
+    What yolov5 test.test() expects when it is handed a model: forward(img, augment) -> (pred, raw maps),
+    the Detect() layer in .model and the attributes read by its loss and reports.
+    The network is stored as a plain callable so that test.test()'s model.float() does not touch it.
+    """
+
+    def __init__(self, forward, model):
+        super(TestModel, self).__init__()
+        self.run = forward
+        self.model = model.model
+        self.names, self.stride, self.nc = model.names, model.stride, model.nc
+        self.hyp, self.gr = LOSS_HYP, 1.0
+
+    def forward(self, x, augment=False):
+        return self.run(x.float().cpu())
+
+
+def detection_map(forward, model, data, img_size, batch_size, save_dir):
+    """mAP@0.5, mAP@0.5:0.95 with yolov5/test.py on square letterboxed images"""
+    import yaml
+    from yolov5 import test as yolo_test
+    from yolov5.utils.datasets import create_dataloader
+
+    with open(data) as f:
+        path = yaml.load(f, Loader=yaml.FullLoader)['val']
+    dataloader = create_dataloader(path, img_size, batch_size, int(model.stride.max()), Namespace(single_cls=False),
+                                   hyp=None, augment=False, cache=False, pad=0.0, rect=False)[0]
+    results, _, _ = yolo_test.test(data, batch_size=batch_size, imgsz=img_size, model=TestModel(forward, model),
+                                   dataloader=dataloader, save_dir=save_dir)
+    return results[2], results[3]
+
+
+def reid_top1(forward, data_dir):
+    """top-1 accuracy of the query features against the gallery, as deep_sort/deep/test.py + evaluate.py"""
+    import torchvision
+    transform = torchvision.transforms.Compose([
+        torchvision.transforms.Resize((128, 64)),
+        torchvision.transforms.ToTensor(),
+        torchvision.transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+    ])
+    feats = {}
+    for split in ('query', 'gallery'):
+        loader = torch.utils.data.DataLoader(torchvision.datasets.ImageFolder(os.path.join(data_dir, split), transform=transform),
+                                             batch_size=64, shuffle=False)
+        f, l = [], []
+        with torch.no_grad():
+            for inputs, labels in loader:
+                f.append(forward(inputs).cpu())
+                l.append(labels)
+        feats[split] = torch.cat(f), torch.cat(l)
+    qf, ql = feats['query']
+    gf, gl = feats['gallery']
+    gl = gl - 2  # gallery has the two distractor classes first (see test.py)
+    res = qf.mm(gf.t()).topk(5, dim=1)[1][:, 0]
+    return gl[res].eq(ql).sum().item() / ql.size(0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='yolov5/weights/yolov5s.pt', help='model.pt path')
+    parser.add_argument('--reid-ckpt', type=str, default='deep_sort/deep/checkpoint/ckpt.t7', help='ReID checkpoint')
+    parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels), fixed in the INT8 detector')
+    parser.add_argument('--calib', type=str, required=True, help='folder of frames from the target cameras')
+    parser.add_argument('--calib-frames', type=int, default=200, help='number of calibration frames')
+    parser.add_argument('--reid-calib', type=str, default='', help='folder of person crops (default: detected in --calib)')
+    parser.add_argument('--engine', choices=['fbgemm', 'qnnpack'], default='fbgemm', help='fbgemm: x86, qnnpack: ARM')
+    parser.add_argument('--skip-detector', action='store_true', help='only quantize the ReID Net')
+    parser.add_argument('--skip-reid', action='store_true', help='only quantize the detector')
+    parser.add_argument('--data', type=str, default='', help='yolov5 dataset yaml for the detection mAP')
+    parser.add_argument('--reid-data', type=str, default='', help='Market1501 folder (query/, gallery/) for the ReID accuracy')
+    parser.add_argument('--batch-size', type=int, default=16, help='batch size of the mAP evaluation')
+    parser.add_argument('--report', type=str, default='output/quantization.json', help='json report')
+    args = parser.parse_args()
+    args.img_size = check_img_size(args.img_size)
+    args.weights = os.path.join(deepsort_dir, args.weights)
+    args.reid_ckpt = os.path.join(deepsort_dir, args.reid_ckpt)
+    args.report = os.path.join(deepsort_dir, args.report)
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+
+    frames = [cv2.imread(f) for f in list_images(args.calib, args.calib_frames)]
+    detector = torch.load(args.weights, map_location='cpu')['model'].float().eval()
+    report = {}
+
+    # ***************************** detector **********************************
+    if not args.skip_detector:
+        inputs = [to_input(im0, args.img_size) for im0 in frames]
+        q = quantize_detector(detector, args.img_size, inputs, args.engine)
+        path = int8_path(args.weights)
+        torch.jit.save(q, path)
+        print('Saved %s' % path)
+
+        q = load_int8(path)  # measure what the tracker will load
+        r = {'fp32_ms': latency(lambda x: detector(x), inputs[:20]),
+             'int8_ms': latency(lambda x: q(x), inputs[:20])}
+        if args.data:
+            save_dir = os.path.dirname(args.report)
+            r['fp32_map50'], r['fp32_map'] = detection_map(lambda x: detector(x), detector, args.data, args.img_size,
+                                                           args.batch_size, save_dir)
+            r['int8_map50'], r['int8_map'] = detection_map(lambda x: q(x), detector, args.data, args.img_size,
+                                                           args.batch_size, save_dir)
+        report['detector'] = r
+
+    # ***************************** ReID Net **********************************
+    if not args.skip_reid:
+        extractor = Extractor(args.reid_ckpt, use_cuda=False)
+        net = extractor.net.eval()
+        if args.reid_calib:
+            crops = [cv2.imread(f) for f in list_images(args.reid_calib, 2000)]
+        else:
+            crops = person_crops(detector, frames, args.img_size)
+        inputs = [extractor._preprocess(b) for b in batches(crops, 32)]
+        q = quantize_reid(net, inputs, args.engine)
+        path = int8_path(args.reid_ckpt)
+        torch.jit.save(q, path)
+        print('Saved %s' % path)
+
+        q = load_int8(path)
+        crops16 = [extractor._preprocess(b) for b in batches(crops, 16) if len(b) == 16][:20] or inputs[:1]
+        r = {'fp32_ms': latency(lambda x: net(x), crops16),
+             'int8_ms': latency(lambda x: q(x), crops16),
+             'crops_per_call': len(crops16[0])}
+        if args.reid_data:
+            r['fp32_top1'] = reid_top1(lambda x: net(x), args.reid_data)
+            r['int8_top1'] = reid_top1(lambda x: q(x), args.reid_data)
+        report['reid'] = r
+
+    # ***************************** report **********************************
+    print('\n%-10s%12s%12s%10s%14s%14s' % ('model', 'fp32 ms', 'int8 ms', 'speedup', 'fp32 acc', 'int8 acc'))
+    for name, key in (('detector', 'map50'), ('reid', 'top1')):
+        if name not in report:
+            continue
+        r = report[name]
+        acc = ('%14.4f%14.4f' % (r['fp32_' + key], r['int8_' + key])) if 'fp32_' + key in r else '%14s%14s' % ('-', '-')
+        print('%-10s%12.2f%12.2f%9.2fx%s' % (name, r['fp32_ms'], r['int8_ms'], r['fp32_ms'] / r['int8_ms'], acc))
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Report written to %s' % args.report)
@@ -0,0 +1,274 @@
+"""
+Detector inference backends.
+
+Every backend takes the preprocessed input tensor (bs, 3, h, w) in [0, 1] and returns the raw
+prediction tensor (bs, #anchors, 5 + #classes) that yolov5 `non_max_suppression` expects.
+
+    torch        eager PyTorch model loaded from the .pt checkpoint (with jit: traced, see model_cache)
+    torchscript  *.torchscript.pt written by yolov5/models/export.py
+    onnx         *.onnx written by yolov5/models/export.py, run with onnxruntime
+    opencv       *.onnx written by yolov5/models/export.py, run with cv2.dnn
+    int8         *.int8.pt written by quantize.py, INT8 TorchScript run on the CPU
+
+export.py sets Detect.export, so the exported graphs stop before the Detect() decoding
+(sigmoid, grid offsets, anchors). That step is redone here with the anchors and strides
+of the .pt checkpoint the model was exported from.
+"""
+import abc
+import os
+import warnings
+
+import numpy as np
+import cv2
+import torch
+
+from .model_cache import load_traced
+from .quantize import int8_path, load_int8
+
+
+BACKENDS = ('torch', 'torchscript', 'onnx', 'opencv', 'int8')
+
+
+def _make_grid(nx=20, ny=20):
+    yv, xv = torch.meshgrid([torch.arange(ny), torch.arange(nx)])
+    return torch.stack((xv, yv), 2).view((1, 1, ny, nx, 2)).float()
+
+
+class TorchBackend(object):
+    dynamic_shape = True  # any 32-multiple input shape and batch size
+
+    def __init__(self, model, augment=False):
+        self.model = model
+        self.augment = augment
+
+    def __call__(self, img):
+        with torch.no_grad():
+            return self.model(img, augment=self.augment)[0]
+
+
+class TracedBackend(object):
+    dynamic_shape = False  # traced for a fixed img_size x img_size input
+
+    def __init__(self, model, input_shape):
+        self.model = model
+        self.input_shape = tuple(input_shape)
+
+    def __call__(self, img):
+        assert tuple(img.shape[2:]) == self.input_shape[2:], \
+            "Input %s does not match the traced shape %s, check --img-size" % (tuple(img.shape[2:]), self.input_shape[2:])
+        with torch.no_grad():
+            return self.model(img)[0]
+
+
+class ExportedBackend(abc.ABC):
+    """
+    Base class of the exported-model backends: runs the graph on chunks of the exported batch size
+    and decodes the raw Detect() feature maps. Subclasses implement `run`.
+
+    Args:
+        detect (Detect): the Detect() layer of the source checkpoint (anchors and strides)
+        input_shape (tuple): (batch, 3, h, w) the model was exported with
+        device (torch.device): device of the returned tensor
+    """
+    dynamic_shape = False  # fixed (h, w), inputs must be letterboxed with auto=False
+
+    def __init__(self, detect, input_shape, device):
+        self.anchor_grid = detect.anchor_grid.detach().float().cpu()  # (nl, 1, na, 1, 1, 2)
+        self.stride = detect.stride.detach().float().cpu()
+        self.na, self.no = detect.na, detect.no
+        self.input_shape = tuple(input_shape)
+        self.device = device
+        self.grid = {}
+
+    @abc.abstractmethod
+    def run(self, img):
+        """:return: list of raw feature maps (bs, na, ny, nx, no) as numpy arrays or tensors"""
+
+    def decode(self, outputs):
+        # same maths as Detect.forward in inference mode
+        z = []
+        for i, x in enumerate(outputs):
+            x = torch.as_tensor(np.asarray(x) if not isinstance(x, torch.Tensor) else x).float().cpu()
+            if x.dim() == 4:  # (bs, na*no, ny, nx) -> (bs, na, ny, nx, no)
+                bs, _, ny, nx = x.shape
+                x = x.view(bs, self.na, self.no, ny, nx).permute(0, 1, 3, 4, 2).contiguous()
+            bs, _, ny, nx, _ = x.shape
+            if (nx, ny) not in self.grid:
+                self.grid[(nx, ny)] = _make_grid(nx, ny)
+            y = x.sigmoid()
+            y[..., 0:2] = (y[..., 0:2] * 2. - 0.5 + self.grid[(nx, ny)]) * self.stride[i]  # xy
+            y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * self.anchor_grid[i]  # wh
+            z.append(y.view(bs, -1, self.no))
+        return torch.cat(z, 1)
+
+    def __call__(self, img):
+        assert tuple(img.shape[2:]) == self.input_shape[2:], \
+            "Input %s does not match the exported shape %s, check --img-size" % (tuple(img.shape[2:]), self.input_shape[2:])
+        bs = self.input_shape[0]
+        img = img.float()
+        preds = []
+        for i in range(0, img.shape[0], bs):
+            chunk = img[i:i + bs]
+            n = chunk.shape[0]
+            if n < bs:  # pad the last chunk up to the exported batch size
+                chunk = torch.cat([chunk, chunk.new_zeros((bs - n,) + tuple(chunk.shape[1:]))], 0)
+            preds.append(self.decode(self.run(chunk))[:n])
+        return torch.cat(preds, 0).to(self.device)
+
+
+class TorchScriptBackend(ExportedBackend):
+    def __init__(self, path, detect, input_shape, device):
+        super(TorchScriptBackend, self).__init__(detect, input_shape, device)
+        self.model = torch.jit.load(path, map_location=device).eval()
+        self.model_device = device
+
+    def run(self, img):
+        with torch.no_grad():
+            return list(self.model(img.to(self.model_device)))
+
+
+class OnnxBackend(ExportedBackend):
+    def __init__(self, path, detect, input_shape, device):
+        super(OnnxBackend, self).__init__(detect, input_shape, device)
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("--backend onnx needs onnxruntime: pip install onnxruntime")
+        self.session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, img):
+        return self.session.run(None, {self.input_name: img.cpu().numpy()})
+
+
+class OpenCVBackend(ExportedBackend):
+    def __init__(self, path, detect, input_shape, device):
+        super(OpenCVBackend, self).__init__(detect, input_shape, device)
+        self.net = cv2.dnn.readNetFromONNX(path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.output_names = self.net.getUnconnectedOutLayersNames()
+
+    def run(self, img):
+        self.net.setInput(img.cpu().numpy())
+        return self.net.forward(self.output_names)
+
+
+class Int8Backend(object):
+    """The quantized graph keeps Detect() in FP32, so its first output is already decoded"""
+    dynamic_shape = False  # traced for a fixed img_size x img_size input
+
+    def __init__(self, path, input_shape, device):
+        self.model = load_int8(path)
+        self.input_shape = tuple(input_shape)
+        self.device = device
+
+    def __call__(self, img):
+        assert tuple(img.shape[2:]) == self.input_shape[2:], \
+            "Input %s does not match the quantized shape %s, check --img-size" % (tuple(img.shape[2:]), self.input_shape[2:])
+        with torch.no_grad():
+            return self.model(img.float().cpu())[0].to(self.device)
+
+
+def exported_path(weights, backend):
+    """Default location of the exported model, as written by yolov5/models/export.py (or quantize.py for int8)"""
+    if backend == 'int8':
+        return int8_path(weights)
+    return weights.replace('.pt', '.torchscript.pt' if backend == 'torchscript' else '.onnx')
+
+
+def load_backend(backend, model, weights, device, img_size, augment=False, batch_size=1, model_path=None,
+                 jit=False, half=False, cache_dir='cache'):
+    """
+    Args:
+        backend (str): one of BACKENDS
+        model (Model): the yolov5 model loaded from the .pt checkpoint (anchors, strides, torch backend)
+        weights (str): path of the .pt checkpoint
+        device (torch.device): device of the detector
+        img_size (int): inference size, must match the size the model was exported with
+        augment (bool): augmented inference (torch backend only)
+        batch_size (int): batch size the model was exported with
+        model_path (str): exported model, defaults to what export.py writes next to the weights
+        jit (bool): torch backend only, trace the model (cached in cache_dir across restarts)
+        half (bool): the torch model is in fp16
+        cache_dir (str): folder of the traced models
+
+    Returns:
+        callable: img (bs, 3, h, w) -> raw predictions (bs, #anchors, 5 + #classes)
+    """
+    if backend == 'torch':
+        if not jit:
+            return TorchBackend(model, augment)
+        if augment:
+            warnings.warn("--augment is not supported with --jit, ignored", UserWarning)
+        return TracedBackend(load_traced(model, weights, img_size, device, half, cache_dir), (1, 3, img_size, img_size))
+    assert backend in BACKENDS, "Unknown backend %s, choose from %s" % (backend, BACKENDS)
+    if augment:
+        warnings.warn("--augment is only supported by the torch backend, ignored", UserWarning)
+
+    path = model_path or exported_path(weights, backend)
+    if backend == 'int8':
+        assert os.path.isfile(path), "%s not found, build it first: python quantize.py --weights %s --img-size %d" % (
+            path, weights, img_size)
+        print('Detector backend: %s (%s)' % (backend, path))
+        return Int8Backend(path, (batch_size, 3, img_size, img_size), device)
+    assert os.path.isfile(path), "%s not found, export it first: python models/export.py --weights %s --img %d" % (
+        path, weights, img_size)
+    detect = model.module.model[-1] if hasattr(model, 'module') else model.model[-1]
+    input_shape = (batch_size, 3, img_size, img_size)
+    cls = {'torchscript': TorchScriptBackend, 'onnx': OnnxBackend, 'opencv': OpenCVBackend}[backend]
+    print('Detector backend: %s (%s)' % (backend, path))
+    return cls(path, detect, input_shape, device)
+
+
+class ParityCheck(object):
+    """
+    Runs a reference backend next to the selected one on the first `frames` batches and compares
+    the raw predictions of the candidates above `conf_thres`. Afterwards the reference is released.
+
+    Args:
+        backend (callable): backend under test
+        reference (callable): usually the TorchBackend
+        frames (int): number of batches to compare
+        conf_thres (float): only predictions the reference scores above this are compared
+        box_tol (float): tolerated box difference in pixels
+        conf_tol (float): tolerated objectness difference
+    """
+
+    def __init__(self, backend, reference, frames=10, conf_thres=0.3, box_tol=1.0, conf_tol=0.01):
+        self.backend = backend
+        self.reference = reference
+        self.frames = frames
+        self.conf_thres = conf_thres
+        self.box_tol = box_tol
+        self.conf_tol = conf_tol
+        self.max_box_diff, self.max_conf_diff = 0., 0.
+        self.checked = 0
+
+    @property
+    def dynamic_shape(self):
+        return self.backend.dynamic_shape
+
+    def __call__(self, img):
+        pred = self.backend(img)
+        if self.reference is None:
+            return pred
+
+        ref = self.reference(img).float()
+        mask = ref[..., 4] > self.conf_thres
+        if mask.any():
+            out = pred.float().to(ref.device)
+            self.max_box_diff = max(self.max_box_diff, (out[mask][:, :4] - ref[mask][:, :4]).abs().max().item())
+            self.max_conf_diff = max(self.max_conf_diff, (out[mask][:, 4] - ref[mask][:, 4]).abs().max().item())
+        self.checked += 1
+
+        if self.checked >= self.frames:
+            ok = self.max_box_diff <= self.box_tol and self.max_conf_diff <= self.conf_tol
+            msg = 'Parity check over %d batches: max box diff %.3fpx, max conf diff %.4f' % (
+                self.checked, self.max_box_diff, self.max_conf_diff)
+            if ok:
+                print(msg + ' -> OK')
+            else:
+                warnings.warn(msg + ' -> exceeds tolerance (%.2fpx, %.3f)' % (self.box_tol, self.conf_tol), UserWarning)
+            self.reference = None  # release the reference model
+        return pred
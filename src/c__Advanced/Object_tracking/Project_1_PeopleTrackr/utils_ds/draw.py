@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 import numpy as np
 import cv2
 
@@ -6,10 +8,10 @@ palette = (2 ** 11 - 1, 2 ** 15 - 1, 2 ** 20 - 1)
 
 import csv
 import datetime
-import atexit
 import os
 
 def write_to_csv(file_path, bbox, class_name):
+    # One-off row. For a trail over many frames use utils_ds.focus.FocusRecorder (one open file, buffered)
     # Create header if file is new
     is_new_file = not os.path.isfile(file_path)
     with open(file_path, mode='a', newline='') as csv_file:
@@ -20,11 +22,6 @@ def write_to_csv(file_path, bbox, class_name):
         # Write data to file
         current_time = datetime.datetime.now()
         writer.writerow([current_time.strftime("%Y-%m-%d %H:%M:%S"), bbox, class_name])
-    
-    # Close file when program terminates
-    @atexit.register
-    def close_csv_file():
-        csv_file.close()
 
 
 def compute_color_for_labels(label):
@@ -35,15 +32,11 @@ def compute_color_for_labels(label):
     return tuple(color)
 
 def overlay_on_image(image,clr_trails):
-    h, w = clr_trails.shape[:2]
-    overlay = np.zeros((h, w, 3), dtype=np.uint8)
-    
-    gray = cv2.cvtColor(clr_trails,cv2.COLOR_BGR2GRAY)
-    mask = cv2.threshold(gray,0,255,cv2.THRESH_BINARY)[1]
-    inverted_mask = cv2.bitwise_not(mask)
-    image = cv2.bitwise_and(image, image, mask=inverted_mask)
-    overlay = cv2.bitwise_and(clr_trails, clr_trails, mask=mask)
-    image = cv2.bitwise_or(overlay, image)
+    # trail pixels (non black in gray) replace the image pixels, in place
+    if clr_trails.shape[:2] != image.shape[:2]:  # preview resolution
+        clr_trails = cv2.resize(clr_trails, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_NEAREST)
+    on = cv2.cvtColor(clr_trails,cv2.COLOR_BGR2GRAY) > 0
+    image[on] = clr_trails[on]
     return image
 
 def inc_int(color,factor = 1.4):
@@ -54,45 +47,142 @@ def inc_int(color,factor = 1.4):
     return (new_b,new_g,new_r)
 
 
+class Renderer(object):
+    """
+    Draws the tracked boxes, labels and trajectories of one frame.
+
+    - trajectories are drawn once per frame, after all the boxes: the polylines of a
+      utils_ds.trajectories.TrajectoryStore, or the legacy full frame mask layer
+    - labels are pre-rendered once per (text, scale, color) into sprites (patch + mask, LRU cache),
+      then copied into the frame, pixel-identical to cv2.rectangle + cv2.putText
+    - with preview_scale < 1 the frame is downscaled first and everything is drawn at that resolution
+
+    Args:
+        preview_scale (float): output resolution relative to the input frame
+        max_sprites (int): size of the label cache (and of the text size cache)
+    """
+    PAD = 2  # room for the text stroke around the label background
+
+    def __init__(self, preview_scale=1., max_sprites=4096):
+        self.preview_scale = preview_scale
+        self.max_sprites = max_sprites
+        self.sprites = OrderedDict()
+        self.text_sizes = OrderedDict()
+
+    def output_size(self, width, height):
+        """(width, height) of the rendered frames"""
+        return int(round(width * self.preview_scale)), int(round(height * self.preview_scale))
+
+    def text_size(self, label, scale, thickness=2):
+        # labels hold the track ID: LRU like the sprites, or it grows with every ID of a long stream
+        key = (label, scale, thickness)
+        size = self.text_sizes.get(key)
+        if size is not None:
+            self.text_sizes.move_to_end(key)
+            return size
+        size = self.text_sizes[key] = cv2.getTextSize(label, cv2.FONT_HERSHEY_PLAIN, scale, thickness)[0]
+        if len(self.text_sizes) > self.max_sprites:
+            self.text_sizes.popitem(last=False)
+        return size
+
+    def sprite(self, label, scale, color):
+        key = (label, scale, color)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        tw, th = self.text_size(label, scale)
+        _, baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_PLAIN, scale, 2)
+        p = self.PAD
+        h, w = th + 4 + baseline + 2 * p + 1, tw + 4 + 2 * p + int(scale * 4)
+        patch = np.zeros((h, w, 3), np.uint8)
+        mask = np.zeros((h, w), np.uint8)
+        for canvas, fill, ink in ((patch, color, [255, 255, 255]), (mask, 255, 255)):
+            cv2.rectangle(canvas, (p, p), (p + tw + 3, p + th + 4), fill, -1)
+            cv2.putText(canvas, label, (p, p + th + 4), cv2.FONT_HERSHEY_PLAIN, scale, ink, 2)
+        sprite = (patch, mask > 0)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def blit(self, img, sprite, x, y):
+        patch, mask = sprite
+        x, y = x - self.PAD, y - self.PAD
+        h, w = patch.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, img.shape[1]), min(y + h, img.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        roi = img[y0:y1, x0:x1]
+        m = mask[y0 - y:y1 - y, x0 - x:x1 - x]
+        roi[m] = patch[y0 - y:y1 - y, x0 - x:x1 - x][m]
+
+    def draw(self, img, bbox, identities=None, offset=(0,0), mask=None, trajectories=None, id_to_track=None,
+             t_classes=None, categories=None):
+        """same arguments as draw_boxes, returns the frame at preview resolution"""
+        # id_to_track: one track ID or a set of IDs to highlight (their CSV trail is recorded by FocusRecorder)
+        if isinstance(id_to_track, (set, frozenset, list, tuple)):
+            focused = set(int(t) for t in id_to_track)
+        else:
+            focused = {int(id_to_track)} if id_to_track else set()
+
+        # trajectories: a TrajectoryStore (polylines drawn on this frame only), or the legacy dict + mask layer
+        trails = {} if hasattr(trajectories, 'polyline') else None
+
+        s = self.preview_scale
+        if s != 1:
+            img = cv2.resize(img, self.output_size(img.shape[1], img.shape[0]), interpolation=cv2.INTER_AREA)
+
+        for i,box in enumerate(bbox):
+            x1,y1,x2,y2 = [int(v) for v in box]
+            x1 += offset[0]
+            x2 += offset[0]
+            y1 += offset[1]
+            y2 += offset[1]
+            # box text and bar
+            id = int(identities[i]) if identities is not None else 0
+            color = compute_color_for_labels(id)
+
+            bbox_thickness = 3
+            draw_trajectory = True
+            if id in focused:
+                color = (0,255,0)
+            elif focused:
+                color = (0,0,40)
+                bbox_thickness = 1
+                draw_trajectory = False
+
+            label = '{}{:d}'.format("", id)
+            label_fscale = 2
+            if categories:
+                # If categories are avaible display them along the tracked object
+                label = categories[int(t_classes[i])]
+                label_fscale = 1.5
+
+            if draw_trajectory and trails is not None:
+                trails[id] = inc_int(color)
+            elif draw_trajectory and trajectories and len(trajectories[id])==2:
+                cv2.line(mask,trajectories[id][0],trajectories[id][1],inc_int(color),3)  # full resolution layer
+
+            if s != 1:
+                x1, y1, x2, y2 = int(x1 * s), int(y1 * s), int(x2 * s), int(y2 * s)
+                label_fscale = round(label_fscale * s, 2)
+            cv2.rectangle(img,(x1, y1),(x2,y2),color,bbox_thickness)
+            self.blit(img, self.sprite(label, label_fscale, color), x1, y1)
+
+        if trails:
+            trajectories.draw(img, trails, scale=s)
+        elif trails is None and trajectories and len(bbox):
+            img = overlay_on_image(img,mask)  # once per frame
+        return img
+
+
+_renderer = Renderer()
+
+
 def draw_boxes(img, bbox, identities=None, offset=(0,0),mask = None, trajectories = None,id_to_track = None,t_classes = None,categories = None):
-    for i,box in enumerate(bbox):
-        x1,y1,x2,y2 = [int(i) for i in box]
-        x1 += offset[0]
-        x2 += offset[0]
-        y1 += offset[1]
-        y2 += offset[1]
-        # box text and bar
-        id = int(identities[i]) if identities is not None else 0    
-        color = compute_color_for_labels(id)
-        
-        bbox_thickness = 3
-        draw_trajectory = True
-        if id_to_track and id == id_to_track:
-            color = (0,255,0)
-            write_to_csv("john_doe.csv",box,t_classes[i])
-        elif id_to_track:
-            color = (0,0,40)
-            bbox_thickness = 1
-            draw_trajectory = False
-        
-        label = '{}{:d}'.format("", id)
-        label_fscale = 2
-        if categories:
-            # If categories are avaible display them along the tracked object
-            label = categories[t_classes[i]]
-            label_fscale = 1.5
-        t_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_PLAIN, label_fscale , 2)[0]
-        cv2.rectangle(img,(x1, y1),(x2,y2),color,bbox_thickness)
-        cv2.rectangle(img,(x1, y1),(x1+t_size[0]+3,y1+t_size[1]+4), color,-1)
-        cv2.putText(img,label,(x1,y1+t_size[1]+4), cv2.FONT_HERSHEY_PLAIN, label_fscale, [255,255,255], 2)
-        
-        if draw_trajectory and trajectories and len(trajectories[id])==2:
-            cv2.line(mask,trajectories[id][0],trajectories[id][1],inc_int(color),3)
-            
-        if trajectories:
-            img = overlay_on_image(img,mask)
-        
-    return img
+    return _renderer.draw(img, bbox, identities, offset, mask, trajectories, id_to_track, t_classes, categories)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+import csv
+import datetime
+import os
+import time
+
+
+class FocusRecorder(object):
+    """
+    CSV trail of the focused individuals: one file per track ID, `<folder>/track_<id>.csv`.
+
+    Each file is opened once, when its ID is first seen, and kept open. Rows are buffered and written
+    once `flush_rows` rows are pending or `flush_seconds` have passed since the last flush.
+    `close` writes what is left and closes every file.
+
+    Args:
+        folder (str): output folder
+        names (list): class names, the Class column holds the name instead of the index when given
+        flush_rows (int): pending rows that trigger a flush
+        flush_seconds (float): age of the last flush that triggers a flush
+    """
+    HEADER = ['Timestamp', 'BBox', 'Class', 'Frame']
+
+    def __init__(self, folder, names=None, flush_rows=256, flush_seconds=5.):
+        self.folder = folder
+        self.names = names
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.ids = set()
+        self.files = {}    # track id -> (file, csv writer)
+        self.pending = {}  # track id -> rows
+        self.n_pending = 0
+        self.last_flush = time.time()
+
+    def focus(self, track_id):
+        self.ids.add(int(track_id))
+
+    def unfocus(self, track_id):
+        self.ids.discard(int(track_id))
+
+    def toggle(self, track_id):
+        track_id = int(track_id)
+        if track_id in self.ids:
+            self.unfocus(track_id)
+        else:
+            self.focus(track_id)
+
+    def record(self, idx_frame, outputs):
+        """
+        :param idx_frame: frame index
+        :param outputs: (#ID, 6) x1 y1 x2 y2 track_id class
+        """
+        if not self.ids:
+            return
+        stamp = None
+        for output in outputs:
+            track_id = int(output[-2])
+            if track_id not in self.ids:
+                continue
+            if stamp is None:
+                stamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cls = int(output[-1])
+            self.pending.setdefault(track_id, []).append(
+                [stamp, [int(v) for v in output[:4]], self.names[cls] if self.names else cls, idx_frame])
+            self.n_pending += 1
+        if self.n_pending >= self.flush_rows or time.time() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def _writer(self, track_id):
+        if track_id not in self.files:
+            os.makedirs(self.folder, exist_ok=True)
+            path = os.path.join(self.folder, 'track_%d.csv' % track_id)
+            is_new_file = not os.path.isfile(path)
+            f = open(path, mode='a', newline='')
+            writer = csv.writer(f)
+            if is_new_file:
+                writer.writerow(self.HEADER)
+            self.files[track_id] = (f, writer)
+        return self.files[track_id][1]
+
+    def flush(self):
+        for track_id, rows in self.pending.items():
+            self._writer(track_id).writerows(rows)
+            self.files[track_id][0].flush()
+        self.pending = {}
+        self.n_pending = 0
+        self.last_flush = time.time()
+
+    def close(self):
+        self.flush()
+        for f, _ in self.files.values():
+            f.close()
+        self.files = {}
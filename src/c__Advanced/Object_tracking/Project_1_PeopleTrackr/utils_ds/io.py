@@ -5,25 +5,32 @@ import numpy as np
 # from utils.log import get_logger
 
 
-def write_results(filename, results, data_type):
+def get_save_format(data_type):
     if data_type == 'mot':
-        save_format = '{frame},{id},{x1},{y1},{w},{h},-1,-1,-1,-1\n'
+        return '{frame},{id},{x1},{y1},{w},{h},-1,-1,-1,-1\n'
     elif data_type == 'kitti':
-        save_format = '{frame} {id} pedestrian 0 0 -10 {x1} {y1} {x2} {y2} -10 -10 -10 -1000 -1000 -1000 -10\n'
-    else:
-        raise ValueError(data_type)
+        return '{frame} {id} pedestrian 0 0 -10 {x1} {y1} {x2} {y2} -10 -10 -10 -1000 -1000 -1000 -10\n'
+    raise ValueError(data_type)
+
+
+def format_results(results, data_type):
+    """Yields the lines of write_results, for writers that append in blocks"""
+    save_format = get_save_format(data_type)
+    for frame_id, tlwhs, track_ids in results:
+        if data_type == 'kitti':
+            frame_id -= 1
+        for tlwh, track_id in zip(tlwhs, track_ids):
+            if track_id < 0:
+                continue
+            x1, y1, w, h = tlwh
+            x2, y2 = x1 + w, y1 + h
+            yield save_format.format(frame=frame_id, id=track_id, x1=x1, y1=y1, x2=x2, y2=y2, w=w, h=h)
 
+
+def write_results(filename, results, data_type):
+    get_save_format(data_type)  # unknown data_type fails before the file is created
     with open(filename, 'w') as f:
-        for frame_id, tlwhs, track_ids in results:
-            if data_type == 'kitti':
-                frame_id -= 1
-            for tlwh, track_id in zip(tlwhs, track_ids):
-                if track_id < 0:
-                    continue
-                x1, y1, w, h = tlwh
-                x2, y2 = x1 + w, y1 + h
-                line = save_format.format(frame=frame_id, id=track_id, x1=x1, y1=y1, x2=x2, y2=y2, w=w, h=h)
-                f.write(line)
+        f.writelines(format_results(results, data_type))
 
 
 # def write_results(filename, results_dict: Dict, data_type: str):
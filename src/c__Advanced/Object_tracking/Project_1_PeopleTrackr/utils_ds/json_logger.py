@@ -3,6 +3,7 @@ References:
     https://medium.com/analytics-vidhya/creating-a-custom-logging-mechanism-for-real-time-object-detection-using-tdd-4ca2cfcd0a2f
 """
 import json
+from collections import OrderedDict
 from os import makedirs
 from os.path import exists, join
 from datetime import datetime
@@ -20,6 +21,7 @@ class BaseJsonLogger(object):
     """
     This is the base class that returns __dict__ of its own
     it also returns the dicts of objects in the attributes that are list instances
+    attributes starting with an underscore (indexes, file handles) are not part of the output
 
     """
 
@@ -27,6 +29,8 @@ class BaseJsonLogger(object):
         # returns dicts of objects
         out = {}
         for k, v in self.__dict__.items():
+            if k.startswith('_'):
+                continue
             if hasattr(v, 'dic'):
                 out[k] = v.dic()
             elif isinstance(v, list):
@@ -111,19 +115,25 @@ class Frame(BaseJsonLogger):
         self.frame_id = frame_id
         self.timestamp = timestamp
         self.bboxes = []
+        self._bboxes = {}  # bbox_id -> Bbox, same objects as bboxes
+
+    def has_bbox(self, bbox_id: int) -> bool:
+        return bbox_id in self._bboxes
+
+    def get_bbox(self, bbox_id: int):
+        return self._bboxes.get(bbox_id)
 
     def add_bbox(self, bbox_id: int, top: int, left: int, width: int, height: int):
-        bboxes_ids = [bbox.bbox_id for bbox in self.bboxes]
-        if bbox_id not in bboxes_ids:
-            self.bboxes.append(Bbox(bbox_id, top, left, width, height))
+        if bbox_id not in self._bboxes:
+            bbox = Bbox(bbox_id, top, left, width, height)
+            self.bboxes.append(bbox)
+            self._bboxes[bbox_id] = bbox
         else:
             raise ValueError("Frame with id: {} already has a Bbox with id: {}".format(self.frame_id, bbox_id))
 
     def add_label_to_bbox(self, bbox_id: int, category: str, confidence: float):
-        bboxes = {bbox.id: bbox for bbox in self.bboxes}
-        if bbox_id in bboxes.keys():
-            res = bboxes.get(bbox_id)
-            res.add_label(category, confidence)
+        if bbox_id in self._bboxes:
+            self._bboxes[bbox_id].add_label(category, confidence)
         else:
             raise ValueError('the bbox with id: {} does not exists!'.format(bbox_id))
 
@@ -161,24 +171,49 @@ class BboxToJsonLogger(BaseJsonLogger):
               ]
             }],
 
+    Streaming mode (stream_dir given) is meant for 24/7 sources: only the last `window` frames stay in
+    memory. Older frames are finished and written as one json line each (NDJSON) to
+    `stream_dir/<start time>.ndjson`. The first line of every file holds the video_details. A new file
+    is started after `rotate_seconds` or once it reaches `rotate_bytes`, whichever comes first
+    (0 disables either).
+
     Attributes:
         frames (dict): It's a dictionary that maps each frame_id to json attributes.
+                       In streaming mode, only the frames still open.
         video_details (dict): information about video file.
         top_k_labels (int): shows the allowed number of labels
         start_time (datetime object): we use it to automate the json output by time.
 
     Args:
         top_k_labels (int): shows the allowed number of labels
+        stream_dir (str): streaming mode output directory, None keeps every frame in memory
+        window (int): streaming mode, number of open frames kept in memory
+        rotate_seconds (int): streaming mode, start a new file after this many seconds
+        rotate_bytes (int): streaming mode, start a new file once the current one is this large
 
     """
 
-    def __init__(self, top_k_labels: int = 1):
-        self.frames = {}
+    def __init__(self, top_k_labels: int = 1, stream_dir: str = None, window: int = 30,
+                 rotate_seconds: int = 3600, rotate_bytes: int = 256 * 2 ** 20):
+        self.frames = OrderedDict()
         self.video_details = self.video_details = dict(frame_width=None, frame_height=None, frame_rate=None,
                                                        video_name=None)
         self.top_k_labels = top_k_labels
         self.start_time = datetime.now()
 
+        self._stream_dir = stream_dir
+        self._window = window
+        self._rotate_seconds = rotate_seconds
+        self._rotate_bytes = rotate_bytes
+        self._file = None
+        self._file_start = None
+        self._file_bytes = 0
+        self._frames_output = 0  # frame_counter value of the last schedule_output_by_frames output
+
+    @property
+    def streaming(self) -> bool:
+        return self._stream_dir is not None
+
     def set_top_k(self, value):
         self.top_k_labels = value
 
@@ -207,9 +242,58 @@ class BboxToJsonLogger(BaseJsonLogger):
         """
         if not self.frame_exists(frame_id):
             self.frames[frame_id] = Frame(frame_id, timestamp)
+            if self.streaming:
+                while len(self.frames) > self._window:
+                    self.close_frame(next(iter(self.frames)))
         else:
             raise ValueError("Frame id: {} already exists".format(frame_id))
 
+    def close_frame(self, frame_id: int) -> None:
+        """
+        Streaming mode: writes the frame as one NDJSON line and drops it from memory.
+        Later bboxes or labels for this frame_id raise ValueError like an unknown frame.
+
+        Args:
+            frame_id (int):
+
+        Raises:
+            ValueError: if frame_id is not open
+        """
+        if not self.frame_exists(frame_id):
+            raise ValueError("frame with frame_id: {} does not exist".format(frame_id))
+        frame = self.frames.pop(frame_id)
+        self._write_line(frame.dic())
+
+    def close_all(self) -> None:
+        """Streaming mode: writes every open frame"""
+        while self.frames:
+            self.close_frame(next(iter(self.frames)))
+
+    def _open_stream(self):
+        if not exists(self._stream_dir):
+            makedirs(self._stream_dir)
+        self._file_start = datetime.now()
+        name = self._file_start.strftime('%Y-%m-%d %H-%M-%S-%f') + '.ndjson'
+        self._file = open(join(self._stream_dir, name), 'w')
+        self._file_bytes = 0
+        self._write_line({'video_details': self.video_details})
+
+    def _close_stream(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_line(self, obj):
+        if self._file is None:
+            self._open_stream()
+        elif (self._rotate_bytes and self._file_bytes >= self._rotate_bytes) or \
+                (self._rotate_seconds and (datetime.now() - self._file_start).total_seconds() >= self._rotate_seconds):
+            self._close_stream()
+            self._open_stream()
+        line = json.dumps(obj) + '\n'
+        self._file.write(line)
+        self._file_bytes += len(line)
+
     def bbox_exists(self, frame_id: int, bbox_id: int) -> bool:
         """
         Args:
@@ -219,10 +303,7 @@ class BboxToJsonLogger(BaseJsonLogger):
         Returns:
             bool: if bbox exists in frame bboxes list
         """
-        bboxes = []
-        if self.frame_exists(frame_id=frame_id):
-            bboxes = [bbox.bbox_id for bbox in self.frames[frame_id].bboxes]
-        return bbox_id in bboxes
+        return self.frame_exists(frame_id=frame_id) and self.frames[frame_id].has_bbox(bbox_id)
 
     def find_bbox(self, frame_id: int, bbox_id: int):
         """
@@ -239,8 +320,7 @@ class BboxToJsonLogger(BaseJsonLogger):
         """
         if not self.bbox_exists(frame_id, bbox_id):
             raise ValueError("frame with id: {} does not contain bbox with id: {}".format(frame_id, bbox_id))
-        bboxes = {bbox.bbox_id: bbox for bbox in self.frames[frame_id].bboxes}
-        return bboxes.get(bbox_id)
+        return self.frames[frame_id].get_bbox(bbox_id)
 
     def add_bbox_to_frame(self, frame_id: int, bbox_id: int, top: int, left: int, width: int, height: int) -> None:
         """
@@ -347,23 +427,39 @@ class BboxToJsonLogger(BaseJsonLogger):
         diff = (end - self.start_time).seconds
 
         if diff > interval:
+            if self.streaming:  # same period boundaries, as one file per period
+                self.close_all()
+                self._close_stream()
+                self.start_time = datetime.now()
+                return
             output_name = self.start_time.strftime('%Y-%m-%d %H-%M-%S') + '.json'
             if not exists(output_dir):
                 makedirs(output_dir)
             output = join(output_dir, output_name)
             self.json_output(output_name=output)
-            self.frames = {}
+            self.frames = OrderedDict()
             self.start_time = datetime.now()
 
     def schedule_output_by_frames(self, frames_quota, frame_counter, output_dir=JsonMeta.PATH_TO_SAVE):
         """
         saves as the number of frames quota increases higher.
-        :param frames_quota:
-        :param frame_counter:
+        :param frames_quota: number of frames per output
+        :param frame_counter: number of frames seen so far
         :param output_dir:
         :return:
         """
-        pass
+        if frame_counter - self._frames_output < frames_quota:
+            return
+        self._frames_output = frame_counter
+        if self.streaming:  # one file per quota
+            self.close_all()
+            self._close_stream()
+            return
+        output_name = self.start_time.strftime('%Y-%m-%d %H-%M-%S') + '-%d.json' % frame_counter
+        if not exists(output_dir):
+            makedirs(output_dir)
+        self.json_output(output_name=join(output_dir, output_name))
+        self.frames = OrderedDict()
 
     def flush(self, output_dir):
         """
@@ -372,12 +468,16 @@ class BboxToJsonLogger(BaseJsonLogger):
             like the time that we exit the while loop of opencv.
 
         Args:
-            output_dir:
+            output_dir: not used in streaming mode, which writes the open frames to its current file
 
         Returns:
             None
 
         """
+        if self.streaming:
+            self.close_all()
+            self._close_stream()
+            return
         filename = self.start_time.strftime('%Y-%m-%d %H-%M-%S') + '-remaining.json'
         output = join(output_dir, filename)
         self.json_output(output_name=output)
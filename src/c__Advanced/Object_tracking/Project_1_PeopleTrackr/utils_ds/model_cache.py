@@ -0,0 +1,64 @@
+"""
+On-disk cache of traced (TorchScript) detectors.
+
+Tracing the fused yolov5 model takes seconds, and every tracker restart would otherwise redo it.
+The artifact only depends on the weights, the input size and where/how it runs, so it is keyed by
+    <weights stem>-<sha1 of the weights>-<img size>-<device type>-<fp16|fp32>.torchscript.pt
+and rebuilt automatically when any of them changes.
+"""
+import hashlib
+import os
+import time
+import warnings
+
+import torch
+
+
+def file_hash(path, chunk=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            sha1.update(block)
+    return sha1.hexdigest()[:12]
+
+
+def cache_path(cache_dir, weights, img_size, device, half):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    key = '%s-%s-%d-%s-%s' % (stem, file_hash(weights), img_size, torch.device(device).type, 'fp16' if half else 'fp32')
+    return os.path.join(cache_dir, key + '.torchscript.pt')
+
+
+def load_traced(model, weights, img_size, device, half, cache_dir):
+    """
+    Args:
+        model (Model): fused yolov5 model in eval mode, already on `device` (and in fp16 if `half`)
+        weights (str): path of the .pt checkpoint the model was loaded from
+        img_size (int): the model is traced for a fixed img_size x img_size input
+        device (torch.device): device of the model
+        half (bool): fp16 model
+        cache_dir (str): cache folder
+
+    Returns:
+        ScriptModule: img -> (pred, raw maps), as the eager model in eval mode
+    """
+    path = cache_path(cache_dir, weights, img_size, device, half)
+    t0 = time.time()
+    if os.path.isfile(path):
+        try:
+            traced = torch.jit.load(path, map_location=device)
+            print('Loaded cached TorchScript detector %s (%.2fs)' % (path, time.time() - t0))
+            return traced
+        except RuntimeError as e:  # truncated file, torch version change ...
+            warnings.warn('Cannot load %s (%s), tracing again' % (path, e), UserWarning)
+
+    img = torch.zeros((1, 3, img_size, img_size), device=device)
+    img = img.half() if half else img.float()
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, img, strict=False).eval())
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    torch.jit.save(traced, tmp)
+    os.replace(tmp, path)  # atomic, trackers restarting together never read a partial file
+    print('Traced and cached TorchScript detector %s (%.2fs)' % (path, time.time() - t0))
+    return traced
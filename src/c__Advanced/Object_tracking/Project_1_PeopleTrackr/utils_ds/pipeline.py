@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+
+
+_END = object()  # sentinel marking the end of the stream
+
+
+class StageStats(object):
+    """
+    Running statistics for one pipeline stage.
+
+    Attributes:
+        name (str): stage name
+        count (int): number of items processed
+        busy (float): seconds spent inside the stage function
+        depth_sum (int): sum of input-queue depth samples (one sample per item)
+        depth_max (int): largest input-queue depth observed
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy = 0.
+        self.depth_sum = 0
+        self.depth_max = 0
+
+    def add(self, busy, depth):
+        self.count += 1
+        self.busy += busy
+        self.depth_sum += depth
+        self.depth_max = max(self.depth_max, depth)
+
+    def dic(self, elapsed):
+        return {
+            'stage': self.name,
+            'items': self.count,
+            'fps': self.count / elapsed if elapsed > 0 else 0.,
+            'busy_fps': self.count / self.busy if self.busy > 0 else 0.,
+            'utilization': self.busy / elapsed if elapsed > 0 else 0.,
+            'avg_queue': self.depth_sum / self.count if self.count else 0.,
+            'max_queue': self.depth_max,
+        }
+
+
+class Pipeline(object):
+    """
+    Runs a source iterable and a chain of stage functions in separate worker threads.
+
+    Stages are connected by bounded queues, so a slow stage applies backpressure to the
+    ones before it instead of letting frames pile up in memory. Every stage has exactly one
+    worker, which keeps items in their original order. The heavy work in this project
+    (cv2 decode/encode, torch inference) releases the GIL, so the workers really overlap.
+
+    Example:
+        >>> pipe = Pipeline(frames(), [('infer', infer), ('render', render)], queue_size=8)
+        >>> for item in pipe:
+        >>>     show(item)
+        >>> pipe.report()
+
+    Args:
+        source (iterable): produces the items, consumed by the 'decode' worker
+        stages (list): list of (name, fn) pairs, each fn maps an item to the next item
+        queue_size (int): capacity of each inter-stage queue
+        source_name (str): name used for the source worker in the stats
+    """
+
+    def __init__(self, source, stages, queue_size=8, source_name='decode'):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+        self.stop_event = threading.Event()
+        self.error = None
+        self.threads = []
+        self.t_start = None
+
+    def _put(self, q, item):
+        # Blocking put that still notices a stop request
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    return _END
+
+    def _fail(self, e):
+        if self.error is None:
+            self.error = e
+        self.stop_event.set()
+
+    def _run_source(self):
+        stats, out_q = self.stats[0], self.queues[0]
+        try:
+            it = iter(self.source)
+            while not self.stop_event.is_set():
+                t0 = time.time()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                stats.add(time.time() - t0, 0)
+                if not self._put(out_q, item):
+                    break
+        except Exception as e:
+            self._fail(e)
+        self._put(out_q, _END)
+
+    def _run_stage(self, idx):
+        _, fn = self.stages[idx]
+        stats, in_q, out_q = self.stats[idx + 1], self.queues[idx], self.queues[idx + 1]
+        while True:
+            depth = in_q.qsize()
+            item = self._get(in_q)
+            if item is _END:
+                break
+            t0 = time.time()
+            try:
+                item = fn(item)
+            except Exception as e:
+                self._fail(e)
+                break
+            stats.add(time.time() - t0, depth)
+            if not self._put(out_q, item):
+                break
+        self._put(out_q, _END)
+
+    def start(self):
+        self.t_start = time.time()
+        self.threads = [threading.Thread(target=self._run_source, daemon=True)]
+        self.threads += [threading.Thread(target=self._run_stage, args=(i,), daemon=True)
+                         for i in range(len(self.stages))]
+        for t in self.threads:
+            t.start()
+        return self
+
+    def stop(self):
+        """Ask all workers to finish; items still queued are dropped."""
+        self.stop_event.set()
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+        if self.error is not None:
+            raise self.error
+
+    def __iter__(self):
+        if not self.threads:
+            self.start()
+        out_q = self.queues[-1]
+        while True:
+            item = self._get(out_q)
+            if item is _END:
+                break
+            yield item
+        self.join()
+
+    def summary(self):
+        """
+        Returns:
+            list: one dict per worker with throughput and queue depth statistics
+        """
+        elapsed = time.time() - self.t_start if self.t_start else 0.
+        return [s.dic(elapsed) for s in self.stats]
+
+    def report(self):
+        rows = self.summary()
+        print('%-10s%8s%10s%10s%8s%11s%11s' % ('stage', 'items', 'fps', 'busy-fps', 'util',
+                                               'avg-queue', 'max-queue'))
+        for r in rows:
+            print('%-10s%8d%10.2f%10.2f%8.2f%11.2f%11d' % (r['stage'], r['items'], r['fps'], r['busy_fps'],
+                                                           r['utilization'], r['avg_queue'], r['max_queue']))
+        if rows:
+            bottleneck = max(rows, key=lambda r: r['utilization'])
+            print('Bottleneck stage: %s' % bottleneck['stage'])
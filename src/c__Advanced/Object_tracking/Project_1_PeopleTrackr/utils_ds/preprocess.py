@@ -0,0 +1,83 @@
+import numpy as np
+import cv2
+import torch
+
+
+class LetterboxPreprocessor(object):
+    """
+    Reusable detector input builder for a stream with a fixed source resolution.
+
+    Same output as yolov5 `letterbox` -> BGR to RGB -> HWC to CHW -> float -> /255, but the resize
+    and padding geometry is computed once, and every frame is written into buffers allocated
+    up front (a resize buffer, a pinned uint8 staging tensor when running on CUDA, and the
+    float/half input tensor itself). The padding never changes, so it is filled only once.
+
+    Notes:
+        The returned tensor is the internal buffer: it is overwritten by the next call.
+
+    Args:
+        src_shape (tuple): shape of the source frames (height, width, 3)
+        img_size (int): detector input size (same meaning as letterbox new_shape)
+        batch_size (int): largest number of frames per call
+        device (torch.device): device of the detector
+        half (bool): produce an fp16 tensor
+        auto (bool): minimum rectangle padding, as letterbox(auto=True)
+        color (int): padding value
+    """
+
+    def __init__(self, src_shape, img_size=640, batch_size=1, device='cpu', half=False, auto=True, color=114):
+        self.src_shape = tuple(src_shape[:2])
+        self.batch_size = batch_size
+
+        # ***************** letterbox geometry, computed once *****************
+        shape = self.src_shape
+        new_shape = (img_size, img_size) if isinstance(img_size, int) else img_size
+        r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+        new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+        dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]  # wh padding
+        if auto:  # minimum rectangle
+            dw, dh = np.mod(dw, 64), np.mod(dh, 64)
+        dw /= 2
+        dh /= 2
+        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+
+        self.new_unpad = new_unpad
+        self.resize = shape[::-1] != new_unpad
+        self.ratio_pad = ((r, r), (dw, dh))     # what scale_coords expects
+        self.roi = (top, top + new_unpad[1], left, left + new_unpad[0])
+        self.shape = (new_unpad[1] + top + bottom, new_unpad[0] + left + right)
+
+        # ***************** buffers, allocated once *****************
+        self.device = torch.device(device)
+        self.resized = np.empty((new_unpad[1], new_unpad[0], 3), dtype=np.uint8)
+        self.staging = torch.full((batch_size, 3) + self.shape, color, dtype=torch.uint8)
+        if self.device.type == 'cuda':
+            self.staging = self.staging.pin_memory()
+        self.input = torch.empty((batch_size, 3) + self.shape, dtype=torch.half if half else torch.float,
+                                 device=self.device)
+
+    def accepts(self, im0s):
+        return len(im0s) <= self.batch_size and all(im0.shape[:2] == self.src_shape for im0 in im0s)
+
+    def __call__(self, im0s):
+        """
+        :param im0s: list of original images, BGR format, with the resolution given at construction
+        :return: input tensor (n, 3, h, w) in [0, 1], ratio_pad for scale_coords
+        """
+        n = len(im0s)
+        y1, y2, x1, x2 = self.roi
+        for i, im0 in enumerate(im0s):
+            if self.resize:
+                cv2.resize(im0, self.new_unpad, dst=self.resized, interpolation=cv2.INTER_LINEAR)
+                src = torch.from_numpy(self.resized)
+            else:
+                src = torch.from_numpy(np.ascontiguousarray(im0))
+            dst = self.staging[i, :, y1:y2, x1:x2]
+            for c in range(3):  # BGR HWC -> RGB CHW, straight into the padded staging tensor
+                dst[c].copy_(src[:, :, 2 - c])
+
+        img = self.input[:n]
+        img.copy_(self.staging[:n], non_blocking=True)  # uint8 to fp16/32 (and host to device)
+        img.div_(255.0)  # 0 - 255 to 0.0 - 1.0
+        return img, self.ratio_pad
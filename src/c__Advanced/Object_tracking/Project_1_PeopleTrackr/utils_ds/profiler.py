@@ -0,0 +1,230 @@
+"""
+Per-stage latency instrumentation.
+
+Every stage of the tracker (decode, letterbox, forward, nms, reid_preprocess, reid_forward, cascade,
+iou_matching, kalman_predict, kalman_update, render, write) is timed with
+
+    with profiler.stage('forward', sync=True):
+        pred = self.backend(img)
+
+and every duration lands in a rolling window per (stream, stage), from which p50/p95/p99 are taken.
+`snapshot` gives them as a dict, written as JSON or as Prometheus text (exposition format, e.g. for
+the node_exporter textfile collector) by `export`, periodically by `tick` and once at the end of the run.
+
+When profiling is off the code holds NULL_PROFILER instead: `stage` returns a shared no-op context
+manager, so an instrumented stage costs one method call.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+STAGES = ('decode', 'letterbox', 'forward', 'nms', 'reid_preprocess', 'reid_forward', 'kalman_predict',
+          'cascade', 'iou_matching', 'kalman_update', 'render', 'write')
+QUANTILES = (50, 95, 99)
+
+
+class Histogram(object):
+    """
+    Durations of one stage: the last `window` samples (ring buffer) for the percentiles, and the
+    count / sum of all samples.
+
+    Args:
+        window (int): number of samples the percentiles are computed on
+    """
+
+    def __init__(self, window=1024):
+        self.samples = np.zeros(window)
+        self.n = 0        # samples seen, the ring buffer holds the last min(n, window)
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        self.samples[self.n % len(self.samples)] = seconds
+        self.n += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def dic(self):
+        window = self.samples[:min(self.n, len(self.samples))]
+        p = np.percentile(window, QUANTILES) if len(window) else [0.] * len(QUANTILES)
+        out = {'count': self.n, 'sum': self.total, 'mean': self.total / self.n if self.n else 0., 'max': self.max}
+        out.update(('p%d' % q, float(v)) for q, v in zip(QUANTILES, p))
+        return out
+
+
+class _Timer(object):
+    __slots__ = ('hist', 'sync', 't0')
+
+    def __init__(self, hist, sync):
+        self.hist = hist
+        self.sync = sync
+
+    def __enter__(self):
+        if self.sync is not None:
+            self.sync()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if self.sync is not None:
+            self.sync()  # the GPU work queued in the stage is part of its latency
+        self.hist.add(time.perf_counter() - self.t0)
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullProfiler(object):
+    """profiling off: same interface, does nothing"""
+    enabled = False
+
+    def stage(self, name, sync=False):
+        return _NULL_TIMER
+
+    def record(self, name, seconds):
+        pass
+
+    def stream(self, name):
+        return self
+
+    def tick(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler(object):
+    """
+    Args:
+        stream (str): stream of this view, see `stream`
+        window (int): samples per rolling window
+        sync (callable): called before and after the stages timed with sync=True, e.g. torch.cuda.synchronize
+        paths (list): snapshot files, '.prom' for Prometheus text, JSON otherwise
+        interval (float): seconds between periodic snapshots (0: only at close)
+    """
+    enabled = True
+
+    def __init__(self, stream='main', window=1024, sync=None, paths=(), interval=10.):
+        self.name = stream
+        self.window = window
+        self.sync = sync
+        self.paths = list(paths)
+        self.interval = interval
+        self.hists = {}  # (stream, stage) -> Histogram, shared by all the views
+        self.lock = threading.Lock()
+        self.t_start = self.t_export = time.time()
+        self.root = self
+
+    def stream(self, name):
+        """view of the same profiler recording under another stream name"""
+        view = object.__new__(Profiler)
+        view.__dict__.update(self.__dict__)
+        view.name = name
+        return view
+
+    def _hist(self, name):
+        key = (self.name, name)
+        hist = self.hists.get(key)
+        if hist is None:
+            with self.lock:  # stages run in several threads with --pipeline
+                hist = self.hists.setdefault(key, Histogram(self.window))
+        return hist
+
+    def stage(self, name, sync=False):
+        return _Timer(self._hist(name), self.sync if sync else None)
+
+    def record(self, name, seconds):
+        self._hist(name).add(seconds)
+
+    def snapshot(self):
+        """{'time', 'uptime', 'streams': {stream: {stage: {count, sum, mean, max, p50, p95, p99}}}} in seconds"""
+        with self.lock:  # other threads may add stages meanwhile, percentiles are taken on a copy of the keys
+            items = list(self.hists.items())
+        streams = {}
+        for (stream, name), hist in sorted(items, key=lambda kv: self._order(kv[0])):
+            streams.setdefault(stream, {})[name] = hist.dic()
+        now = time.time()
+        return {'time': now, 'uptime': now - self.root.t_start, 'streams': streams}
+
+    @staticmethod
+    def _order(key):
+        stream, name = key
+        return stream, STAGES.index(name) if name in STAGES else len(STAGES), name
+
+    def export(self, path, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        text = to_prometheus(snapshot) if path.endswith('.prom') else json.dumps(snapshot, indent=2)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:  # scrapers never read a half written file
+            f.write(text)
+        os.replace(path + '.tmp', path)
+
+    def tick(self):
+        """writes the snapshot files if `interval` seconds have passed since the last ones"""
+        if self.interval and time.time() - self.root.t_export >= self.interval:
+            self.root.t_export = time.time()
+            snapshot = self.snapshot()
+            for path in self.paths:
+                self.export(path, snapshot)
+
+    def report(self):
+        """end of run table, milliseconds"""
+        lines = ['%-12s%-16s%10s%10s%10s%10s%10s' % ('stream', 'stage', 'count', 'mean', 'p50', 'p95', 'p99')]
+        for stream, stages in self.snapshot()['streams'].items():
+            for name, s in stages.items():
+                lines.append('%-12s%-16s%10d%10.2f%10.2f%10.2f%10.2f' % (
+                    stream, name, s['count'], 1000 * s['mean'], 1000 * s['p50'], 1000 * s['p95'], 1000 * s['p99']))
+        return '\n'.join(lines)
+
+    def close(self):
+        """final snapshot files and report"""
+        snapshot = self.snapshot()
+        for path in self.paths:
+            self.export(path, snapshot)
+        print('Stage latency (ms):\n' + self.report())
+
+
+def to_prometheus(snapshot, prefix='peopletrackr_stage_seconds'):
+    lines = ['# HELP %s Latency of each tracker stage, rolling window quantiles.' % prefix,
+             '# TYPE %s summary' % prefix]
+    for stream, stages in snapshot['streams'].items():
+        for name, s in stages.items():
+            labels = 'stream="%s",stage="%s"' % (stream, name)
+            for q in QUANTILES:
+                lines.append('%s{%s,quantile="%g"} %.9f' % (prefix, labels, q / 100., s['p%d' % q]))
+            lines.append('%s_sum{%s} %.9f' % (prefix, labels, s['sum']))
+            lines.append('%s_count{%s} %d' % (prefix, labels, s['count']))
+    return '\n'.join(lines) + '\n'
+
+
+def build_profiler(args, stream, device=None, deepsort_dir=''):
+    """Profiler from the --profile* arguments, NULL_PROFILER without --profile"""
+    if not getattr(args, 'profile', False):
+        return NULL_PROFILER
+    sync = None
+    if device is not None and device.type != 'cpu':
+        import torch
+        sync = torch.cuda.synchronize
+    return Profiler(stream, window=args.profile_window, sync=sync, interval=args.profile_interval,
+                    paths=[os.path.join(deepsort_dir, p) for p in args.profile_out])
@@ -0,0 +1,132 @@
+"""
+Post-training static INT8 quantization (FX graph mode, CPU) of the yolov5 detector and the ReID Net.
+
+Both networks are traced, Conv+BN(+ReLU) are fused, observers collect activation ranges on
+calibration data, and the converted model is saved as TorchScript so that it loads without the
+quantization code. The parts that do not quantize well are kept in FP32:
+    - yolov5 Detect(): the 1x1 output convs and the sigmoid/anchor decoding
+    - ReID Net: the final L2 normalisation
+
+INT8 kernels only exist on CPU (fbgemm on x86, qnnpack on ARM).
+"""
+import copy
+import os
+
+import torch
+import torch.nn as nn
+
+
+def int8_path(path):
+    """yolov5s.pt -> yolov5s.int8.pt, ckpt.t7 -> ckpt.int8.pt"""
+    return os.path.splitext(path)[0] + '.int8.pt'
+
+
+def is_int8(path):
+    return path.endswith('.int8.pt')
+
+
+class DetectorGraph(nn.Module):
+    """yolov5 Model without augment/profile switches, so that it can be symbolically traced"""
+
+    def __init__(self, model):
+        super(DetectorGraph, self).__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model.forward_once(x)  # (pred (bs, #anchors, 5 + #classes), raw maps)
+
+
+class ReIDBody(nn.Module):
+    """Net(reid=True) up to the pooled 512-d feature"""
+
+    def __init__(self, net):
+        super(ReIDBody, self).__init__()
+        self.net = net
+
+    def forward(self, x):
+        n = self.net
+        x = n.avgpool(n.layer4(n.layer3(n.layer2(n.layer1(n.conv(x))))))
+        return x.view(x.size(0), -1)
+
+
+class ReIDGraph(nn.Module):
+    """Quantized ReIDBody followed by the FP32 L2 normalisation of Net.forward"""
+
+    def __init__(self, body):
+        super(ReIDGraph, self).__init__()
+        self.body = body
+
+    def forward(self, x):
+        x = self.body(x)
+        return x.div(x.norm(p=2, dim=1, keepdim=True))
+
+
+def quantize_static(model, example, calibration, float_modules=(), engine='fbgemm'):
+    """
+    Args:
+        model (nn.Module): FP32 model, symbolically traceable
+        example (Tensor): example input
+        calibration (iterable): input batches used to collect the activation ranges
+        float_modules (tuple): module classes left in FP32 and not traced into
+        engine (str): 'fbgemm' (x86) or 'qnnpack' (ARM)
+
+    Returns:
+        GraphModule: the INT8 model
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    torch.backends.quantized.engine = engine
+    qconfig_mapping = get_default_qconfig_mapping(engine)
+    for cls in float_modules:
+        qconfig_mapping.set_object_type(cls, None)
+
+    model = copy.deepcopy(model).float().cpu().eval()  # the FP32 model stays usable
+    prepared = prepare_fx(model, qconfig_mapping, (example,),
+                          prepare_custom_config={'non_traceable_module_class': list(float_modules)})
+    n = 0
+    with torch.no_grad():
+        for batch in calibration:
+            prepared(batch.float().cpu())
+            n += len(batch)
+    assert n, "no calibration data"
+    print('Calibrated on %d samples' % n)
+    return convert_fx(prepared)
+
+
+def quantize_detector(model, img_size, calibration, engine='fbgemm'):
+    """
+    Args:
+        model (Model): yolov5 model loaded from the .pt checkpoint
+        img_size (int): the INT8 model is traced for a fixed img_size x img_size input
+        calibration (iterable): (n, 3, img_size, img_size) float batches in [0, 1]
+
+    Returns:
+        ScriptModule: img -> (pred, raw maps), same outputs as the eager model in eval mode
+    """
+    from models.yolo import Detect
+
+    example = torch.zeros(1, 3, img_size, img_size)
+    q = quantize_static(DetectorGraph(model), example, calibration, (Detect,), engine)
+    with torch.no_grad():
+        return torch.jit.trace(q, example, check_trace=False)
+
+
+def quantize_reid(net, calibration, engine='fbgemm'):
+    """
+    Args:
+        net (Net): ReID Net(reid=True) with its checkpoint loaded
+        calibration (iterable): (n, 3, 128, 64) normalised crop batches, as Extractor._preprocess builds them
+
+    Returns:
+        ScriptModule: crops -> L2 normalised features, same outputs as Net(reid=True)
+    """
+    example = torch.zeros(4, 3, 128, 64)
+    body = quantize_static(ReIDBody(net), example, calibration, (), engine)
+    with torch.no_grad():
+        return torch.jit.trace(ReIDGraph(body).eval(), example, check_trace=False)
+
+
+def load_int8(path):
+    """INT8 models only run on CPU"""
+    return torch.jit.load(path, map_location='cpu').eval()
@@ -0,0 +1,177 @@
+import csv
+import numpy as np
+import cv2
+
+from deep_sort.sort.kalman_filter import KalmanFilterBank
+
+
+class DetectionScheduler(object):
+    """
+    Decides per frame whether the detector (YOLO + ReID) has to run, instead of a fixed frame_interval.
+
+    Cheap signals, measured against the last detection frame:
+        - motion: mean absolute difference of a small grayscale thumbnail, in [0, 1]
+        - tentative: number of tentative tracks (new objects that still need detections to confirm)
+        - cov_growth: largest growth of a confirmed track's position covariance (trace of P[:2, :2]),
+          predicted here (P <- F P F^T + Q per frame) from the track state at the last detection,
+          divided by the growth of a converged track over the same frames. Every track's uncertainty
+          grows between detections (about 3x after one frame, 7x after five for a converged one), so
+          a steady scene stays at 1; tracks with a poorly known velocity (a few updates) go above.
+          The tracker itself cannot be asked: decisions are made while frames are read, before the
+          skipped frames are propagated (that happens when their chunk is tracked, or never with
+          --skip-mode hold).
+
+    A detection is forced after `max_interval` frames and never runs closer than `min_interval` frames.
+    In between it runs as soon as one of the signals crosses its threshold.
+
+    Latency: frames are read ahead and buffered until the next detection frame is decided (with
+    --batch-size N, the N-th), so a frame is emitted up to max_interval x batch_size frames after it was read.
+
+    Args:
+        min_interval (int): minimum number of frames between two detections
+        max_interval (int): maximum number of frames between two detections
+        motion_thres (float): frame-difference energy that triggers a detection
+        tentative_thres (int): number of tentative tracks that triggers a detection
+        cov_growth_thres (float): covariance growth, relative to a converged track, that triggers a
+            detection (2.0: the tracks with at most two updates, see cov_growth)
+        thumb_size (tuple): (width, height) of the thumbnail used for the frame difference
+        log_path (str): optional csv file receiving one row per decision
+    """
+
+    def __init__(self, min_interval=1, max_interval=6, motion_thres=0.02, tentative_thres=1,
+                 cov_growth_thres=2.0, thumb_size=(64, 36), log_path=None):
+        assert 1 <= min_interval <= max_interval, "Need 1 <= min_interval <= max_interval"
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_thres = motion_thres
+        self.tentative_thres = tentative_thres
+        self.cov_growth_thres = cov_growth_thres
+        self.thumb_size = thumb_size
+
+        self.last_det_frame = None
+        self.last_thumb = None
+
+        # (frame, means, covariances) of the confirmed tracks after the last tracked detection frame,
+        # replaced as one tuple: on_tracked may run in another thread (--pipeline)
+        self.kf = KalmanFilterBank(capacity=1)
+        self.base = None
+        self._predicted = (None, 0, None, None)  # (base, frames ahead, means, covariances)
+
+        # state of a converged track (updated every frame) and its position covariance traces predicted
+        # 0, 1, 2... frames ahead. The covariances scale with the box height squared, h = 1 fits all tracks
+        measurement = np.array([0., 0., 1., 1.])
+        mean, cov = self.kf.initiate(measurement)
+        for _ in range(100):
+            mean, cov = self.kf.update(*self.kf.predict(mean, cov), measurement)
+        self._steady = (mean, cov, [cov[0, 0] + cov[1, 1]])
+
+        self.n_frames = 0
+        self.n_detections = 0
+        self.reasons = {}
+
+        self.log_file = None
+        self.log_writer = None
+        if log_path:
+            self.log_file = open(log_path, 'w', newline='')
+            self.log_writer = csv.writer(self.log_file)
+            self.log_writer.writerow(['frame', 'detect', 'reason', 'since_last', 'motion', 'tentative', 'cov_growth'])
+
+    def _thumb(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    @staticmethod
+    def _pos_cov(covariance):
+        return covariance[:, 0, 0] + covariance[:, 1, 1]
+
+    def _cov_growth(self, idx_frame):
+        # largest trace growth of the position covariances predicted idx_frame - base frame frames ahead
+        base = self.base
+        if base is None or not len(base[2]):
+            return 0.
+        steps = idx_frame - base[0]
+        predicted_base, done, mean, cov = self._predicted
+        if predicted_base is not base or steps < done:  # new baseline (or out of order): predict from it
+            done, mean, cov = 0, base[1], base[2]
+        while done < steps:
+            mean, cov = self.kf.predict_batch(mean, cov)
+            done += 1
+        self._predicted = (base, done, mean, cov)
+        growth = np.max(self._pos_cov(cov) / self._pos_cov(base[2]))
+        return float(growth / self._steady_growth(steps))
+
+    def _steady_growth(self, steps):
+        # trace growth of the converged track's position covariance, steps frames ahead
+        mean, cov, traces = self._steady
+        while len(traces) <= steps:
+            mean, cov = self.kf.predict(mean, cov)
+            traces.append(cov[0, 0] + cov[1, 1])
+        self._steady = (mean, cov, traces)
+        return traces[max(steps, 0)] / traces[0]
+
+    def decide(self, idx_frame, img, tracks=()):
+        """
+        Args:
+            idx_frame (int): index of the frame
+            img (ndarray): frame, BGR format
+            tracks (list): current deep_sort Track objects
+
+        Returns:
+            bool: True if the detector should run on this frame
+        """
+        self.n_frames += 1
+        thumb = self._thumb(img)
+        motion, n_tentative, cov_growth = 0., 0, 0.
+
+        if self.last_det_frame is None:
+            detect, reason, since = True, 'first', 0
+        else:
+            since = idx_frame - self.last_det_frame
+            motion = float(np.abs(thumb - self.last_thumb).mean()) / 255.
+            n_tentative = sum(1 for t in tracks if t.is_tentative())
+            cov_growth = self._cov_growth(idx_frame)
+
+            if since < self.min_interval:
+                detect, reason = False, 'min_interval'
+            elif since >= self.max_interval:
+                detect, reason = True, 'max_interval'
+            elif motion > self.motion_thres:
+                detect, reason = True, 'motion'
+            elif n_tentative >= self.tentative_thres:
+                detect, reason = True, 'tentative'
+            elif cov_growth > self.cov_growth_thres:
+                detect, reason = True, 'cov_growth'
+            else:
+                detect, reason = False, 'stable'
+
+        if detect:
+            self.n_detections += 1
+            self.last_det_frame = idx_frame
+            self.last_thumb = thumb
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+        if self.log_writer is not None:
+            self.log_writer.writerow([idx_frame, int(detect), reason, since,
+                                      '%.4f' % motion, n_tentative, '%.3f' % cov_growth])
+        return detect
+
+    def on_tracked(self, tracks, idx_frame):
+        """Record the confirmed track states right after the detection update of frame `idx_frame`
+        (baseline of cov_growth, predicted forward from there)."""
+        confirmed = [t for t in tracks if t.is_confirmed()]
+        self.base = (idx_frame, np.array([t.mean for t in confirmed]).reshape(-1, 8),
+                     np.array([t.covariance for t in confirmed]).reshape(-1, 8, 8))
+
+    def summary(self):
+        skipped = self.n_frames - self.n_detections
+        return {'frames': self.n_frames,
+                'detections': self.n_detections,
+                'skipped': skipped,
+                'skipped_ratio': skipped / self.n_frames if self.n_frames else 0.,
+                'reasons': dict(self.reasons)}
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+            self.log_writer = None
@@ -0,0 +1,274 @@
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+import cv2
+
+from .io import format_results
+
+
+_END = object()  # sentinel closing the writer thread
+
+
+class AsyncWriter(object):
+    """
+    One background thread running the blocking writes (disk, NFS, video encoding) handed to it
+    through a bounded queue. When the queue is full, `submit` blocks: the tracker slows down to
+    the speed of the storage instead of buffering without limit.
+
+    An error raised by a write is re-raised by the next `submit`, `flush` or `close`.
+
+    Args:
+        queue_size (int): number of pending writes
+        name (str): thread name
+    """
+
+    def __init__(self, queue_size=32, name='writer'):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._work, name=name, daemon=True)
+        self.thread.start()
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is _END:
+                    return
+                if self.error is None:
+                    fn, args = job
+                    fn(*args)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, fn, *args):
+        self._check()
+        self.queue.put((fn, args))
+
+    def wait(self):
+        """blocks until every submitted write is done"""
+        self.queue.join()
+        self._check()
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.queue.put(_END)
+            self.thread.join()
+        self._check()
+
+
+class ThreadedVideoWriter(object):
+    """
+    cv2.VideoWriter whose encoding runs in a background thread.
+    The frames must not be modified after `write` (the tracker never reuses a decoded frame).
+
+    Args:
+        path (str): output video
+        fourcc (str): codec, e.g. 'mp4v'
+        fps (float): frame rate
+        size (tuple): (width, height)
+        queue_size (int): number of frames waiting to be encoded
+    """
+
+    def __init__(self, path, fourcc, fps, size, queue_size=32):
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        self.worker = AsyncWriter(queue_size, name='video-writer')
+
+    def write(self, img):
+        self.worker.submit(self.writer.write, img)
+
+    def flush(self):
+        self.worker.wait()
+
+    def close(self):
+        self.worker.stop()
+        self.writer.release()
+
+    release = close  # same name as cv2.VideoWriter
+
+
+class TxtSink(object):
+    """
+    Legacy layout: one `<frame>.txt` per frame, `x1 y1 x2 y2 id class` tab separated.
+    Kept synchronous to serve as the reference in benchmarks/bench_sinks.py.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def write(self, idx_frame, outputs):
+        with open(self.folder + str(idx_frame).zfill(4) + '.txt', 'a') as f:
+            for i in range(len(outputs)):
+                x1, y1, x2, y2, idx, class_id = outputs[i]
+                f.write('{}\t{}\t{}\t{}\t{}\t{}\n'.format(x1, y1, x2, y2, idx, class_id))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MotSink(object):
+    """
+    All frames in one MOT txt file (`frame,id,x1,y1,w,h,-1,-1,-1,-1`, frames numbered from 1), the
+    format of io.write_results, readable by io.read_mot_results. Frames are buffered and appended
+    in blocks of `buffer_frames` by a background thread.
+
+    Args:
+        path (str): output file, truncated on creation
+        buffer_frames (int): frames per block
+        data_type (str): 'mot' or 'kitti'
+    """
+
+    def __init__(self, path, buffer_frames=256, data_type='mot', queue_size=4):
+        self.path = path
+        self.buffer_frames = buffer_frames
+        self.data_type = data_type
+        self.buffer = []
+        open(path, 'w').close()
+        self.worker = AsyncWriter(queue_size, name='mot-writer')
+
+    def write(self, idx_frame, outputs):
+        outputs = np.asarray(outputs).reshape(-1, 6)
+        tlwhs = outputs[:, :4].astype(float)
+        tlwhs[:, 2:] -= tlwhs[:, :2]
+        self.buffer.append((idx_frame + 1, tlwhs, outputs[:, 4].astype(int)))
+        if len(self.buffer) >= self.buffer_frames:
+            self._submit()
+
+    def _submit(self):
+        if self.buffer:
+            self.worker.submit(self._append, self.buffer)
+            self.buffer = []
+
+    def _append(self, results):
+        with open(self.path, 'a') as f:
+            f.writelines(format_results(results, self.data_type))
+
+    def flush(self):
+        self._submit()
+        self.worker.wait()
+
+    def close(self):
+        self._submit()
+        self.worker.stop()
+
+
+class ColumnarSink(object):
+    """
+    Binary columnar file: rows (frame, x1, y1, x2, y2, track_id, class) as int32, written in blocks.
+
+    Layout:
+        header  b'PTRKCOL1', uint32 #columns, the column names as one comma separated utf-8 string
+                (uint32 length prefixed)
+        blocks  uint32 #rows, then each column as #rows contiguous little-endian int32
+
+    Rows are gathered in preallocated column arrays of `buffer_rows` and handed to a background
+    thread when full. Read back with `read_columnar`.
+
+    Args:
+        path (str): output file, truncated on creation
+        buffer_rows (int): rows per block
+    """
+    MAGIC = b'PTRKCOL1'
+    COLUMNS = ('frame', 'x1', 'y1', 'x2', 'y2', 'track_id', 'class')
+
+    def __init__(self, path, buffer_rows=65536, queue_size=4):
+        self.path = path
+        self.buffer = np.empty((len(self.COLUMNS), buffer_rows), dtype='<i4')
+        self.n = 0
+        names = ','.join(self.COLUMNS).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(self.MAGIC + struct.pack('<II', len(self.COLUMNS), len(names)) + names)
+        self.worker = AsyncWriter(queue_size, name='columnar-writer')
+
+    def write(self, idx_frame, outputs):
+        outputs = np.asarray(outputs).reshape(-1, 6)
+        i = 0
+        while i < len(outputs):
+            k = min(len(outputs) - i, self.buffer.shape[1] - self.n)
+            block = self.buffer[:, self.n:self.n + k]
+            block[0] = idx_frame
+            block[1:] = outputs[i:i + k].T
+            self.n += k
+            i += k
+            if self.n == self.buffer.shape[1]:
+                self._submit()
+
+    def _submit(self):
+        if self.n:
+            block, self.n = self.buffer[:, :self.n].copy(), 0  # the buffer is refilled while the block is written
+            self.worker.submit(self._append, block)
+
+    def _append(self, block):
+        with open(self.path, 'ab') as f:
+            f.write(struct.pack('<I', block.shape[1]))
+            f.write(np.ascontiguousarray(block).tobytes())
+
+    def flush(self):
+        self._submit()
+        self.worker.wait()
+
+    def close(self):
+        self._submit()
+        self.worker.stop()
+
+
+def read_columnar(path):
+    """
+    Args:
+        path (str): file written by ColumnarSink
+
+    Returns:
+        dict: column name -> int32 ndarray
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:8] == ColumnarSink.MAGIC, "%s is not a columnar track file" % path
+    n_cols, n_names = struct.unpack_from('<II', data, 8)
+    offset = 16 + n_names
+    names = data[16:offset].decode('utf-8').split(',')
+    blocks = []
+    while offset < len(data):
+        n, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        blocks.append(np.frombuffer(data, dtype='<i4', count=n * n_cols, offset=offset).reshape(n_cols, n))
+        offset += 4 * n * n_cols
+    cols = np.concatenate(blocks, axis=1) if blocks else np.empty((n_cols, 0), dtype='<i4')
+    return dict(zip(names, cols))
+
+
+SINKS = ('frames', 'mot', 'columnar', 'store')
+
+
+def build_sink(fmt, folder, fps=25.):
+    """
+    Args:
+        fmt (str): 'frames' (one txt per frame, legacy), 'mot' (results.txt), 'columnar' (results.bin)
+                   or 'store' (indexed track store in tracks/, see track_store.py)
+        folder (str): output folder
+        fps (float): frame rate of the source, for the timestamps of the track store
+
+    Returns:
+        sink with write(idx_frame, outputs), flush() and close()
+    """
+    if fmt == 'frames':
+        return TxtSink(folder)
+    if fmt == 'mot':
+        return MotSink(os.path.join(folder, 'results.txt'))
+    if fmt == 'columnar':
+        return ColumnarSink(os.path.join(folder, 'results.bin'))
+    if fmt == 'store':
+        from .track_store import TrackStoreWriter  # track_store imports this module
+        return TrackStoreWriter(os.path.join(folder, 'tracks'), fps=fps or 25.)
+    raise ValueError(fmt)
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def _starts(length, tile, step):
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)  # last tile flush with the border
+    return starts
+
+
+def make_tiles(shape, tile_size=640, overlap=128):
+    """
+    Cuts an image into overlapping tiles.
+
+    Args:
+        shape (tuple): image shape (height, width, ...)
+        tile_size (int): side of a square tile in pixels
+        overlap (int): overlap between neighbouring tiles in pixels, should exceed the size of the
+                       smallest objects of interest so that each of them is complete in one tile
+
+    Returns:
+        list: tiles as (x1, y1, x2, y2), empty if the image fits in a single tile
+    """
+    h, w = shape[:2]
+    assert 0 <= overlap < tile_size, "overlap must be smaller than tile_size"
+    if h <= tile_size and w <= tile_size:
+        return []
+    step = tile_size - overlap
+    return [(x, y, min(x + tile_size, w), min(y + tile_size, h))
+            for y in _starts(h, tile_size, step) for x in _starts(w, tile_size, step)]
+
+
+def inner_edge_mask(boxes, tile, shape, margin=2):
+    """
+    Flags boxes (xyxy, image coordinates) that touch an edge of their tile which is not an image border.
+    Such boxes are usually an object cut by the tile seam; the neighbouring tile (or the global view)
+    sees it whole.
+
+    Args:
+        boxes (ndarray): (n, 4) x1 y1 x2 y2
+        tile (tuple): (x1, y1, x2, y2) of the tile the boxes come from
+        shape (tuple): image shape (height, width, ...)
+        margin (int): distance in pixels that counts as touching
+
+    Returns:
+        ndarray: (n,) bool, True for boxes cut by an inner tile edge
+    """
+    h, w = shape[:2]
+    tx1, ty1, tx2, ty2 = tile
+    boxes = np.asarray(boxes)
+    cut = np.zeros(len(boxes), dtype=bool)
+    if tx1 > 0:
+        cut |= boxes[:, 0] <= tx1 + margin
+    if ty1 > 0:
+        cut |= boxes[:, 1] <= ty1 + margin
+    if tx2 < w:
+        cut |= boxes[:, 2] >= tx2 - margin
+    if ty2 < h:
+        cut |= boxes[:, 3] >= ty2 - margin
+    return cut
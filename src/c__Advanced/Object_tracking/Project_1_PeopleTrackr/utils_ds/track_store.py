@@ -0,0 +1,250 @@
+"""
+Append-only columnar track store with a sidecar index.
+
+A store is a folder:
+    <column>.bin   one raw little-endian file per column, rows appended in frame order
+    index.json     schema, and per chunk: first row, #rows, frame range, time range, track ids
+
+Rows are buffered and written in chunks. The index is rewritten (atomically) after every chunk, so
+a reader never sees rows that are not indexed. Readers memory-map the columns: a query only touches
+the chunks the index selects, never the whole log.
+
+Example:
+    >>> store = TrackStore('output/predict/tracks')
+    >>> rows = store.track(42)                      # every box of track 42
+    >>> rows = store.window(frames=(1000, 1500))    # or times=(40.0, 60.0), in seconds
+    >>> rows['x1'], rows['frame']
+
+Conversion from / to the MOT txt format of utils_ds/io.py:
+    $ python -m utils_ds.track_store from-mot results.txt tracks/ --fps 25
+    $ python -m utils_ds.track_store to-mot tracks/ results.txt
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from .io import read_mot_results, write_results
+from .sinks import AsyncWriter
+
+
+SCHEMA = (('frame', '<i4'), ('timestamp', '<f8'), ('x1', '<f4'), ('y1', '<f4'), ('x2', '<f4'), ('y2', '<f4'),
+          ('track_id', '<i4'), ('class', '<i2'), ('conf', '<f4'))
+COLUMNS = tuple(name for name, _ in SCHEMA)
+INDEX = 'index.json'
+
+
+class TrackStoreWriter(object):
+    """
+    Args:
+        folder (str): store folder, created if needed, truncated if it already holds a store
+        fps (float): frame rate used to derive the timestamps of write()
+        chunk_rows (int): rows per chunk
+        queue_size (int): chunks waiting to be written by the background thread
+    """
+
+    def __init__(self, folder, fps=25., chunk_rows=65536, queue_size=4):
+        self.folder = folder
+        self.fps = fps
+        self.chunk_rows = chunk_rows
+        os.makedirs(folder, exist_ok=True)
+        for name in COLUMNS:
+            open(os.path.join(folder, name + '.bin'), 'wb').close()
+
+        self.buffer = {name: np.empty(chunk_rows, dtype=dtype) for name, dtype in SCHEMA}
+        self.n = 0
+        self.index = {'schema': [list(c) for c in SCHEMA], 'rows': 0, 'chunks': []}
+        self._write_index(self.index)
+        self.worker = AsyncWriter(queue_size, name='track-store-writer')
+
+    def append(self, frame, timestamp, boxes, track_ids, classes=None, confs=None):
+        """
+        Args:
+            frame (int): frame index, non decreasing between calls
+            timestamp (float): seconds
+            boxes (ndarray): (n, 4) x1 y1 x2 y2
+            track_ids (ndarray): (n,)
+            classes (ndarray): (n,), default 0
+            confs (ndarray): (n,), default -1 (unknown)
+        """
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        n = len(boxes)
+        cols = {'frame': np.full(n, frame), 'timestamp': np.full(n, timestamp),
+                'x1': boxes[:, 0], 'y1': boxes[:, 1], 'x2': boxes[:, 2], 'y2': boxes[:, 3],
+                'track_id': np.asarray(track_ids).reshape(-1),
+                'class': np.zeros(n) if classes is None else np.asarray(classes).reshape(-1),
+                'conf': np.full(n, -1.) if confs is None else np.asarray(confs).reshape(-1)}
+        i = 0
+        while i < n:
+            k = min(n - i, self.chunk_rows - self.n)
+            for name in COLUMNS:
+                self.buffer[name][self.n:self.n + k] = cols[name][i:i + k]
+            self.n += k
+            i += k
+            if self.n == self.chunk_rows:
+                self._submit()
+
+    def write(self, idx_frame, outputs):
+        """sink interface: outputs (#ID, 6) x1 y1 x2 y2 track_id class"""
+        outputs = np.asarray(outputs).reshape(-1, 6)
+        self.append(idx_frame, idx_frame / self.fps, outputs[:, :4], outputs[:, 4], outputs[:, 5])
+
+    def _submit(self):
+        if not self.n:
+            return
+        chunk = {name: self.buffer[name][:self.n].copy() for name in COLUMNS}
+        self.n = 0
+        entry = {'start': self.index['rows'], 'rows': len(chunk['frame']),
+                 'frames': [int(chunk['frame'][0]), int(chunk['frame'][-1])],
+                 'times': [float(chunk['timestamp'][0]), float(chunk['timestamp'][-1])],
+                 'tracks': np.unique(chunk['track_id']).tolist()}
+        self.index['rows'] += entry['rows']
+        self.index['chunks'].append(entry)
+        index = json.loads(json.dumps(self.index))  # snapshot, the writer thread publishes it after the data
+        self.worker.submit(self._append, chunk, index)
+
+    def _append(self, chunk, index):
+        for name in COLUMNS:
+            with open(os.path.join(self.folder, name + '.bin'), 'ab') as f:
+                f.write(chunk[name].tobytes())
+        self._write_index(index)
+
+    def _write_index(self, index):
+        path = os.path.join(self.folder, INDEX)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+
+    def flush(self):
+        self._submit()
+        self.worker.wait()
+
+    def close(self):
+        self._submit()
+        self.worker.stop()
+
+
+class TrackStore(object):
+    """
+    Memory-mapped reader. Queries return a dict column name -> ndarray, rows in frame order.
+
+    Args:
+        folder (str): store written by TrackStoreWriter
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.refresh()
+
+    def refresh(self):
+        """picks up the chunks written since the store was opened"""
+        with open(os.path.join(self.folder, INDEX)) as f:
+            self.index = json.load(f)
+        n = self.index['rows']
+        self.columns = {name: np.memmap(os.path.join(self.folder, name + '.bin'), dtype=dtype, mode='r', shape=(n,))
+                        if n else np.empty(0, dtype=dtype) for name, dtype in SCHEMA}
+        self.chunks = self.index['chunks']
+        self.tracks = {}  # track id -> chunk numbers
+        for c, chunk in enumerate(self.chunks):
+            for track_id in chunk['tracks']:
+                self.tracks.setdefault(track_id, []).append(c)
+
+    def __len__(self):
+        return self.index['rows']
+
+    def _gather(self, slices, mask_fn=None):
+        out = {name: [] for name in COLUMNS}
+        for s in slices:
+            mask = mask_fn(s) if mask_fn is not None else slice(None)
+            for name in COLUMNS:
+                out[name].append(np.asarray(self.columns[name][s][mask]))
+        return {name: np.concatenate(v) if v else np.empty(0, dtype=self.columns[name].dtype) for name, v in out.items()}
+
+    def _chunk_slice(self, c):
+        chunk = self.chunks[c]
+        return slice(chunk['start'], chunk['start'] + chunk['rows'])
+
+    def track(self, track_id):
+        """every row of one track"""
+        slices = [self._chunk_slice(c) for c in self.tracks.get(int(track_id), [])]
+        return self._gather(slices, lambda s: self.columns['track_id'][s] == track_id)
+
+    def window(self, frames=None, times=None):
+        """
+        rows with frames[0] <= frame <= frames[1], or times[0] <= timestamp <= times[1] (seconds)
+        """
+        assert (frames is None) != (times is None), "give either frames or times"
+        key, col, (lo, hi) = ('frames', 'frame', frames) if frames is not None else ('times', 'timestamp', times)
+        slices = []
+        for c, chunk in enumerate(self.chunks):
+            if chunk[key][1] < lo or chunk[key][0] > hi:
+                continue
+            s = self._chunk_slice(c)
+            values = self.columns[col][s]  # sorted, rows are appended in frame order
+            i, j = np.searchsorted(values, lo, 'left'), np.searchsorted(values, hi, 'right')
+            slices.append(slice(s.start + i, s.start + j))
+        return self._gather(slices)
+
+    def frame(self, idx_frame):
+        return self.window(frames=(idx_frame, idx_frame))
+
+    def track_ids(self):
+        return sorted(self.tracks)
+
+
+def mot_to_store(mot_path, folder, fps=25., chunk_rows=65536):
+    """MOT txt (frames from 1, read with io.read_mot_results) -> store with frames from 0"""
+    results = read_mot_results(mot_path, is_gt=False, is_ignore=False)
+    writer = TrackStoreWriter(folder, fps, chunk_rows)
+    for fid in sorted(results):
+        objs = results[fid]
+        if not objs:
+            continue
+        tlwhs = np.asarray([tlwh for tlwh, _, _ in objs], dtype=float).reshape(-1, 4)
+        tlwhs[:, 2:] += tlwhs[:, :2]
+        writer.append(fid - 1, (fid - 1) / fps, tlwhs, [i for _, i, _ in objs], confs=[s for _, _, s in objs])
+    writer.close()
+
+
+def store_to_mot(folder, mot_path):
+    """store -> MOT txt with io.write_results (frames from 1)"""
+    store = TrackStore(folder)
+    results = []
+    for c in range(len(store.chunks)):
+        rows = store._gather([store._chunk_slice(c)])
+        bounds = np.flatnonzero(np.diff(rows['frame'])) + 1
+        for part in np.split(np.arange(len(rows['frame'])), bounds):
+            if not len(part):
+                continue
+            tlwhs = np.stack([rows['x1'][part], rows['y1'][part],
+                              rows['x2'][part] - rows['x1'][part], rows['y2'][part] - rows['y1'][part]], 1)
+            results.append((int(rows['frame'][part[0]]) + 1, tlwhs, rows['track_id'][part].tolist()))
+    write_results(mot_path, results, 'mot')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='cmd')
+    p = sub.add_parser('from-mot', help='MOT txt -> track store')
+    p.add_argument('mot')
+    p.add_argument('store')
+    p.add_argument('--fps', type=float, default=25.)
+    p = sub.add_parser('to-mot', help='track store -> MOT txt')
+    p.add_argument('store')
+    p.add_argument('mot')
+    p = sub.add_parser('track', help='print the rows of one track')
+    p.add_argument('store')
+    p.add_argument('track_id', type=int)
+    args = parser.parse_args()
+
+    if args.cmd == 'from-mot':
+        mot_to_store(args.mot, args.store, args.fps)
+    elif args.cmd == 'to-mot':
+        store_to_mot(args.store, args.mot)
+    elif args.cmd == 'track':
+        rows = TrackStore(args.store).track(args.track_id)
+        for r in zip(*(rows[name] for name in COLUMNS)):
+            print(' '.join(str(v) for v in r))
+    else:
+        parser.print_help()
@@ -0,0 +1,104 @@
+import numpy as np
+import cv2
+
+
+class Trail(object):
+    """
+    Last positions of one track, oldest first, in fixed size arrays.
+
+    Attributes:
+        points (ndarray): (max_points, 2) int32 centroids, the first `n` are valid
+        times (ndarray): (max_points,) float64 timestamps of the points
+        n (int): number of valid points
+        last_seen (float): timestamp of the newest point
+    """
+
+    def __init__(self, max_points):
+        self.points = np.empty((max_points, 2), dtype=np.int32)
+        self.times = np.empty(max_points, dtype=np.float64)
+        self.n = 0
+        self.last_seen = None
+
+    def append(self, t, point):
+        if self.n == len(self.points):  # full: drop the oldest point
+            self.points[:-1] = self.points[1:]
+            self.times[:-1] = self.times[1:]
+            self.n -= 1
+        self.points[self.n] = point
+        self.times[self.n] = t
+        self.n += 1
+        self.last_seen = t
+
+    def since(self, t):
+        """points not older than t"""
+        i = np.searchsorted(self.times[:self.n], t, 'left')
+        return self.points[i:self.n]
+
+
+class TrajectoryStore(object):
+    """
+    Trajectories of the active tracks as short polylines, with bounded memory for runs of any length:
+        - at most `max_points` points per track
+        - points older than `decay` seconds are not drawn (and are overwritten as new ones come in)
+        - a track not seen for `evict_after` seconds is removed (DeepSort deleted it, or it left the scene)
+
+    Nothing is drawn into a persistent full frame layer: `draw` paints the current polylines on the
+    frame being rendered, so the cost is only paid for frames that are displayed or written.
+
+    Args:
+        max_points (int): positions kept per track
+        decay (float): seconds of trail drawn behind each person
+        evict_after (float): seconds without update before a track is removed
+    """
+
+    def __init__(self, max_points=64, decay=10., evict_after=5.):
+        self.max_points = max_points
+        self.decay = decay
+        self.evict_after = evict_after
+        self.trails = {}  # track id -> Trail
+        self.now = 0.
+
+    def __len__(self):
+        return len(self.trails)
+
+    def update(self, t, outputs):
+        """
+        :param t: timestamp of the frame (seconds)
+        :param outputs: (#ID, 6) x1 y1 x2 y2 track_id class
+        """
+        self.now = t
+        for output in outputs:
+            x1, y1, x2, y2, track_id = [int(v) for v in output[:5]]
+            trail = self.trails.get(track_id)
+            if trail is None:
+                trail = self.trails[track_id] = Trail(self.max_points)
+            trail.append(t, (int((x1 + x2) / 2), int((y1 + y2) / 2)))  # same centroid as utilities.find_centroid
+        self.evict()
+
+    def evict(self):
+        limit = self.now - self.evict_after
+        for track_id in [i for i, trail in self.trails.items() if trail.last_seen < limit]:
+            del self.trails[track_id]
+
+    def clear(self):
+        self.trails = {}
+
+    def polyline(self, track_id):
+        trail = self.trails.get(int(track_id))
+        if trail is None:
+            return np.empty((0, 2), dtype=np.int32)
+        return trail.since(self.now - self.decay)
+
+    def draw(self, img, colors, scale=1., thickness=3):
+        """
+        :param img: frame to draw on, at `scale` times the tracking resolution
+        :param colors: dict track id -> BGR color, only these tracks are drawn
+        """
+        for track_id, color in colors.items():
+            pts = self.polyline(track_id)
+            if len(pts) < 2:
+                continue
+            if scale != 1:
+                pts = (pts * scale).astype(np.int32)
+            cv2.polylines(img, [pts.reshape(-1, 1, 2)], False, color, thickness)
+        return img
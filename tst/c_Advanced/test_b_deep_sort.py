@@ -0,0 +1,267 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+
+# deep_sort imports its siblings (utils_ds) from the project folder, as when the tracker scripts run from there
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'c__Advanced',
+                                           'Object_tracking', 'Project_1_PeopleTrackr'))
+sys.path.insert(0, PROJECT_DIR)
+
+from deep_sort.sort import iou_matching, linear_assignment  # noqa: E402
+from deep_sort.sort.detection import Detection  # noqa: E402
+from deep_sort.sort.kalman_filter import KalmanFilter, KalmanFilterBank  # noqa: E402
+from deep_sort.sort.nn_matching import NearestNeighborDistanceMetric, _nn_cosine_distance  # noqa: E402
+from deep_sort.sort.spatial_index import GridIndex  # noqa: E402
+from deep_sort.sort.tracker import Tracker  # noqa: E402
+
+
+def random_features(rng, n, dim=16):
+    return rng.randn(n, dim).astype(np.float32)
+
+
+class Crowd(object):
+    """people walking in a size x size scene, each with its own appearance, detected with probability 1 - miss"""
+
+    def __init__(self, rng, people, size, miss):
+        self.rng, self.size, self.miss = rng, size, miss
+        self.pos = rng.uniform(0, size - 75, (people, 2))
+        self.vel = rng.uniform(-2, 2, (people, 2))
+        self.looks = random_features(rng, people)
+
+    def step(self):
+        self.pos = np.clip(self.pos + self.vel, 0, self.size - 75)
+        seen = np.flatnonzero(self.rng.rand(len(self.pos)) >= self.miss)
+        features = self.looks[seen] + 0.3 * random_features(self.rng, len(seen))
+        return [Detection(np.r_[self.pos[i], 30, 75], 0.9, feature, 0) for i, feature in zip(seen, features)]
+
+
+class TestNearestNeighborGallery(unittest.TestCase):
+
+    def check_against_dict_gallery(self, budget):
+        # the per-target sample lists the ring buffer replaced, with targets leaving and coming back;
+        # the cost matrices agree up to float32 rounding (one matrix product vs one per target)
+        rng = np.random.RandomState(1)
+        metric = NearestNeighborDistanceMetric('cosine', 0.2, budget=budget, max_tracks=4)
+        samples = {}
+        for frame in range(60):
+            active = [t for t in range(12) if (t + frame // 10) % 4]
+            targets = rng.choice(active, 20)  # several samples of a target in one frame
+            features = random_features(rng, len(targets))
+            metric.partial_fit(features, targets, active)
+            for target, feature in zip(targets, features):
+                samples.setdefault(target, []).append(feature)
+                if budget is not None:
+                    samples[target] = samples[target][-budget:]
+            samples = {t: samples[t] for t in active if t in samples}
+
+            queries = random_features(rng, 7)
+            known = sorted(samples)
+            expected = np.array([_nn_cosine_distance(np.array(samples[t]), queries) for t in known])
+            np.testing.assert_allclose(metric.distance(queries, known), expected, rtol=1e-5, atol=1e-5)
+
+    def test_budget_matches_dict_gallery(self):
+        self.check_against_dict_gallery(budget=5)
+
+    def test_unbounded_matches_dict_gallery(self):
+        self.check_against_dict_gallery(budget=None)
+
+    def test_distance_pairs_matches_distance(self):
+        rng = np.random.RandomState(7)
+        for metric_name in ('cosine', 'euclidean'):
+            metric = NearestNeighborDistanceMetric(metric_name, 0.2, budget=10, max_tracks=4)
+            for _ in range(15):
+                targets = rng.choice(8, 12)
+                metric.partial_fit(random_features(rng, len(targets)), targets, range(8))
+            queries = random_features(rng, 9)
+            known = sorted(metric.rows)
+            rows = rng.randint(0, len(known), 30)
+            cols = rng.randint(0, len(queries), 30)
+            expected = metric.distance(queries, known)[rows, cols]
+            targets = [known[row] for row in rows] + [100]  # a target without samples
+            pairs = metric.distance_pairs(np.vstack([queries[cols], queries[:1]]), targets, chunk_size=500)
+            np.testing.assert_allclose(pairs[:-1], expected, rtol=1e-5, atol=1e-5)
+            self.assertEqual(pairs[-1], np.inf)
+
+    def test_unbounded_gallery_grows_linearly(self):
+        # budget=None: the gallery doubles only when a row is full, every row keeps all its samples in order
+        rng = np.random.RandomState(0)
+        metric = NearestNeighborDistanceMetric('cosine', 0.2, budget=None, max_tracks=8)
+        targets = np.arange(30)
+        history = {target: [] for target in targets}
+        frames = 200
+        for _ in range(frames):
+            features = random_features(rng, len(targets))
+            metric.partial_fit(features, targets, targets)
+            # normalized as a batch, as partial_fit does: samples are stored bit for bit
+            normalized = features / np.linalg.norm(features, axis=1, keepdims=True)
+            for target, feature in zip(targets, normalized):
+                history[target].append(feature)
+
+        self.assertLess(metric.gallery.shape[1], 2 * frames)
+        self.assertEqual(int(metric.counts.max()), frames)
+        samples = metric.samples
+        for target in targets:
+            np.testing.assert_array_equal(samples[target], np.array(history[target]))
+
+
+class TestKalmanFilterBank(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        self.kf = KalmanFilter()
+        self.bank = KalmanFilterBank(capacity=4)
+        self.states = []
+        for _ in range(10):
+            mean, covariance = self.kf.initiate(np.r_[rng.uniform(0, 1000, 2), 0.4, rng.uniform(50, 200)])
+            for _ in range(rng.randint(1, 5)):  # tracks of different ages
+                mean, covariance = self.kf.predict(mean, covariance)
+            self.states.append((mean, covariance))
+        self.slots = [self.bank.add(mean, covariance) for mean, covariance in self.states]  # grows past 4
+        self.measurements = np.c_[rng.uniform(0, 1000, (6, 2)), rng.uniform(0.3, 0.5, 6), rng.uniform(50, 200, 6)]
+
+    def test_predict(self):
+        self.bank.predict_slots(self.slots)
+        for slot, (mean, covariance) in zip(self.slots, self.states):
+            mean, covariance = self.kf.predict(mean, covariance)
+            np.testing.assert_allclose(self.bank.mean[slot], mean, rtol=1e-12)
+            np.testing.assert_allclose(self.bank.covariance[slot], covariance, rtol=1e-12)
+
+    def test_update(self):
+        slots = self.slots[:len(self.measurements)]
+        self.bank.update_slots(slots, self.measurements)
+        for slot, (mean, covariance), measurement in zip(slots, self.states, self.measurements):
+            mean, covariance = self.kf.update(mean, covariance, measurement)
+            np.testing.assert_allclose(self.bank.mean[slot], mean, rtol=1e-9, atol=1e-9)
+            np.testing.assert_allclose(self.bank.covariance[slot], covariance, rtol=1e-9, atol=1e-9)
+
+    def test_gating_distance(self):
+        rows = np.repeat(np.arange(len(self.slots)), len(self.measurements))
+        cols = np.tile(np.arange(len(self.measurements)), len(self.slots))
+        for only_position in (False, True):
+            expected = np.array([self.kf.gating_distance(mean, covariance, self.measurements, only_position)
+                                 for mean, covariance in self.states])
+            np.testing.assert_allclose(
+                self.bank.gating_distance_slots(self.slots, self.measurements, only_position), expected, rtol=1e-9)
+            np.testing.assert_allclose(
+                self.bank.gating_distance_pairs(np.array(self.slots)[rows], self.measurements[cols], only_position),
+                expected[rows, cols], rtol=1e-9)
+
+    def test_removed_slot_is_reused(self):
+        self.bank.remove(self.slots[3])
+        mean, covariance = self.states[0]
+        self.assertEqual(self.bank.add(mean, covariance), self.slots[3])
+
+
+class TestMatchingCascade(unittest.TestCase):
+
+    @staticmethod
+    def legacy_cascade(distance_metric, max_distance, cascade_depth, tracks, detections, track_indices):
+        # one cost matrix per level, as before the single-pass cascade
+        unmatched_detections = list(range(len(detections)))
+        matches = []
+        for level in range(cascade_depth):
+            if len(unmatched_detections) == 0:
+                break
+            track_indices_l = [k for k in track_indices if tracks[k].time_since_update == 1 + level]
+            if len(track_indices_l) == 0:
+                continue
+            matches_l, _, unmatched_detections = linear_assignment.min_cost_matching(
+                distance_metric, max_distance, tracks, detections, track_indices_l, unmatched_detections)
+            matches += matches_l
+        unmatched_tracks = list(set(track_indices) - set(k for k, _ in matches))
+        return matches, unmatched_tracks, unmatched_detections
+
+    def test_single_pass_matches_per_level(self):
+        crowd = Crowd(np.random.RandomState(3), 40, 600, miss=0.3)
+        tracker = Tracker(NearestNeighborDistanceMetric('cosine', 0.2, 20), max_age=30, n_init=2)
+        levels = set()
+        for _ in range(40):
+            tracker.predict()
+            detections = crowd.step()
+            tracker._index_detections(detections)
+            confirmed = [i for i, t in enumerate(tracker.tracks) if t.is_confirmed()]
+            levels.update(tracker.tracks[i].time_since_update for i in confirmed)
+
+            args = (tracker._gated_metric, tracker.metric.matching_threshold, tracker.max_age,
+                    tracker.tracks, detections, confirmed)
+            ref = self.legacy_cascade(*args)
+            new = linear_assignment.matching_cascade(*args)
+            for ref_part, new_part in zip(ref, new):
+                self.assertEqual(sorted(ref_part), sorted(new_part))
+            tracker.update(detections)
+        self.assertGreater(len(levels), 1)
+
+
+class TestSparseAssignment(unittest.TestCase):
+
+    def test_sparse_matches_dense(self):
+        max_distance = 0.3
+        for seed in range(5):
+            rng = np.random.RandomState(seed)
+            cost = rng.uniform(0, 1, (60, 50))
+            cost[rng.rand(*cost.shape) > 0.1] = linear_assignment.INFTY_COST  # mostly gated, as in a crowd
+            track_indices = list(rng.permutation(60)[:50])
+            detection_indices = list(rng.permutation(50)[:45])
+
+            def distance_metric(tracks, detections, track_indices, detection_indices):
+                return cost[np.ix_(track_indices, detection_indices)].copy()
+
+            dense, sparse = [linear_assignment.min_cost_matching(
+                distance_metric, max_distance, [None] * 60, [None] * 50, track_indices, detection_indices,
+                sparse=use_sparse) for use_sparse in (False, True)]
+            self.assertEqual(sorted(dense[0]), sorted(sparse[0]))
+            # unmatched tracks and detections in the order of track_indices / detection_indices
+            matched_tracks, matched_detections = set(k for k, _ in dense[0]), set(d for _, d in dense[0])
+            self.assertEqual(dense[1], sparse[1])
+            self.assertEqual(dense[1], [k for k in track_indices if k not in matched_tracks])
+            self.assertEqual(dense[2], sparse[2])
+            self.assertEqual(dense[2], [d for d in detection_indices if d not in matched_detections])
+
+
+class TestGridIndex(unittest.TestCase):
+
+    def test_query_matches_brute_force(self):
+        rng = np.random.RandomState(5)
+        boxes = rng.uniform(0, 500, (200, 2))
+        boxes = np.hstack([boxes, boxes + rng.uniform(0, 80, (200, 2))])
+        index = GridIndex(boxes, 40.)
+        for box in np.vstack([boxes[:20], [[-50., -50., 600., 600.], [600., 600., 700., 700.]]]):
+            expected = np.flatnonzero((boxes[:, 0] <= box[2]) & (boxes[:, 2] >= box[0]) &
+                                      (boxes[:, 1] <= box[3]) & (boxes[:, 3] >= box[1]))
+            np.testing.assert_array_equal(index.query(box), expected)
+
+    def test_grid_matches_all_pairs(self):
+        crowd = Crowd(np.random.RandomState(6), 150, 1500, miss=0.1)
+        tracker = Tracker(NearestNeighborDistanceMetric('cosine', 0.2, 20), max_age=30, n_init=2)
+        feasible_pairs = 0
+        for _ in range(15):
+            tracker.predict()
+            detections = crowd.step()
+            tracks = tracker.tracks
+            confirmed = [i for i, t in enumerate(tracks) if t.is_confirmed()]
+            all_tracks, all_dets = list(range(len(tracks))), list(range(len(detections)))
+
+            tracker._index_detections(detections)  # below GRID_MIN_PAIRS: all the pairs
+            self.assertIsNone(tracker._centers)
+            ref = tracker._gated_metric(tracks, detections, confirmed, all_dets)
+            ref_iou = iou_matching.iou_cost(tracks, detections, all_tracks, all_dets)
+
+            tracker._index_detections(detections, force=True)
+            new = tracker._gated_metric(tracks, detections, confirmed, all_dets)
+            new_iou = iou_matching.iou_cost(tracks, detections, all_tracks, all_dets, index=tracker._boxes)
+
+            feasible = ref < linear_assignment.INFTY_COST
+            np.testing.assert_array_equal(new < linear_assignment.INFTY_COST, feasible)
+            # float32 appearance distances, per pair vs one matrix product: equal up to rounding
+            np.testing.assert_allclose(new[feasible], ref[feasible], rtol=1e-5, atol=1e-6)
+            np.testing.assert_array_equal(new_iou, ref_iou)
+            feasible_pairs += int(feasible.sum())
+            tracker.update(detections)
+        self.assertGreater(feasible_pairs, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
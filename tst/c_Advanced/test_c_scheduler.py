@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+
+# utils_ds and deep_sort are imported from the project folder, as when the tracker scripts run from there
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'c__Advanced',
+                                           'Object_tracking', 'Project_1_PeopleTrackr'))
+sys.path.insert(0, PROJECT_DIR)
+
+from deep_sort.sort.detection import Detection  # noqa: E402
+from deep_sort.sort.nn_matching import NearestNeighborDistanceMetric  # noqa: E402
+from deep_sort.sort.tracker import Tracker  # noqa: E402
+from utils_ds.scheduler import DetectionScheduler  # noqa: E402
+
+
+class TestDetectionScheduler(unittest.TestCase):
+
+    def test_steady_scene_skips_frames(self):
+        # five people standing still, detected on every frame until their tracks have converged
+        rng = np.random.RandomState(0)
+        boxes = np.c_[rng.uniform(0, 500, (5, 2)), np.full(5, 30.), rng.uniform(60, 120, 5)]
+        looks = rng.randn(5, 16).astype(np.float32)
+        tracker = Tracker(NearestNeighborDistanceMetric('cosine', 0.2, 20), max_age=30, n_init=3)
+        for _ in range(30):
+            tracker.predict()
+            tracker.update([Detection(box, 0.9, look, 0) for box, look in zip(boxes, looks)])
+        self.assertTrue(all(t.is_confirmed() for t in tracker.tracks))
+
+        scheduler = DetectionScheduler(min_interval=1, max_interval=6)
+        img = np.zeros((72, 128, 3), dtype=np.uint8)  # no motion
+        decisions = []
+        for idx_frame in range(13):
+            detect = scheduler.decide(idx_frame, img, tracker.tracks)
+            if detect:
+                scheduler.on_tracked(tracker.tracks, idx_frame)
+            decisions.append(detect)
+
+        self.assertEqual(decisions, [True] + [False] * 5 + [True] + [False] * 5 + [True])
+        self.assertEqual(scheduler.reasons.get('cov_growth', 0), 0)
+        self.assertEqual(scheduler.reasons['stable'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()